@@ -0,0 +1,92 @@
+"""
+benchmark_retrieve.py
+---------------------
+Measures the retrieve latency of the RAG agent against a ChromaDB collection:
+- uncached: the collection and embedding function are created on every call (previous behavior)
+- cached: the shared collection handle, cold (first call, loads the model) and warm
+- onnx: the cached collection with the ONNX query encoder, cold and warm (if optimum is installed)
+
+Usage:
+    python benchmark_retrieve.py [--collection docs] [--db-dir ./chroma_db] [--embedding-model ...] [--queries 20]
+"""
+import argparse
+import time
+from typing import Callable, List
+
+from chromadb.utils import embedding_functions
+
+from utils import (
+    get_chroma_client,
+    get_cached_collection,
+    get_embedding_function,
+    query_collection,
+)
+
+QUERIES = [
+    "How do I define a tool for an agent?",
+    "How are dependencies passed to the agent?",
+    "How do I stream the agent response?",
+    "Which models are supported?",
+    "How do I validate the structured output?",
+]
+
+
+def time_calls(retrieve: Callable[[str], None], queries: List[str]) -> List[float]:
+    """Returns the milliseconds spent by each retrieve call."""
+    timings = []
+    for query in queries:
+        start_time = time.perf_counter()
+        retrieve(query)
+        timings.append((time.perf_counter() - start_time) * 1000)
+    return timings
+
+
+def print_result(label: str, timings: List[float]):
+    """Prints the cold (first call) and warm (next calls) latency."""
+    warm = timings[1:] or timings
+    print(f"{label}: cold {timings[0]:.1f} ms | warm avg {sum(warm) / len(warm):.1f} ms, "
+          f"min {min(warm):.1f} ms, max {max(warm):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cold vs warm retrieve latency")
+    parser.add_argument("--collection", default="docs", help="ChromaDB collection name")
+    parser.add_argument("--db-dir", default="./chroma_db", help="ChromaDB directory")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2", help="Embedding model name")
+    parser.add_argument("--onnx-file", default=None, help="ONNX file for the onnx backend, e.g. onnx/model_quint8_avx2.onnx")
+    parser.add_argument("--queries", type=int, default=20, help="Number of retrieve calls per scenario")
+    args = parser.parse_args()
+
+    client = get_chroma_client(args.db_dir)
+    queries = [QUERIES[i % len(QUERIES)] for i in range(args.queries)]
+
+    # The cached scenario runs first, so its first call pays the model load
+    def retrieve_cached(query):
+        collection = get_cached_collection(client, args.collection, embedding_model_name=args.embedding_model)
+        query_collection(collection, query)
+
+    print_result("cached collection", time_calls(retrieve_cached, queries))
+
+    def retrieve_uncached(query):
+        embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=args.embedding_model)
+        collection = client.get_collection(name=args.collection, embedding_function=embedding_func)
+        query_collection(collection, query)
+
+    print_result("uncached collection", time_calls(retrieve_uncached, queries))
+
+    try:
+        onnx_encoder = get_embedding_function(args.embedding_model, backend="onnx", onnx_file_name=args.onnx_file)
+    except Exception as e:
+        print(f"onnx query encoder: skipped ({e})")
+        return
+
+    def retrieve_onnx(query):
+        collection = get_cached_collection(client, args.collection, embedding_model_name=args.embedding_model)
+        query_collection(collection, query, query_embedding_function=onnx_encoder)
+
+    print_result(f"cached collection + onnx query encoder ({args.onnx_file or 'onnx/model.onnx'})",
+                 time_calls(retrieve_onnx, queries))
+
+
+if __name__ == "__main__":
+    main()
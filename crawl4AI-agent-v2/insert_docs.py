@@ -5,19 +5,26 @@ Command-line utility to crawl any URL using Crawl4AI, detect content type (sitem
 use the appropriate crawl method, chunk the resulting Markdown into <1000 character blocks by header hierarchy,
 and insert all chunks into ChromaDB with metadata.
 
+With --stream, pages are chunked and upserted into ChromaDB as they are crawled, and the crawl
+frontier is saved to a JSON file, so an interrupted crawl resumes where it stopped.
+
 Usage:
-    python insert_docs.py <URL> [--collection ...] [--db-dir ...] [--embedding-model ...]
+    python insert_docs.py <URL> [--collection ...] [--db-dir ...] [--embedding-model ...] [--stream]
 """
 import argparse
 import sys
+import os
 import re
+import json
+import time
 import asyncio
-from typing import List, Dict, Any
+import hashlib
+from typing import List, Dict, Any, Tuple
 from urllib.parse import urlparse, urldefrag
 from xml.etree import ElementTree
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode, MemoryAdaptiveDispatcher
 import requests
-from utils import get_chroma_client, get_or_create_collection, add_documents_to_collection
+from utils import get_chroma_client, get_or_create_collection, upsert_documents_to_collection
 
 def smart_chunk_markdown(markdown: str, max_len: int = 1000) -> List[str]:
     """Hierarchically splits markdown by #, ##, ### headers, then by characters, to ensure all chunks < max_len."""
@@ -71,9 +78,6 @@ async def crawl_recursive_internal_links(start_urls, max_depth=3, max_concurrent
 
     visited = set()
 
-    def normalize_url(url):
-        return urldefrag(url)[0]
-
     current_urls = set([normalize_url(u) for u in start_urls])
     results_all = []
 
@@ -152,6 +156,245 @@ def extract_section_info(chunk: str) -> Dict[str, Any]:
         "word_count": len(chunk.split())
     }
 
+def get_chunk_id(url: str, chunk: str) -> str:
+    """Stable chunk ID from its source URL and content, so re-running the ingestion upserts the same IDs."""
+    return hashlib.sha256(f"{url}\n{chunk}".encode("utf-8")).hexdigest()
+
+def build_page_chunks(url: str, markdown: str, chunk_size: int) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+    """Chunks a page and returns the chunk IDs, documents and metadatas. Duplicated chunks in the page are skipped."""
+    ids, documents, metadatas = [], [], []
+    seen = set()
+    for chunk_idx, chunk in enumerate(smart_chunk_markdown(markdown, max_len=chunk_size)):
+        chunk_id = get_chunk_id(url, chunk)
+        if chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        ids.append(chunk_id)
+        documents.append(chunk)
+        meta = extract_section_info(chunk)
+        meta["chunk_index"] = chunk_idx
+        meta["source"] = url
+        metadatas.append(meta)
+    return ids, documents, metadatas
+
+def normalize_url(url: str) -> str:
+    return urldefrag(url)[0]
+
+class CrawlFrontier:
+    """Crawl state (pending URLs with their depth, and done URLs) persisted to a JSON file for resume."""
+
+    def __init__(self, path: str, start_url: str, restart: bool = False):
+        self.path = path
+        self.start_url = start_url
+        self.pending: Dict[str, int] = {}
+        self.done = set()
+        self.resumed = False
+        if not restart and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("start_url") == start_url:
+                self.pending = state["pending"]
+                self.done = set(state["done"])
+                self.resumed = True
+            else:
+                print(f"Ignoring frontier {path}: it belongs to a crawl of {state.get('start_url')}")
+
+    def add(self, url: str, depth: int):
+        url = normalize_url(url)
+        if url not in self.done and url not in self.pending:
+            self.pending[url] = depth
+
+    def mark_done(self, url: str):
+        url = normalize_url(url)
+        self.pending.pop(url, None)
+        self.done.add(url)
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"start_url": self.start_url, "pending": self.pending, "done": sorted(self.done)}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class StreamingIngestor:
+    """Buffers crawled pages and upserts their chunks into ChromaDB, skipping the unchanged pages."""
+
+    def __init__(self, collection, chunk_size: int, batch_size: int):
+        self.collection = collection
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.pages: List[Tuple[str, List[str], List[str], List[Dict[str, Any]]]] = []
+        self.buffered_chunks = 0
+        self.start_time = time.time()
+        self.stats = {
+            "pages_crawled": 0,
+            "pages_failed": 0,
+            "pages_unchanged": 0,
+            "chunks_upserted": 0,
+            "chunks_deleted": 0,
+        }
+
+    async def add_page(self, url: str, markdown: str) -> List[str]:
+        """Buffers a crawled page. Returns the URLs of the pages stored in ChromaDB, if the buffer was flushed."""
+        ids, documents, metadatas = build_page_chunks(url, markdown, self.chunk_size)
+        self.pages.append((url, ids, documents, metadatas))
+        self.buffered_chunks += len(ids)
+        self.stats["pages_crawled"] += 1
+        if self.buffered_chunks >= self.batch_size:
+            return await self.flush()
+        return []
+
+    async def flush(self) -> List[str]:
+        """Writes the buffered pages to ChromaDB without blocking the crawl. Returns their URLs."""
+        pages, self.pages, self.buffered_chunks = self.pages, [], 0
+        if pages:
+            await asyncio.to_thread(self._write_pages, pages)
+        return [url for url, _, _, _ in pages]
+
+    def _write_pages(self, pages):
+        # Crawled URLs can resolve to the same page (redirects, sitemap aliases): keep its last crawl
+        pages = list({url: (url, page_ids, page_documents, page_metadatas)
+                      for url, page_ids, page_documents, page_metadatas in pages}.values())
+        existing = self.collection.get(
+            where={"source": {"$in": [url for url, _, _, _ in pages]}},
+            include=["metadatas"]
+        )
+        existing_ids: Dict[str, set] = {}
+        for chunk_id, meta in zip(existing["ids"], existing["metadatas"]):
+            existing_ids.setdefault(meta["source"], set()).add(chunk_id)
+
+        ids, documents, metadatas, stale_ids = [], [], [], []
+        seen_ids = set()
+        for url, page_ids, page_documents, page_metadatas in pages:
+            old_ids = existing_ids.get(url, set())
+            if old_ids == set(page_ids):
+                self.stats["pages_unchanged"] += 1
+                continue
+            for chunk_id, document, metadata in zip(page_ids, page_documents, page_metadatas):
+                if chunk_id in seen_ids:
+                    continue
+                seen_ids.add(chunk_id)
+                ids.append(chunk_id)
+                documents.append(document)
+                metadatas.append(metadata)
+            stale_ids.extend(old_ids - set(page_ids))
+
+        if ids:
+            upsert_documents_to_collection(self.collection, ids, documents, metadatas, batch_size=self.batch_size)
+            self.stats["chunks_upserted"] += len(ids)
+        if stale_ids:
+            self.collection.delete(ids=stale_ids)
+            self.stats["chunks_deleted"] += len(stale_ids)
+
+    def progress(self, pending: int) -> str:
+        elapsed = time.time() - self.start_time
+        return (
+            f"{self.stats['pages_crawled']} pages ({self.stats['pages_failed']} failed, "
+            f"{self.stats['pages_unchanged']} unchanged), {self.stats['chunks_upserted']} chunks upserted, "
+            f"{self.stats['chunks_deleted']} stale chunks deleted, {pending} pending | "
+            f"{self.stats['pages_crawled'] / elapsed if elapsed else 0:.2f} pages/s, "
+            f"{self.stats['chunks_upserted'] / elapsed if elapsed else 0:.1f} chunks/s, {elapsed:.1f}s elapsed"
+        )
+
+async def crawl_streaming(
+    frontier: CrawlFrontier,
+    ingestor: StreamingIngestor,
+    follow_links: bool,
+    max_depth: int = 3,
+    max_concurrent: int = 10,
+    checkpoint_every: int = 25
+):
+    """Streaming crawl: each depth level is crawled with stream=True and the pages are ingested as they arrive.
+    A page is marked done in the frontier only once its chunks are in ChromaDB."""
+    browser_config = BrowserConfig(headless=True, verbose=False)
+    run_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS, stream=True)
+    dispatcher = MemoryAdaptiveDispatcher(
+        memory_threshold_percent=70.0,
+        check_interval=1.0,
+        max_session_permit=max_concurrent
+    )
+
+    processed = 0
+
+    def mark_done(urls):
+        for done_url in urls:
+            frontier.mark_done(done_url)
+
+    try:
+        async with AsyncWebCrawler(config=browser_config) as crawler:
+            while frontier.pending:
+                depth = min(frontier.pending.values())
+                urls_to_crawl = [url for url, url_depth in frontier.pending.items() if url_depth == depth]
+
+                async for result in await crawler.arun_many(urls=urls_to_crawl, config=run_config, dispatcher=dispatcher):
+                    if result.success and result.markdown:
+                        if follow_links and depth + 1 < max_depth:
+                            for link in result.links.get("internal", []):
+                                frontier.add(link["href"], depth + 1)
+                        mark_done(await ingestor.add_page(result.url, result.markdown))
+                    else:
+                        ingestor.stats["pages_failed"] += 1
+                        frontier.mark_done(result.url)
+
+                    processed += 1
+                    if processed % checkpoint_every == 0:
+                        frontier.save()
+                        print(ingestor.progress(len(frontier.pending)))
+
+                mark_done(await ingestor.flush())
+                # URLs the crawler did not return (e.g. with a different result URL) are not retried forever
+                mark_done(urls_to_crawl)
+                frontier.save()
+    finally:
+        # Pages buffered but not flushed stay pending, so they are crawled again on resume
+        frontier.save()
+
+def run_streaming(args):
+    """Streaming ingestion of the URL, resuming from the saved frontier if any."""
+    url = args.url
+    frontier_path = args.frontier_file or os.path.join(args.db_dir, f"{args.collection}_frontier.json")
+    frontier = CrawlFrontier(frontier_path, url, restart=args.restart)
+
+    follow_links = False
+    if frontier.resumed:
+        print(f"Resuming crawl of {url}: {len(frontier.done)} pages done, {len(frontier.pending)} pending")
+        follow_links = not is_txt(url) and not is_sitemap(url)
+    elif is_txt(url):
+        print(f"Detected .txt/markdown file: {url}")
+        frontier.add(url, 0)
+    elif is_sitemap(url):
+        print(f"Detected sitemap: {url}")
+        sitemap_urls = parse_sitemap(url)
+        if not sitemap_urls:
+            print("No URLs found in sitemap.")
+            sys.exit(1)
+        for sitemap_url in sitemap_urls:
+            frontier.add(sitemap_url, 0)
+    else:
+        print(f"Detected regular URL: {url}")
+        frontier.add(url, 0)
+        follow_links = True
+
+    client = get_chroma_client(args.db_dir)
+    collection = get_or_create_collection(client, args.collection, embedding_model_name=args.embedding_model)
+    ingestor = StreamingIngestor(collection, chunk_size=args.chunk_size, batch_size=args.batch_size)
+
+    print(f"Streaming chunks into ChromaDB collection '{args.collection}' (frontier: {frontier_path})...")
+    asyncio.run(crawl_streaming(
+        frontier,
+        ingestor,
+        follow_links=follow_links,
+        max_depth=args.max_depth,
+        max_concurrent=args.max_concurrent,
+        checkpoint_every=args.checkpoint_every
+    ))
+    frontier.clear()
+    print(f"Done: {ingestor.progress(0)}")
+
 def main():
     parser = argparse.ArgumentParser(description="Insert crawled docs into ChromaDB")
     parser.add_argument("url", help="URL to crawl (regular, .txt, or sitemap)")
@@ -162,8 +405,16 @@ def main():
     parser.add_argument("--max-depth", type=int, default=3, help="Recursion depth for regular URLs")
     parser.add_argument("--max-concurrent", type=int, default=10, help="Max parallel browser sessions")
     parser.add_argument("--batch-size", type=int, default=100, help="ChromaDB insert batch size")
+    parser.add_argument("--stream", action="store_true", help="Chunk and upsert pages as they are crawled, with resume")
+    parser.add_argument("--frontier-file", default=None, help="Crawl frontier file for --stream (default: <db-dir>/<collection>_frontier.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved frontier and crawl from the start")
+    parser.add_argument("--checkpoint-every", type=int, default=25, help="Save the frontier and print progress every N pages")
     args = parser.parse_args()
 
+    if args.stream:
+        run_streaming(args)
+        return
+
     # Detect URL type
     url = args.url
     if is_txt(url):
@@ -180,21 +431,17 @@ def main():
         print(f"Detected regular URL: {url}")
         crawl_results = asyncio.run(crawl_recursive_internal_links([url], max_depth=args.max_depth, max_concurrent=args.max_concurrent))
 
-    # Chunk and collect metadata
+    # Chunk and collect metadata, with content-hash IDs (a page listed twice is only stored once)
     ids, documents, metadatas = [], [], []
-    chunk_idx = 0
+    seen_ids = set()
     for doc in crawl_results:
-        url = doc['url']
-        md = doc['markdown']
-        chunks = smart_chunk_markdown(md, max_len=args.chunk_size)
-        for chunk in chunks:
-            ids.append(f"chunk-{chunk_idx}")
+        for chunk_id, chunk, meta in zip(*build_page_chunks(doc['url'], doc['markdown'], args.chunk_size)):
+            if chunk_id in seen_ids:
+                continue
+            seen_ids.add(chunk_id)
+            ids.append(chunk_id)
             documents.append(chunk)
-            meta = extract_section_info(chunk)
-            meta["chunk_index"] = chunk_idx
-            meta["source"] = url
             metadatas.append(meta)
-            chunk_idx += 1
 
     if not documents:
         print("No documents found to insert.")
@@ -204,7 +451,7 @@ def main():
 
     client = get_chroma_client(args.db_dir)
     collection = get_or_create_collection(client, args.collection, embedding_model_name=args.embedding_model)
-    add_documents_to_collection(collection, ids, documents, metadatas, batch_size=args.batch_size)
+    upsert_documents_to_collection(collection, ids, documents, metadatas, batch_size=args.batch_size)
 
     print(f"Successfully added {len(documents)} chunks to ChromaDB collection '{args.collection}'.")
 
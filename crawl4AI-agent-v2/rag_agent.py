@@ -15,7 +15,9 @@ from openai import AsyncOpenAI
 
 from utils import (
     get_chroma_client,
-    get_or_create_collection,
+    get_cached_collection,
+    get_query_embedding_function,
+    clear_collection_cache,
     query_collection,
     format_results_as_context
 )
@@ -61,19 +63,36 @@ async def retrieve(context: RunContext[RAGDeps], search_query: str, n_results: i
     Returns:
         Formatted context information from the retrieved documents.
     """
-    # Get ChromaDB client and collection
-    collection = get_or_create_collection(
+    # Get the shared collection handle (the embedding model is loaded on the first call only)
+    collection = get_cached_collection(
         context.deps.chroma_client,
         context.deps.collection_name,
         embedding_model_name=context.deps.embedding_model
     )
+    query_embedding_function = get_query_embedding_function(context.deps.embedding_model)
     
     # Query the collection
-    query_results = query_collection(
-        collection,
-        search_query,
-        n_results=n_results
-    )
+    try:
+        query_results = query_collection(
+            collection,
+            search_query,
+            n_results=n_results,
+            query_embedding_function=query_embedding_function
+        )
+    except Exception:
+        # The collection may have been recreated by insert_docs.py since it was cached
+        clear_collection_cache(context.deps.collection_name)
+        collection = get_cached_collection(
+            context.deps.chroma_client,
+            context.deps.collection_name,
+            embedding_model_name=context.deps.embedding_model
+        )
+        query_results = query_collection(
+            collection,
+            search_query,
+            n_results=n_results,
+            query_embedding_function=query_embedding_function
+        )
     
     # Format the results as context
     return format_results_as_context(query_results)
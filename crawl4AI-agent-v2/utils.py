@@ -2,12 +2,19 @@
 
 import os
 import pathlib
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Callable
 
 import chromadb
 from chromadb.utils import embedding_functions
 from more_itertools import batched
 
+# Process-wide caches of the embedding functions and collection handles, so the embedding model
+# is loaded once (at first use) instead of on every retrieve call
+_embedding_functions: Dict[Tuple[str, str, Optional[str]], Any] = {}
+_collections: Dict[Tuple[str, str, str], chromadb.Collection] = {}
+_cache_lock = threading.Lock()
+
 
 def get_chroma_client(persist_directory: str) -> chromadb.PersistentClient:
     """Get a ChromaDB client with the specified persistence directory.
@@ -42,10 +49,8 @@ def get_or_create_collection(
     Returns:
         A ChromaDB Collection
     """
-    # Create embedding function
-    embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=embedding_model_name
-    )
+    # Get the shared embedding function
+    embedding_func = get_embedding_function(embedding_model_name)
     
     # Try to get the collection, create it if it doesn't exist
     try:
@@ -61,6 +66,112 @@ def get_or_create_collection(
         )
 
 
+def get_embedding_function(
+    embedding_model_name: str = "all-MiniLM-L6-v2",
+    backend: str = "torch",
+    onnx_file_name: Optional[str] = None,
+) -> Callable[[List[str]], Any]:
+    """Get the shared embedding function for a model, loading the model on the first call.
+    
+    Args:
+        embedding_model_name: Name of the embedding model
+        backend: "torch" for the ChromaDB SentenceTransformer embedding function, or "onnx"
+            for a sentence-transformers ONNX Runtime encoder (CPU query encoding)
+        onnx_file_name: ONNX file of the model repository for the "onnx" backend, e.g. a
+            quantized one like "onnx/model_quint8_avx2.onnx" (default: "onnx/model.onnx")
+        
+    Returns:
+        A function returning the embeddings of a list of texts
+    """
+    key = (embedding_model_name, backend, onnx_file_name)
+    with _cache_lock:
+        if key not in _embedding_functions:
+            if backend == "onnx":
+                from sentence_transformers import SentenceTransformer
+                model_kwargs = {"file_name": onnx_file_name} if onnx_file_name else None
+                model = SentenceTransformer(
+                    embedding_model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs
+                )
+                _embedding_functions[key] = lambda texts: model.encode(list(texts), convert_to_numpy=True).tolist()
+            else:
+                _embedding_functions[key] = embedding_functions.SentenceTransformerEmbeddingFunction(
+                    model_name=embedding_model_name
+                )
+        return _embedding_functions[key]
+
+
+def get_query_embedding_function(
+    embedding_model_name: str = "all-MiniLM-L6-v2",
+) -> Optional[Callable[[List[str]], Any]]:
+    """Get the query encoder selected by QUERY_EMBEDDING_BACKEND ("torch" or "onnx").
+    
+    The ONNX encoder uses the same model as the collection, so its query embeddings
+    match the stored ones. If the ONNX backend can't be loaded (it needs
+    `pip install optimum[onnxruntime]`), the collection embedding function is used.
+    
+    Args:
+        embedding_model_name: Name of the embedding model of the collection
+        
+    Returns:
+        The ONNX query encoder, or None to use the collection embedding function
+    """
+    if os.getenv("QUERY_EMBEDDING_BACKEND", "torch") != "onnx":
+        return None
+    try:
+        return get_embedding_function(
+            embedding_model_name,
+            backend="onnx",
+            onnx_file_name=os.getenv("QUERY_EMBEDDING_ONNX_FILE") or None
+        )
+    except Exception as e:
+        print(f"ONNX query embedding unavailable, using the default backend: {e}")
+        os.environ["QUERY_EMBEDDING_BACKEND"] = "torch"
+        return None
+
+
+def get_cached_collection(
+    client: chromadb.PersistentClient,
+    collection_name: str,
+    embedding_model_name: str = "all-MiniLM-L6-v2",
+) -> chromadb.Collection:
+    """Get the shared collection handle for (db directory, collection, model).
+    
+    The collection and its embedding function are created on the first call and
+    reused by the next ones.
+    
+    Args:
+        client: ChromaDB client
+        collection_name: Name of the collection
+        embedding_model_name: Name of the embedding model to use
+        
+    Returns:
+        A ChromaDB Collection
+    """
+    key = (
+        os.path.abspath(client.get_settings().persist_directory),
+        collection_name,
+        embedding_model_name,
+    )
+    collection = _collections.get(key)
+    if collection is None:
+        collection = get_or_create_collection(client, collection_name, embedding_model_name)
+        with _cache_lock:
+            _collections[key] = collection
+    return collection
+
+
+def clear_collection_cache(collection_name: Optional[str] = None) -> None:
+    """Drop the cached collection handles (all of them, or the ones of a collection).
+    
+    Args:
+        collection_name: Optional name of the collection to drop
+    """
+    with _cache_lock:
+        for key in list(_collections):
+            if collection_name is None or key[1] == collection_name:
+                del _collections[key]
+
+
 def add_documents_to_collection(
     collection: chromadb.Collection,
     ids: List[str],
@@ -98,11 +209,45 @@ def add_documents_to_collection(
         )
 
 
+def upsert_documents_to_collection(
+    collection: chromadb.Collection,
+    ids: List[str],
+    documents: List[str],
+    metadatas: Optional[List[Dict[str, Any]]] = None,
+    batch_size: int = 100,
+) -> None:
+    """Upsert documents into a ChromaDB collection in batches.
+    
+    Unlike add_documents_to_collection, existing IDs are overwritten instead of
+    rejected, so re-running an ingestion with stable IDs is idempotent.
+    
+    Args:
+        collection: ChromaDB collection
+        ids: List of document IDs
+        documents: List of document texts
+        metadatas: Optional list of metadata dictionaries for each document
+        batch_size: Size of batches for upserting documents
+    """
+    # Create default metadata if none provided
+    if metadatas is None:
+        metadatas = [{}] * len(documents)
+    
+    # Upsert documents in batches
+    for start_idx in range(0, len(documents), batch_size):
+        end_idx = start_idx + batch_size
+        collection.upsert(
+            ids=ids[start_idx:end_idx],
+            documents=documents[start_idx:end_idx],
+            metadatas=metadatas[start_idx:end_idx],
+        )
+
+
 def query_collection(
     collection: chromadb.Collection,
     query_text: str,
     n_results: int = 5,
     where: Optional[Dict[str, Any]] = None,
+    query_embedding_function: Optional[Callable[[List[str]], Any]] = None,
 ) -> Dict[str, Any]:
     """Query a ChromaDB collection for similar documents.
     
@@ -111,11 +256,20 @@ def query_collection(
         query_text: Text to search for
         n_results: Number of results to return
         where: Optional filter to apply to the query
+        query_embedding_function: Optional encoder for the query text, instead of the
+            collection embedding function
         
     Returns:
         Query results containing documents, metadatas, distances, and ids
     """
     # Query the collection
+    if query_embedding_function is not None:
+        return collection.query(
+            query_embeddings=query_embedding_function([query_text]),
+            n_results=n_results,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
     return collection.query(
         query_texts=[query_text],
         n_results=n_results,
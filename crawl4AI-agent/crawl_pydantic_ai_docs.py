@@ -1,11 +1,13 @@
 import os
 import sys
 import json
+import time
 import asyncio
+import hashlib
 import requests
 from xml.etree import ElementTree
 from typing import List, Dict, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 from dotenv import load_dotenv
@@ -23,6 +25,67 @@ supabase: Client = create_client(
     os.getenv("SUPABASE_SERVICE_KEY")
 )
 
+# Global limits of the OpenAI requests, shared by all the pages crawled in parallel
+MAX_CONCURRENT_LLM_REQUESTS = int(os.getenv("MAX_CONCURRENT_LLM_REQUESTS", "10"))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+# Number of chunks embedded per embeddings request
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+
+class RateLimiter:
+    """Limits the concurrent requests and spaces them to stay under the requests per minute."""
+
+    def __init__(self, max_concurrent: int, requests_per_minute: int):
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.interval:
+            async with self.lock:
+                now = time.monotonic()
+                wait = self.next_slot - now
+                self.next_slot = max(now, self.next_slot) + self.interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+@dataclass
+class IngestionStats:
+    pages_crawled: int = 0
+    pages_unchanged: int = 0
+    pages_failed: int = 0
+    pages_incomplete: int = 0
+    chunks_stored: int = 0
+    llm_requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    embedding_requests: int = 0
+    embedding_tokens: int = 0
+    start_time: float = field(default_factory=time.time)
+
+    def report(self) -> str:
+        elapsed = time.time() - self.start_time
+        pages = self.pages_crawled + self.pages_unchanged
+        return (
+            f"Pages: {self.pages_crawled} stored ({self.pages_incomplete} incomplete, retried next run), "
+            f"{self.pages_unchanged} unchanged, {self.pages_failed} failed | "
+            f"Chunks stored: {self.chunks_stored} | "
+            f"{pages / elapsed if elapsed else 0:.2f} pages/sec in {elapsed:.1f}s\n"
+            f"Tokens: {self.prompt_tokens} prompt + {self.completion_tokens} completion in {self.llm_requests} LLM requests, "
+            f"{self.embedding_tokens} embedding in {self.embedding_requests} embedding requests"
+        )
+
+# Placeholders stored when the title/summary or embedding requests fail
+ERROR_TITLE = "Error processing title"
+ERROR_SUMMARY = "Error processing summary"
+
+rate_limiter = RateLimiter(MAX_CONCURRENT_LLM_REQUESTS, LLM_REQUESTS_PER_MINUTE)
+stats = IngestionStats()
+
 @dataclass
 class ProcessedChunk:
     url: str
@@ -87,38 +150,61 @@ async def get_title_and_summary(chunk: str, url: str) -> Dict[str, str]:
     Keep both title and summary concise but informative."""
     
     try:
-        response = await openai_client.chat.completions.create(
-            model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"URL: {url}\n\nContent:\n{chunk[:1000]}..."}  # Send first 1000 chars for context
-            ],
-            response_format={ "type": "json_object" }
-        )
+        async with rate_limiter:
+            response = await openai_client.chat.completions.create(
+                model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"URL: {url}\n\nContent:\n{chunk[:1000]}..."}  # Send first 1000 chars for context
+                ],
+                response_format={ "type": "json_object" }
+            )
+        stats.llm_requests += 1
+        if response.usage:
+            stats.prompt_tokens += response.usage.prompt_tokens
+            stats.completion_tokens += response.usage.completion_tokens
         return json.loads(response.choices[0].message.content)
     except Exception as e:
         print(f"Error getting title and summary: {e}")
-        return {"title": "Error processing title", "summary": "Error processing summary"}
+        return {"title": ERROR_TITLE, "summary": ERROR_SUMMARY}
+
+async def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Get embedding vectors from OpenAI, EMBEDDING_BATCH_SIZE texts per request."""
+    embeddings = []
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+        try:
+            async with rate_limiter:
+                response = await openai_client.embeddings.create(
+                    model="text-embedding-3-small",
+                    input=batch
+                )
+            stats.embedding_requests += 1
+            if response.usage:
+                stats.embedding_tokens += response.usage.total_tokens
+            embeddings.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        except Exception as e:
+            print(f"Error getting embeddings: {e}")
+            embeddings.extend([0] * 1536 for _ in batch)  # Return zero vectors on error
+    return embeddings
 
 async def get_embedding(text: str) -> List[float]:
     """Get embedding vector from OpenAI."""
-    try:
-        response = await openai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"Error getting embedding: {e}")
-        return [0] * 1536  # Return zero vector on error
+    return (await get_embeddings([text]))[0]
+
+def get_content_hash(markdown: str) -> str:
+    """Hash of the page content, stored in the chunks metadata to skip the unchanged pages."""
+    return hashlib.sha256(markdown.encode("utf-8")).hexdigest()
 
-async def process_chunk(chunk: str, chunk_number: int, url: str) -> ProcessedChunk:
-    """Process a single chunk of text."""
+async def process_chunk(chunk: str, chunk_number: int, url: str, embedding: List[float] = None,
+                        content_hash: str = None) -> ProcessedChunk:
+    """Process a single chunk of text. The embedding can be given if it was computed in a batch."""
     # Get title and summary
     extracted = await get_title_and_summary(chunk, url)
     
     # Get embedding
-    embedding = await get_embedding(chunk)
+    if embedding is None:
+        embedding = await get_embedding(chunk)
     
     # Create metadata
     metadata = {
@@ -127,6 +213,8 @@ async def process_chunk(chunk: str, chunk_number: int, url: str) -> ProcessedChu
         "crawled_at": datetime.now(timezone.utc).isoformat(),
         "url_path": urlparse(url).path
     }
+    if content_hash:
+        metadata["content_hash"] = content_hash
     
     return ProcessedChunk(
         url=url,
@@ -138,44 +226,93 @@ async def process_chunk(chunk: str, chunk_number: int, url: str) -> ProcessedChu
         embedding=embedding
     )
 
+def get_chunk_data(chunk: ProcessedChunk) -> Dict[str, Any]:
+    return {
+        "url": chunk.url,
+        "chunk_number": chunk.chunk_number,
+        "title": chunk.title,
+        "summary": chunk.summary,
+        "content": chunk.content,
+        "metadata": chunk.metadata,
+        "embedding": chunk.embedding
+    }
+
 async def insert_chunk(chunk: ProcessedChunk):
     """Insert a processed chunk into Supabase."""
+    return await insert_chunks([chunk])
+
+async def insert_chunks(chunks: List[ProcessedChunk]):
+    """Insert the processed chunks of a page into Supabase in one multi-row request,
+    replacing the previous version of the page."""
+    if not chunks:
+        return None
+    url = chunks[0].url
     try:
-        data = {
-            "url": chunk.url,
-            "chunk_number": chunk.chunk_number,
-            "title": chunk.title,
-            "summary": chunk.summary,
-            "content": chunk.content,
-            "metadata": chunk.metadata,
-            "embedding": chunk.embedding
-        }
-        
-        result = supabase.table("site_pages").insert(data).execute()
-        print(f"Inserted chunk {chunk.chunk_number} for {chunk.url}")
+        result = await asyncio.to_thread(
+            lambda: supabase.table("site_pages")
+                .upsert([get_chunk_data(chunk) for chunk in chunks], on_conflict="url,chunk_number")
+                .execute()
+        )
+        # Remove the chunks left over from a longer previous version of the page
+        await asyncio.to_thread(
+            lambda: supabase.table("site_pages")
+                .delete()
+                .eq("url", url)
+                .gte("chunk_number", len(chunks))
+                .execute()
+        )
+        stats.chunks_stored += len(chunks)
+        print(f"Inserted {len(chunks)} chunks for {url}")
         return result
     except Exception as e:
-        print(f"Error inserting chunk: {e}")
+        print(f"Error inserting chunks for {url}: {e}")
         return None
 
+async def is_page_unchanged(url: str, content_hash: str) -> bool:
+    """Check if the page is already stored with the same content hash."""
+    try:
+        result = await asyncio.to_thread(
+            lambda: supabase.table("site_pages")
+                .select("metadata")
+                .eq("url", url)
+                .eq("chunk_number", 0)
+                .execute()
+        )
+    except Exception as e:
+        print(f"Error checking the stored version of {url}: {e}")
+        return False
+    return bool(result.data) and result.data[0]["metadata"].get("content_hash") == content_hash
+
 async def process_and_store_document(url: str, markdown: str):
-    """Process a document and store its chunks in parallel."""
+    """Process a document and store its chunks, skipping it if it didn't change since the last crawl.
+    The OpenAI requests of all the pages go through the global rate limiter."""
+    content_hash = get_content_hash(markdown)
+    if await is_page_unchanged(url, content_hash):
+        stats.pages_unchanged += 1
+        print(f"Unchanged: {url}")
+        return
+
     # Split into chunks
     chunks = chunk_text(markdown)
     
-    # Process chunks in parallel
-    tasks = [
-        process_chunk(chunk, i, url) 
-        for i, chunk in enumerate(chunks)
-    ]
-    processed_chunks = await asyncio.gather(*tasks)
+    # Embed the page chunks in batches, then extract the titles and summaries in parallel
+    embeddings = await get_embeddings(chunks)
+    processed_chunks = await asyncio.gather(*[
+        process_chunk(chunk, i, url, embedding=embedding, content_hash=content_hash)
+        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+    ])
     
-    # Store chunks in parallel
-    insert_tasks = [
-        insert_chunk(chunk) 
-        for chunk in processed_chunks
-    ]
-    await asyncio.gather(*insert_tasks)
+    # A chunk stored with a placeholder title or zero vector must not mark the page as up to date,
+    # so without the content hash the page is processed again on the next run
+    if any(chunk.title == ERROR_TITLE or not any(chunk.embedding) for chunk in processed_chunks):
+        for chunk in processed_chunks:
+            chunk.metadata.pop("content_hash", None)
+        stats.pages_incomplete += 1
+        print(f"Incomplete (will be retried on the next run): {url}")
+
+    # Store the chunks in one request
+    await insert_chunks(processed_chunks)
+    stats.pages_crawled += 1
 
 async def crawl_parallel(urls: List[str], max_concurrent: int = 5):
     """Crawl multiple URLs in parallel with a concurrency limit."""
@@ -205,6 +342,7 @@ async def crawl_parallel(urls: List[str], max_concurrent: int = 5):
                     print(f"Successfully crawled: {url}")
                     await process_and_store_document(url, result.markdown_v2.raw_markdown)
                 else:
+                    stats.pages_failed += 1
                     print(f"Failed: {url} - Error: {result.error_message}")
         
         # Process all URLs in parallel with limited concurrency
@@ -240,6 +378,7 @@ async def main():
     
     print(f"Found {len(urls)} URLs to crawl")
     await crawl_parallel(urls)
+    print(stats.report())
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -161,6 +161,14 @@ class LlmProviderAbstract:
         """
         raise NotImplementedError
 
+    def video_gen_check(self, request_response: dict) -> dict:
+        """
+        Perform a single video generation status check, without waiting.
+        The response "pending" attribute is True if the video is not ready
+        yet, and "video_url" has the video URL when it's done.
+        """
+        raise NotImplementedError
+
     def query_from_text_model(
         self,
         prompt: str,
@@ -0,0 +1,105 @@
+"""
+Process-wide LLM SDK and HTTP client registry
+"""
+from typing import Any, Callable
+import hashlib
+import threading
+
+import requests
+
+from lib.codegen_utilities import log_debug
+
+
+DEBUG = False
+
+# Process-wide SDK clients (each one holds its own HTTP connection pool),
+# keyed by provider, base URL, API key hash and the other client options.
+# The registry is a module global, so it survives Streamlit reruns.
+_clients = {}
+_http_sessions = {}
+_clients_lock = threading.Lock()
+_stats = {"created": 0, "reused": 0}
+
+
+def get_api_key_hash(api_key: str) -> str:
+    """
+    Returns the API key hash, so the keys are not kept in the registry keys
+    """
+    if not api_key:
+        return None
+    return hashlib.sha256(str(api_key).encode()).hexdigest()
+
+
+def get_client_key(provider: str, client_config: dict) -> tuple:
+    """
+    Returns the registry key for the provider and client configuration
+    """
+    other_options = tuple(sorted(
+        (key, str(value)) for key, value in client_config.items()
+        if key not in ["api_key", "base_url"]
+    ))
+    return (
+        provider,
+        client_config.get("base_url"),
+        get_api_key_hash(client_config.get("api_key")),
+        other_options,
+    )
+
+
+def get_client(provider: str, client_config: dict,
+               client_class: Callable) -> Any:
+    """
+    Returns the shared client for the provider and client configuration,
+    creating it with client_class(**client_config) on the first call.
+    The client class is passed by the provider module, so the provider SDKs
+    are still imported only when the provider is used.
+    """
+    key = get_client_key(provider, client_config)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            _stats["reused"] += 1
+            return client
+        log_debug(f"get_client | creating {provider} client | "
+                  f"base_url: {client_config.get('base_url')}", debug=DEBUG)
+        client = client_class(**client_config)
+        _clients[key] = client
+        _stats["created"] += 1
+        return client
+
+
+def get_http_session(provider: str) -> requests.Session:
+    """
+    Returns the shared requests session for the provider, so the HTTP
+    connections to the provider API are kept alive between requests.
+    The API keys are sent in the request headers, not in the session.
+    """
+    with _clients_lock:
+        session = _http_sessions.get(provider)
+        if session is None:
+            session = requests.Session()
+            _http_sessions[provider] = session
+            _stats["created"] += 1
+        else:
+            _stats["reused"] += 1
+        return session
+
+
+def get_client_registry_stats() -> dict:
+    """
+    Returns the number of clients created and reused
+    """
+    with _clients_lock:
+        return dict(_stats, clients=len(_clients) + len(_http_sessions))
+
+
+def clear_client_registry():
+    """
+    Drop the registered clients and reset the stats
+    """
+    with _clients_lock:
+        _clients.clear()
+        for session in _http_sessions.values():
+            session.close()
+        _http_sessions.clear()
+        _stats.update({"created": 0, "reused": 0})
@@ -10,6 +10,7 @@ from lib.codegen_utilities import (
     get_default_resultset,
 )
 from lib.codegen_ai_abstracts import LlmProviderAbstract
+from lib.codegen_ai_clients import get_client
 
 
 DEBUG = False
@@ -51,7 +52,7 @@ class GroqLlm(LlmProviderAbstract):
         )
         log_debug("groq_query | " +
                   f"model_params: {model_params}", debug=DEBUG)
-        client = Groq(**client_params)
+        client = get_client("groq", client_params, Groq)
         response_raw = client.chat.completions.create(**model_params)
         response['response'] = response_raw.choices[0].message.content
         response['refined_prompt'] = pam_response['refined_prompt']
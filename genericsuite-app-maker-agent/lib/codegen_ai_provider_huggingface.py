@@ -12,6 +12,7 @@ from lib.codegen_utilities import (
     error_resultset,
 )
 from lib.codegen_ai_abstracts import LlmProviderAbstract
+from lib.codegen_ai_clients import get_http_session
 
 
 DEBUG = False
@@ -126,7 +127,8 @@ class HuggingFaceLlm(LlmProviderAbstract):
             "HUGGINGFACE_API_URL",
             "https://api-inference.huggingface.co/models")
         api_url = f'{base_url}/{repo_id}'
-        return requests.post(api_url, headers=headers, json=payload)
+        return get_http_session("huggingface").post(
+            api_url, headers=headers, json=payload)
 
 
 class HuggingFaceImageGen(HuggingFaceLlm):
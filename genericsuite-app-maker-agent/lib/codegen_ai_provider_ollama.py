@@ -11,6 +11,7 @@ from lib.codegen_utilities import (
     get_default_resultset,
 )
 from lib.codegen_ai_abstracts import LlmProviderAbstract
+from lib.codegen_ai_clients import get_client
 
 
 DEBUG = False
@@ -58,7 +59,8 @@ class OllamaLlm(LlmProviderAbstract):
                 "Using ollama client with base_url:" +
                 f' {client_params.get("base_url")}', debug=DEBUG)
             self.log_debug("", debug=DEBUG)
-            client = Client(host=client_params.get("base_url"))
+            client = get_client(
+                "ollama", {"host": client_params.get("base_url")}, Client)
             response_raw = client.chat(**model_params)
         else:
             response_raw = ollama.chat(**model_params)
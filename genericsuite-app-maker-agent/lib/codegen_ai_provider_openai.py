@@ -14,6 +14,7 @@ from lib.codegen_ai_abstracts import (
     LlmProviderAbstract,
     prepare_model_params,
 )
+from lib.codegen_ai_clients import get_client
 
 
 DEBUG = False
@@ -25,9 +26,9 @@ def get_openai_api_response(model_params: dict, naming: dict = None) -> dict:
     """
     response = get_default_resultset()
     configs = prepare_model_params(model_params, naming)
-    # Initialize the OpenAI client
+    # Get the shared OpenAI client for this base URL and API key
     try:
-        client = OpenAI(**configs["client_config"])
+        client = get_client("openai", configs["client_config"], OpenAI)
     except Exception as e:
         response['error'] = True
         response['error_message'] = str(e)
@@ -138,8 +139,10 @@ class OpenaiImageGen(OpenaiLlm):
                   f"model_params: {model_params}", debug=DEBUG)
 
         # Get the LLM response
-        client = OpenAI(
-            api_key=self.api_key or os.environ.get("OPENAI_API_KEY")
+        client = get_client(
+            "openai",
+            {"api_key": self.api_key or os.environ.get("OPENAI_API_KEY")},
+            OpenAI,
         )
         # Process the question and image
         ig_response = client.images.generate(**model_params)
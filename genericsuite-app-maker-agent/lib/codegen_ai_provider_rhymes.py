@@ -4,8 +4,6 @@ Rhymes APIs
 """
 import os
 import time
-
-import requests
 import json
 
 from lib.codegen_utilities import (
@@ -14,6 +12,7 @@ from lib.codegen_utilities import (
 )
 from lib.codegen_ai_provider_openai import get_openai_api_response
 from lib.codegen_ai_abstracts import LlmProviderAbstract
+from lib.codegen_ai_clients import get_http_session
 
 DEBUG = False
 
@@ -89,6 +88,12 @@ class AllegroLlm(LlmProviderAbstract):
         """
         return self.allegro_check_video_generation(request_response, wait_time)
 
+    def video_gen_check(self, request_response: dict) -> dict:
+        """
+        Perform a single Allegro video generation status check
+        """
+        return self.allegro_check_video_status(request_response)
+
     def query(
         self,
         prompt: str,
@@ -131,12 +136,13 @@ class AllegroLlm(LlmProviderAbstract):
                   f"\nAPI method: {model_params.get('method', 'POST')}",
                   debug=DEBUG)
         try:
+            session = get_http_session("rhymes")
             if model_params.get("method", "POST") == "POST":
-                model_response = requests.post(
+                model_response = session.post(
                     api_url, headers=headers,
                     json=payload)
             else:
-                model_response = requests.get(api_url, headers=headers)
+                model_response = session.get(api_url, headers=headers)
         except Exception as e:
             response['error'] = True
             response['error_message'] = str(e)
@@ -206,18 +212,13 @@ class AllegroLlm(LlmProviderAbstract):
 
         return response
 
-    def allegro_check_video_generation(
-        self,
-        allegro_response: dict,
-        wait_time: int = 60
-    ):
+    def allegro_check_video_status(self, allegro_response: dict) -> dict:
         """
-        Perform a Allegro video generation request check
+        Perform a single Allegro video generation status check, without
+        waiting. The response "pending" attribute is True if the video is
+        not ready yet, and "video_url" has the video URL when it's done.
         """
         request_id = allegro_response["response"]["data"]
-        log_debug("allegro_check_video_generation | " +
-                  f"request_id: {request_id}", debug=DEBUG)
-
         model_params = {
             "api_key": os.environ.get("RHYMES_ALLEGRO_API_KEY"),
             "base_url": 'https://api.rhymes.ai/v1/videoQuery',
@@ -226,54 +227,73 @@ class AllegroLlm(LlmProviderAbstract):
             },
             "method": "GET",
         }
-        log_debug("allegro_check_video_generation | WAIT FOR VIDEO | " +
+        log_debug("allegro_check_video_status | " +
                   f"model_params: {model_params}", debug=DEBUG)
 
-        video_url = None
+        # Send the follow-up request to the Allegro API
+        response = self.allegro_query(model_params)
+        log_debug("allegro_check_video_status | " +
+                  f"response: {response}", debug=DEBUG)
+        response['pending'] = False
+        response['video_url'] = None
+        if response['error']:
+            response["ttv_followup_response"] = response["error_message"]
+            return response
+        if response["response"]['message'] not in RHYMES_SUCCESS_RESPONSES \
+           or not response["response"].get('data'):
+            response['pending'] = True
+            return response
+
+        if isinstance(response["response"]["data"], str):
+            # Verify if the string has a json content
+            if "{" in response["response"]["data"] and \
+               response["response"]["data"].endswith("}"):
+                # Get the response["response"]["data"] string from the
+                # first "{"
+                first_bracket = response["response"]["data"].find("{")
+                response["response"]["data"] = \
+                    json.loads(
+                        response["response"]["data"][first_bracket:]
+                    )
+        if isinstance(response["response"]["data"], str):
+            response['video_url'] = response["response"]["data"]
+        else:
+            # The response is a dictionary with an error message
+            # E.g. { "code": 503, "type": "InternalServerException",
+            #        "message": "Prediction failed" }
+            response["ttv_followup_response"] = \
+                response["response"]["data"]
+            response["error"] = True
+            response["error_message"] = \
+                f"[E-RH-ALL-100] Video generation failed" \
+                f" (request_id: {request_id}," \
+                f' response: {response["ttv_followup_response"]})'
+        return response
+
+    def allegro_check_video_generation(
+        self,
+        allegro_response: dict,
+        wait_time: int = 60
+    ):
+        """
+        Perform a Allegro video generation request check, waiting until the
+        video is ready
+        """
+        request_id = allegro_response["response"]["data"]
+        log_debug("allegro_check_video_generation | WAIT FOR VIDEO | " +
+                  f"request_id: {request_id}", debug=DEBUG)
+
         for i in range(10):
             log_debug(f"allegro_check_video_generation | VERIFICATION TRY {i}",
                       debug=DEBUG)
-            # Send the follow-up request to the Allegro API
-            response = self.allegro_query(model_params)
-            log_debug(f"allegro_check_video_generation | VERIFICATION {i} | " +
-                      f"response: {response}", debug=DEBUG)
-            if response['error']:
-                response["ttv_followup_response"] = response["error_message"]
-                return response
-            if response["response"]['message'] in RHYMES_SUCCESS_RESPONSES \
-               and response["response"].get('data'):
-                if isinstance(response["response"]["data"], str):
-                    # Verify if the string has a json content
-                    if "{" in response["response"]["data"] and \
-                       response["response"]["data"].endswith("}"):
-                        # Get the response["response"]["data"] string from the
-                        # first "{"
-                        first_bracket = response["response"]["data"].find("{")
-                        response["response"]["data"] = \
-                            json.loads(
-                                response["response"]["data"][first_bracket:]
-                            )
-                if isinstance(response["response"]["data"], str):
-                    video_url = response["response"]["data"]
-                else:
-                    # The response is a dictionary with an error message
-                    # E.g. { "code": 503, "type": "InternalServerException",
-                    #        "message": "Prediction failed" }
-                    response["ttv_followup_response"] = \
-                        response["response"]["data"]
-                    response["error"] = True
-                    response["error_message"] = \
-                        f"[E-RH-ALL-100] Video generation failed" \
-                        f" (request_id: {request_id}," \
-                        f' response: {response["ttv_followup_response"]})'
+            response = self.allegro_check_video_status(allegro_response)
+            if not response['pending']:
                 break
             time.sleep(wait_time)
 
-        if not video_url:
+        if not response['video_url']:
             response["error"] = True
             response["error_message"] = response.get("error_message") or \
                 f"[E-RH-ALL-200] Video generation failed" \
                 f" (request_id: {request_id}, response: {response})"
-
-        response['video_url'] = video_url
         return response
@@ -10,6 +10,7 @@ from lib.codegen_utilities import (
     get_default_resultset,
 )
 from lib.codegen_ai_abstracts import LlmProviderAbstract
+from lib.codegen_ai_clients import get_client
 
 
 DEBUG = False
@@ -66,7 +67,7 @@ class TogetherAiLlm(LlmProviderAbstract):
         )
         log_debug("together_ai_query | " +
                   f"model_params: {model_params}", debug=DEBUG)
-        client = Together(**client_params)
+        client = get_client("together_ai", client_params, Together)
         response_raw = client.chat.completions.create(**model_params)
         response['response'] = response_raw.choices[0].message.content
         response['refined_prompt'] = pam_response['refined_prompt']
@@ -181,3 +181,9 @@ class TextToVideoProvider(LlmProviderAbstract):
         Perform a video generation request check
         """
         return self.llm.video_gen_followup(request_response, wait_time)
+
+    def video_gen_check(self, request_response: dict) -> dict:
+        """
+        Perform a single video generation status check, without waiting
+        """
+        return self.llm.video_gen_check(request_response)
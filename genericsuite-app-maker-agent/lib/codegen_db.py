@@ -4,6 +4,7 @@ Generic database
 from lib.codegen_db_abstracts import DatabaseAbstract
 from lib.codegen_db_json import JsonFileDatabase
 from lib.codegen_db_mongodb import MongoDBDatabase
+from lib.codegen_db_sqlite import SqliteDatabase
 # from lib.codegen_utilities import log_debug
 
 
@@ -40,8 +41,16 @@ class CodegenDatabase(DatabaseAbstract):
             #           f"collection_name: {collection_name}",
             #           debug=DEBUG)
             self.db = MongoDBDatabase(uri, db_name, collection_name)
+        elif db_type == 'sqlite':
+            db_path = self.other_data.get('SQLITE_DB_PATH')
+            if not db_path:
+                raise ValueError("Invalid SQLITE_DB_PATH in other_data")
+            # The JSON_DB_PATH conversations are imported on the first run
+            self.db = SqliteDatabase(
+                db_path, self.other_data.get('JSON_DB_PATH'))
         else:
-            raise ValueError("Invalid db_type. Must be 'json' or 'mongodb'")
+            raise ValueError(
+                "Invalid db_type. Must be 'json', 'mongodb' or 'sqlite'")
 
     def save_item(self, item_data: dict, id: str = None):
         """
@@ -55,6 +64,19 @@ class CodegenDatabase(DatabaseAbstract):
         """
         return self.db.get_list(sort_attr, sort_order)
 
+    def get_summaries(self, sort_attr: str = "timestamp",
+                      sort_order: str = "desc"):
+        """
+        Returns the id, title, type and timestamp of the items
+        """
+        return self.db.get_summaries(sort_attr, sort_order)
+
+    def get_answers(self, item_type: str):
+        """
+        Returns the non-empty answers of the items of the given type
+        """
+        return self.db.get_answers(item_type)
+
     def get_item(self, id: str):
         """
         Returns the item in the database
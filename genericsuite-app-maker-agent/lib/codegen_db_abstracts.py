@@ -37,6 +37,35 @@ class DatabaseAbstract:
         """
         raise NotImplementedError
 
+    def get_summaries(self, sort_attr: str = "timestamp",
+                      sort_order: str = "desc"):
+        """
+        Returns the id, title, type and timestamp of the items in the
+        database. Backends that can read only these fields should
+        override it.
+        """
+        return [
+            {
+                "id": item["id"],
+                "title": item.get("title") or
+                str(item.get("question") or "")[:100],
+                "type": item.get("type"),
+                "timestamp": item.get("timestamp"),
+            }
+            for item in self.get_list(sort_attr, sort_order)
+        ]
+
+    def get_answers(self, item_type: str):
+        """
+        Returns the non-empty answers of the items of the given type, newest
+        first. Backends that can filter by type should override it.
+        """
+        return [
+            item["answer"]
+            for item in self.get_list("timestamp", "desc")
+            if item.get("type") == item_type and item.get("answer")
+        ]
+
     def get_item(self, id: str):
         """
         Returns the item in the database
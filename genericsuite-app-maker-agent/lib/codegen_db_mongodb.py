@@ -3,20 +3,51 @@ MongoDB database
 """
 import uuid
 import os
+import threading
 
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING
 
 from lib.codegen_db_abstracts import DatabaseAbstract
 
 
+# Process-wide MongoClient instances (each one holds its own connection
+# pool), keyed by URI
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_mongo_client(uri: str) -> MongoClient:
+    """
+    Returns the shared MongoClient for the given URI, creating it on the
+    first call
+    """
+    with _clients_lock:
+        if uri not in _clients:
+            _clients[uri] = MongoClient(
+                uri,
+                maxPoolSize=int(os.environ.get('MONGODB_MAX_POOL_SIZE', 20)),
+            )
+        return _clients[uri]
+
+
 class MongoDBDatabase(DatabaseAbstract):
     """
     MongoDB database class
     """
     def __init__(self, uri, db_name, collection_name):
-        self.client = MongoClient(uri)
+        self.client = get_mongo_client(uri)
         self.db = self.client[db_name]
         self.collection = self.db[collection_name]
+        self.init_indexes()
+
+    def init_indexes(self):
+        """
+        Create the indexes used to list the conversations and the galleries
+        (it does nothing if they already exist)
+        """
+        self.collection.create_index(
+            [("type", ASCENDING), ("timestamp", DESCENDING)])
+        self.collection.create_index([("timestamp", DESCENDING)])
 
     def save_item(self, item_data: dict, id: str = None):
         """
@@ -42,6 +73,40 @@ class MongoDBDatabase(DatabaseAbstract):
             item['id'] = str(item['_id'])  # Convert ObjectId to str
         return items
 
+    def get_summaries(self, sort_attr: str = "timestamp",
+                      sort_order: str = "desc"):
+        """
+        Returns the id, title, type and timestamp of the items, without
+        reading the large fields (answer, refined_prompt, etc.)
+        """
+        pipeline = []
+        if sort_attr:
+            pipeline.append(
+                {"$sort": {sort_attr: -1 if sort_order == "desc" else 1}})
+        pipeline.append({"$project": {
+            "title": {"$ifNull": [
+                "$title",
+                {"$substrCP": [{"$ifNull": ["$question", ""]}, 0, 100]},
+            ]},
+            "type": 1,
+            "timestamp": 1,
+        }})
+        items = list(self.collection.aggregate(pipeline))
+        for item in items:
+            item['id'] = str(item.pop('_id'))
+        return items
+
+    def get_answers(self, item_type: str):
+        """
+        Returns the non-empty answers of the items of the given type, newest
+        first, using the (type, timestamp) index
+        """
+        items = self.collection.find(
+            {"type": item_type, "answer": {"$nin": [None, "", []]}},
+            {"answer": 1, "_id": 0},
+        ).sort("timestamp", DESCENDING)
+        return [item["answer"] for item in items]
+
     def get_item(self, id: str):
         """
         Returns the item from the MongoDB collection
@@ -0,0 +1,194 @@
+"""
+SQLite database
+"""
+import os
+import json
+import uuid
+import sqlite3
+import threading
+
+from lib.codegen_db_abstracts import DatabaseAbstract
+
+
+# Columns stored outside the JSON document, so they can be indexed and
+# listed without loading the full conversation
+SUMMARY_COLUMNS = ["id", "title", "type", "timestamp"]
+
+
+class SqliteDatabase(DatabaseAbstract):
+    """
+    SQLite database class
+    """
+    def __init__(self, db_path: str, json_db_path: str = None):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.init_db()
+        if json_db_path:
+            self.migrate_from_json(json_db_path)
+
+    def init_db(self):
+        """
+        Create the conversations table and its indexes
+        """
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                " id TEXT PRIMARY KEY,"
+                " type TEXT,"
+                " title TEXT,"
+                " timestamp REAL,"
+                " data TEXT NOT NULL)")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conversations_timestamp"
+                " ON conversations (timestamp)")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conversations_type_timestamp"
+                " ON conversations (type, timestamp)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS migrations ("
+                " name TEXT PRIMARY KEY,"
+                " result TEXT)")
+
+    def get_row_values(self, item_data: dict, id: str) -> tuple:
+        """
+        Returns the column values to store the item
+        """
+        item_data = dict(item_data)
+        item_data.pop('id', None)
+        title = item_data.get('title') or \
+            str(item_data.get('question') or '')[:100]
+        return (
+            id,
+            item_data.get('type'),
+            title,
+            item_data.get('timestamp'),
+            json.dumps(item_data),
+        )
+
+    def save_item(self, item_data: dict, id: str = None):
+        """
+        Save the item in the database
+        """
+        if not id:
+            id = str(uuid.uuid4())
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO conversations"
+                " (id, type, title, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+                self.get_row_values(item_data, id))
+        return id
+
+    def get_order_by(self, sort_attr: str = None, sort_order: str = "desc"):
+        """
+        Returns the ORDER BY clause for the indexed columns, or None if the
+        items must be sorted after reading them
+        """
+        if not sort_attr:
+            return ""
+        if sort_attr not in SUMMARY_COLUMNS:
+            return None
+        return f" ORDER BY {sort_attr} " + \
+            ("DESC" if sort_order == "desc" else "ASC")
+
+    def get_list(self, sort_attr: str = None, sort_order: str = "desc"):
+        """
+        Returns the items in the database
+        """
+        order_by = self.get_order_by(sort_attr, sort_order)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, data FROM conversations" + (order_by or "")
+            ).fetchall()
+        items = []
+        for row in rows:
+            item = json.loads(row['data'])
+            item['id'] = row['id']
+            items.append(item)
+        if order_by is None:
+            items = sorted(items, key=lambda x: x[sort_attr],
+                           reverse=sort_order == "desc")
+        return items
+
+    def get_summaries(self, sort_attr: str = "timestamp",
+                      sort_order: str = "desc"):
+        """
+        Returns the id, title, type and timestamp of the items, without
+        reading the full conversations
+        """
+        order_by = self.get_order_by(sort_attr, sort_order) or ""
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM conversations" +
+                order_by
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_answers(self, item_type: str):
+        """
+        Returns the non-empty answers of the items of the given type, newest
+        first, using the (type, timestamp) index
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT data FROM conversations WHERE type = ?"
+                " ORDER BY timestamp DESC", (item_type,)
+            ).fetchall()
+        answers = []
+        for row in rows:
+            answer = json.loads(row['data']).get('answer')
+            if answer:
+                answers.append(answer)
+        return answers
+
+    def get_item(self, id: str):
+        """
+        Returns the item in the database
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, data FROM conversations WHERE id = ?", (id,)
+            ).fetchone()
+        if row:
+            item = json.loads(row['data'])
+            item['id'] = row['id']
+            return item
+        return None
+
+    def delete_item(self, id: str):
+        """
+        Delete an item from the database
+        """
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM conversations WHERE id = ?", (id,))
+
+    def migrate_from_json(self, json_db_path: str):
+        """
+        One-shot import of the conversations in a JsonFileDatabase file.
+        The migration is recorded so it's not repeated on the next start.
+        """
+        migration_name = f"json:{os.path.abspath(json_db_path)}"
+        with self.lock:
+            already_migrated = self.conn.execute(
+                "SELECT 1 FROM migrations WHERE name = ?", (migration_name,)
+            ).fetchone()
+        if already_migrated or not os.path.exists(json_db_path):
+            return None
+
+        with open(json_db_path, 'r') as f:
+            json_db = json.load(f)
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO conversations"
+                " (id, type, title, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+                [self.get_row_values(item_data, id)
+                 for id, item_data in json_db.items()])
+            self.conn.execute(
+                "INSERT INTO migrations (name, result) VALUES (?, ?)",
+                (migration_name, f"Imported {len(json_db)} items"))
+        return len(json_db)
@@ -0,0 +1,390 @@
+"""
+Background video and image generation jobs
+"""
+import os
+import json
+import time
+import heapq
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.codegen_utilities import log_debug
+from lib.codegen_ai_utilities import (
+    TextToVideoProvider,
+    LlmProvider,
+    ImageGenProvider,
+)
+
+
+DEBUG = False
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_COMPLETED = "completed"
+JOB_STATUS_FAILED = "failed"
+
+PENDING_JOB_STATUSES = [JOB_STATUS_QUEUED, JOB_STATUS_RUNNING]
+
+# Columns returned to the UI status polling (the job parameters and
+# provider state are not needed there)
+STATUS_COLUMNS = ["id", "type", "status", "error", "attempts",
+                  "created_at", "updated_at"]
+
+
+class GenerationJobQueue:
+    """
+    Video and image generation job queue. The jobs are persisted in a SQLite
+    table and executed by a worker thread pool, so the generations don't
+    block the Streamlit sessions. Video generations are polled with an
+    exponential backoff until the provider returns the video URL, and the
+    conversation record is updated when each job finishes.
+    """
+    def __init__(
+        self,
+        db_path: str,
+        conversations_db,
+        max_workers: int = 4,
+        poll_initial_wait: float = 15,
+        poll_max_wait: float = 120,
+        max_wait: float = 30 * 60,
+    ):
+        self.db_path = db_path
+        self.conversations_db = conversations_db
+        self.poll_initial_wait = poll_initial_wait
+        self.poll_max_wait = poll_max_wait
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        # Serializes the conversation read-modify-write of the worker threads.
+        # The JSON file database rewrites the whole file on each save, so
+        # the updates of different conversations must not overlap either
+        self.conversations_lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.init_db()
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="generation_job")
+        self.schedule = []
+        self.schedule_condition = threading.Condition()
+        self.scheduler = threading.Thread(
+            target=self.scheduler_loop, name="generation_job_scheduler",
+            daemon=True)
+        self.scheduler.start()
+        self.resume_jobs()
+
+    def init_db(self):
+        """
+        Create the jobs table
+        """
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS generation_jobs ("
+                " id TEXT PRIMARY KEY,"
+                " type TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " params TEXT NOT NULL,"
+                " state TEXT NOT NULL,"
+                " error TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_generation_jobs_status"
+                " ON generation_jobs (status)")
+
+    # Job table
+
+    def submit(
+        self,
+        job_type: str,
+        id: str,
+        question: str,
+        prompt_enhancement_text: str,
+        model_params: dict,
+        text_model_params: dict,
+        state: dict = None,
+    ) -> str:
+        """
+        Persist a new "video" or "image" generation job and schedule it.
+        The id is the conversation id, so the conversation can be updated
+        when the job finishes. The model parameters must not include the
+        text model class, only its parameters, so the job can be resumed
+        after a restart.
+        """
+        params = {
+            "question": question,
+            "prompt_enhancement_text": prompt_enhancement_text,
+            "model_params": model_params,
+            "text_model_params": text_model_params,
+        }
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO generation_jobs"
+                " (id, type, status, params, state, error, attempts,"
+                " created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, NULL, 0, ?, ?)",
+                (id, job_type, JOB_STATUS_QUEUED,
+                 json.dumps(params, default=list),
+                 json.dumps(state or {}), now, now))
+        log_debug(f"GenerationJobQueue | submitted {job_type} job {id}",
+                  debug=DEBUG)
+        self.schedule_job(id)
+        return id
+
+    def get_job_status(self, id: str):
+        """
+        Returns the job status (without its parameters), or None if the
+        job doesn't exist. It's a primary key read, so the UI can call it on
+        every refresh.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT {', '.join(STATUS_COLUMNS)} FROM generation_jobs"
+                " WHERE id = ?", (id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_job(self, id: str):
+        """
+        Returns the full job, with its parameters and state
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM generation_jobs WHERE id = ?", (id,)
+            ).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["state"] = json.loads(job["state"])
+        return job
+
+    def save_job(self, job: dict):
+        """
+        Save the job status, state, error and attempts
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE generation_jobs SET status = ?, state = ?, error = ?,"
+                " attempts = ?, updated_at = ? WHERE id = ?",
+                (job["status"], json.dumps(job["state"]), job["error"],
+                 job["attempts"], time.time(), job["id"]))
+
+    def resume_jobs(self):
+        """
+        Schedule the jobs that were pending when the process stopped
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id FROM generation_jobs WHERE status IN (?, ?)",
+                tuple(PENDING_JOB_STATUSES)
+            ).fetchall()
+        for row in rows:
+            log_debug(f"GenerationJobQueue | resuming job {row['id']}",
+                      debug=DEBUG)
+            self.schedule_job(row["id"])
+
+    # Scheduler
+
+    def schedule_job(self, id: str, delay: float = 0):
+        """
+        Run the next job step after the given delay in seconds
+        """
+        with self.schedule_condition:
+            heapq.heappush(self.schedule, (time.time() + delay, id))
+            self.schedule_condition.notify()
+
+    def scheduler_loop(self):
+        """
+        Send the due job steps to the worker pool
+        """
+        while True:
+            with self.schedule_condition:
+                while not self.schedule or \
+                      self.schedule[0][0] > time.time():
+                    timeout = None
+                    if self.schedule:
+                        timeout = self.schedule[0][0] - time.time()
+                    self.schedule_condition.wait(timeout)
+                _, id = heapq.heappop(self.schedule)
+            self.executor.submit(self.run_job, id)
+
+    # Job execution
+
+    def run_job(self, id: str):
+        """
+        Run the next step of the job
+        """
+        job = self.get_job(id)
+        if not job or job["status"] not in PENDING_JOB_STATUSES:
+            return
+        job["status"] = JOB_STATUS_RUNNING
+        job["attempts"] += 1
+        self.save_job(job)
+        try:
+            if job["type"] == "video":
+                self.run_video_step(job)
+            elif job["type"] == "image":
+                self.run_image_step(job)
+            else:
+                self.fail_job(
+                    job, f"ERROR E-JOB-100: Invalid job type: {job['type']}")
+        except Exception as err:
+            log_debug(f"GenerationJobQueue | job {id} | error: {err}",
+                      debug=True)
+            self.fail_job(job, f"ERROR E-JOB-200: {err}")
+
+    def get_model_params(self, job: dict) -> dict:
+        """
+        Returns the generation model parameters, with the text model class
+        used to enhance the prompt
+        """
+        model_params = dict(job["params"]["model_params"])
+        model_params["text_model_class"] = LlmProvider(
+            job["params"]["text_model_params"])
+        return model_params
+
+    def run_image_step(self, job: dict):
+        """
+        Generate the image
+        """
+        image_model = ImageGenProvider(self.get_model_params(job))
+        response = image_model.image_gen(
+            job["params"]["question"],
+            job["params"]["prompt_enhancement_text"])
+        if response['error']:
+            self.fail_job(
+                job, f"ERROR E-IG-100: {response['error_message']}",
+                {"refined_prompt": response.get('refined_prompt')})
+            return
+        self.complete_job(job, {
+            "answer": response.get('response'),
+            "refined_prompt": response.get('refined_prompt'),
+        })
+
+    def run_video_step(self, job: dict):
+        """
+        Request the video generation, or check its status if it was already
+        requested. Pending videos are checked again with an exponential
+        backoff, up to max_wait seconds after the request.
+        """
+        ttv_model = TextToVideoProvider(self.get_model_params(job))
+        state = job["state"]
+
+        if not state.get("ttv_response"):
+            response = ttv_model.video_gen(
+                job["params"]["question"],
+                job["params"]["prompt_enhancement_text"])
+            if response['error']:
+                self.fail_job(job, f"ERROR E-200: {response['error_message']}")
+                return
+            ttv_response = response.copy()
+            ttv_response['id'] = job["id"]
+            state["ttv_response"] = ttv_response
+            state["requested_at"] = time.time()
+            state["checks"] = 0
+            self.update_conversation(job["id"], {
+                "ttv_response": ttv_response,
+                "refined_prompt": ttv_response.get('refined_prompt'),
+            })
+            self.reschedule_job(job, self.poll_initial_wait)
+            return
+
+        response = ttv_model.video_gen_check(state["ttv_response"])
+        state["checks"] = state.get("checks", 0) + 1
+        if response['error']:
+            self.fail_job(
+                job, f"ERROR E-300: {response['error_message']}",
+                {"ttv_followup_response":
+                    response.get("ttv_followup_response")})
+            return
+        if response.get("video_url"):
+            self.complete_job(job, {"answer": response["video_url"]})
+            return
+        requested_at = state.get("requested_at") or job["created_at"]
+        if time.time() - requested_at > self.max_wait:
+            self.fail_job(
+                job,
+                "ERROR E-400: Video generation failed."
+                " No video URL. Try again later by clicking"
+                " the corresponding previous answer.",
+                {"ttv_followup_response":
+                    response.get("ttv_followup_response")})
+            return
+        self.reschedule_job(job, min(
+            self.poll_initial_wait * 2 ** (state["checks"] - 1),
+            self.poll_max_wait))
+
+    def reschedule_job(self, job: dict, delay: float):
+        """
+        Save the job state and run its next step after the delay
+        """
+        self.save_job(job)
+        self.schedule_job(job["id"], delay)
+
+    def complete_job(self, job: dict, conversation_data: dict):
+        """
+        Mark the job as completed and save the result in the conversation
+        """
+        job["status"] = JOB_STATUS_COMPLETED
+        job["error"] = None
+        self.save_job(job)
+        conversation_data["job_status"] = JOB_STATUS_COMPLETED
+        conversation_data["error_message"] = None
+        self.update_conversation(job["id"], conversation_data)
+
+    def fail_job(self, job: dict, error_message: str,
+                 conversation_data: dict = None):
+        """
+        Mark the job as failed and save the error in the conversation
+        """
+        job["status"] = JOB_STATUS_FAILED
+        job["error"] = error_message
+        self.save_job(job)
+        conversation_data = dict(conversation_data or {})
+        conversation_data["job_status"] = JOB_STATUS_FAILED
+        conversation_data["error_message"] = error_message
+        self.update_conversation(job["id"], conversation_data)
+
+    def update_conversation(self, id: str, conversation_data: dict):
+        """
+        Update the conversation attributes in the conversations database
+        """
+        with self.conversations_lock:
+            item = self.conversations_db.get_item(id)
+            if not item:
+                # The conversation was deleted while the job was running
+                log_debug(
+                    f"GenerationJobQueue | conversation {id} not found",
+                    debug=DEBUG)
+                return
+            item.pop('id', None)
+            item.pop('_id', None)
+            item.update(conversation_data)
+            self.conversations_db.save_item(item, id)
+
+
+def get_generation_job_queue(conversations_db) -> GenerationJobQueue:
+    """
+    Create the generation job queue configured through the environment:
+    GENERATION_JOBS_DB_PATH, GENERATION_JOB_WORKERS,
+    GENERATION_JOB_POLL_INITIAL_WAIT, GENERATION_JOB_POLL_MAX_WAIT and
+    GENERATION_JOB_MAX_WAIT (in seconds)
+    """
+    return GenerationJobQueue(
+        db_path=os.getenv('GENERATION_JOBS_DB_PATH',
+                          './db/generation_jobs.sqlite'),
+        conversations_db=conversations_db,
+        max_workers=int(os.getenv('GENERATION_JOB_WORKERS', '4')),
+        poll_initial_wait=float(
+            os.getenv('GENERATION_JOB_POLL_INITIAL_WAIT', '15')),
+        poll_max_wait=float(os.getenv('GENERATION_JOB_POLL_MAX_WAIT', '120')),
+        max_wait=float(os.getenv('GENERATION_JOB_MAX_WAIT', str(30 * 60))),
+    )
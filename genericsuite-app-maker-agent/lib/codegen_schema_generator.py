@@ -6,15 +6,15 @@ codegen_schema_generator.py
 import os
 # import sys
 import time
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 import json
 import pprint
 
 import argparse
 
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
-
 from lib.codegen_ai_utilities import LlmProvider
 from lib.codegen_utilities import (
     get_default_resultset,
@@ -22,6 +22,7 @@ from lib.codegen_utilities import (
 )
 from lib.codegen_utilities import get_app_config
 from lib.codegen_llamaindex_abstraction import LlamaIndexCustomLLM
+from lib.codegen_vector_index import get_vector_index
 # from lib.codegen_utilities import log_debug
 
 DEBUG = False
@@ -50,6 +51,7 @@ DEFAULT_TEMPERATURE = "0.5"
 DEFAULT_STREAM = ""
 
 DEFAULT_AGENTS_COUNT = 0
+DEFAULT_MAX_PARALLEL_AGENTS = 4
 
 OLLAMA_BASE_URL = ""
 # OLLAMA_BASE_URL = "localhost:11434"
@@ -120,6 +122,10 @@ class ArgsClass:
         self.stream = params.get("stream", DEFAULT_STREAM)
         self.ollama_base_url = params.get("ollama_base_url", OLLAMA_BASE_URL)
         self.agents_count = params.get("agents_count", DEFAULT_AGENTS_COUNT)
+        self.max_parallel_agents = params.get(
+            "max_parallel_agents",
+            int(os.environ.get(
+                "MAX_PARALLEL_AGENTS", DEFAULT_MAX_PARALLEL_AGENTS)))
 
 
 class JsonGenerator:
@@ -134,6 +140,9 @@ class JsonGenerator:
         self.args = self.read_arguments(params)
         self.embeddings_sources_dir = self.params.get(
             "embeddings_sources_dir", "./embeddings_sources")
+        self.embeddings_index_dir = self.params.get(
+            "embeddings_index_dir",
+            os.environ.get("EMBEDDINGS_INDEX_DIR", "./embeddings_index"))
         self.reference_files = self.get_reference_files()
         self.system_prompt = SYSTEM_PROMPT
         self.user_input = self.get_user_input()
@@ -141,6 +150,12 @@ class JsonGenerator:
         self.final_summary = None
         self.provider_model_used = None
         self.model_config = {}
+        self.step_timings = {}
+        self.step_errors = {}
+        # LLM provider objects, reused by all the steps using the same model.
+        # The steps run in worker threads, so the lookup is guarded by a lock
+        self.llm_models = {}
+        self.llm_models_lock = threading.Lock()
 
     def read_arguments(self, params):
         """
@@ -208,6 +223,14 @@ class JsonGenerator:
             default=DEFAULT_AGENTS_COUNT,
             help=f'Number of agents to use. Default: {DEFAULT_AGENTS_COUNT}'
         )
+        parser.add_argument(
+            '--max_parallel_agents',
+            type=int,
+            default=int(os.environ.get(
+                "MAX_PARALLEL_AGENTS", DEFAULT_MAX_PARALLEL_AGENTS)),
+            help='Maximum number of agent steps executed at the same ' +
+                 f'time. Default: {DEFAULT_MAX_PARALLEL_AGENTS}'
+        )
         parser.add_argument(
             '--ollama_base_url',
             type=str,
@@ -332,7 +355,7 @@ class JsonGenerator:
         """
         Returns the LLM model object
         """
-        self.model_config = {
+        model_config = {
             'model_name': model,
             "provider": self.args.provider,
             "temperature": self.args.temperature,
@@ -340,12 +363,15 @@ class JsonGenerator:
             "ollama_base_url": self.args.ollama_base_url,
         }
         # no_system_prompt = (self.args.provider in ["nvidia"])
-        self.provider_model_used = \
-            f"Provider: {self.args.provider}" + \
-            f" | Model: {self.model_config['model_name']}"
-        # self.log_debug_structured(self.model_config)
-        llm_model = LlmProvider(self.model_config)
-        return llm_model
+        # self.log_debug_structured(model_config)
+        with self.llm_models_lock:
+            self.model_config = model_config
+            self.provider_model_used = \
+                f"Provider: {self.args.provider}" + \
+                f" | Model: {model_config['model_name']}"
+            if model not in self.llm_models:
+                self.llm_models[model] = LlmProvider(model_config)
+            return self.llm_models[model]
 
     def get_chat_response(self, model: str, prompt: str, user_input: str):
         """
@@ -367,9 +393,10 @@ class JsonGenerator:
         """
         llamaindex_llm = LlamaIndexCustomLLM()
         llamaindex_llm.init_custom_llm(self.get_llm_model_object(model))
-        documents = SimpleDirectoryReader(
-            self.embeddings_sources_dir).load_data()
-        index = VectorStoreIndex.from_documents(documents)
+        # The index is built once, persisted in embeddings_index_dir and
+        # only updated when the reference files change
+        index = get_vector_index(
+            self.embeddings_sources_dir, self.embeddings_index_dir)
         query_engine = index.as_query_engine(llm=llamaindex_llm)
         response = query_engine.query(user_input)
         self.log_debug(f"get_index_response | response:\n{response}")
@@ -436,16 +463,18 @@ class JsonGenerator:
             # self.log_debug_structured(messages)
 
             start_time = self.log_procesing_time(f"Agent step-{step_number}")
-            response = self.get_model_response(
-                model=self.get_model(),
-                prompt=system_prompt,
-                user_input=user_input,
-                # messages=messages
-            )
-
-            self.log_procesing_time(
-                message=f"Agent step-{step_number}",
-                start_time=start_time)
+            try:
+                response = self.get_model_response(
+                    model=self.get_model(),
+                    prompt=system_prompt,
+                    user_input=user_input,
+                    # messages=messages
+                )
+            finally:
+                end_time = self.log_procesing_time(
+                    message=f"Agent step-{step_number}",
+                    start_time=start_time)
+                self.step_timings[step_number] = end_time - start_time
             self.log_debug("")
             self.log_debug(f'Agent step-{step_number} response:')
             self.log_debug(response)
@@ -454,6 +483,49 @@ class JsonGenerator:
 
         return agent
 
+    def run_agents(self, agents: list, task: str) -> list:
+        """
+        Execute the step agents concurrently (up to max_parallel_agents at
+        the same time) and return their implementations in step order.
+        A failed step is reported in its implementation text and in
+        self.step_errors, without discarding the other steps results.
+        """
+        max_workers = max(1, min(
+            int(self.args.max_parallel_agents), len(agents)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(agent, task) for agent in agents]
+
+        implementations = []
+        for step_number, future in enumerate(futures, start=1):
+            try:
+                implementations.append(future.result())
+            except Exception as err:
+                self.step_errors[step_number] = str(err)
+                implementations.append(
+                    f"Step {step_number} could not be implemented: {err}")
+
+        if len(self.step_errors) == len(agents):
+            raise ValueError(
+                "All agent steps failed: " +
+                " | ".join(f"step-{step_number}: {error}"
+                           for step_number, error
+                           in self.step_errors.items()))
+        return implementations
+
+    def log_step_timings(self):
+        """
+        Prints the processing time of each agent step
+        """
+        print("")
+        print("Agent steps processing time:")
+        for step_number in sorted(self.step_timings):
+            status = " (failed)" if step_number in self.step_errors else ""
+            print(
+                f"  Agent step-{step_number}: " +
+                self.get_elapsed_time_formatted(
+                    self.step_timings[step_number]) +
+                status)
+
     def get_reference_files(self):
         """
         Returns the reference files to be used
@@ -526,11 +598,17 @@ class JsonGenerator:
         initial_plan = self.CEO_Agent(
             f'{self.system_prompt}\n{self.user_input}')
 
-        # Step # 2: Create agents, execute all agent steps, and get detailed
+        # Step # 2: Create agents, execute all agent steps concurrently
+        # (each step only depends on the initial plan), and get detailed
         # implementation for each step
         agents = [self.create_agent(i)
                   for i in range(1, self.args.agents_count + 1)]
-        implementations = [agent(initial_plan) for agent in agents]
+        steps_start_time = self.log_procesing_time(
+            f"Agent steps (max. {self.args.max_parallel_agents} in parallel)")
+        implementations = self.run_agents(agents, initial_plan)
+        self.log_procesing_time(
+            message="Agent steps", start_time=steps_start_time)
+        self.log_step_timings()
 
         # Step # 3: Combine everything to get the final summary from CEO
         self.final_input = \
@@ -601,6 +679,8 @@ class JsonGenerator:
         }
         if self.final_input:
             response["other_data"]["final_input"] = self.final_input
+        if self.step_errors:
+            response["other_data"]["step_errors"] = self.step_errors
 
         return response
 
@@ -20,16 +20,61 @@ from lib.codegen_utilities import (
     path_exists,
 )
 from lib.codegen_db import CodegenDatabase
-from lib.codegen_ai_utilities import (
-    TextToVideoProvider,
-    LlmProvider,
-    ImageGenProvider,
-)
+from lib.codegen_ai_utilities import LlmProvider
 from lib.codegen_powerpoint import PowerPointGenerator
+from lib.codegen_generation_jobs import (
+    GenerationJobQueue,
+    get_generation_job_queue,
+    JOB_STATUS_QUEUED,
+    PENDING_JOB_STATUSES,
+)
 
 
 DEBUG = False
 
+# Seconds between the generation job status checks in the UI
+GENERATION_JOB_REFRESH_SECONDS = float(
+    os.getenv('GENERATION_JOB_REFRESH_SECONDS', '5'))
+
+
+@st.cache_resource
+def get_database(db_type: str, db_params: tuple) -> CodegenDatabase:
+    """
+    Returns the process-wide database handle for the given type and
+    parameters, so the connection (and the MongoDB connection pool) is
+    reused across operations and Streamlit reruns
+    """
+    return CodegenDatabase(db_type, dict(db_params))
+
+
+@st.cache_resource
+def get_generation_jobs(_conversations_db) -> GenerationJobQueue:
+    """
+    Returns the process-wide video and image generation job queue, so the
+    generations keep running across Streamlit reruns and sessions
+    """
+    return get_generation_job_queue(_conversations_db)
+
+
+@st.fragment(run_every=GENERATION_JOB_REFRESH_SECONDS)
+def show_generation_job_status(jobs: GenerationJobQueue, id: str,
+                               job_type: str):
+    """
+    Show the generation job status, refreshing only this fragment until the
+    job finishes. Then the whole app is re-run to show the result.
+    """
+    job_status = jobs.get_job_status(id)
+    if not job_status or job_status["status"] not in PENDING_JOB_STATUSES:
+        # Reload the conversation with the generation result
+        st.session_state.pop("last_retrieved_conversation", None)
+        st.rerun()
+    elapsed = int(time.time() - job_status["created_at"])
+    message = f"{job_type.capitalize()} generation {job_status['status']}" \
+        f" ({elapsed}s)."
+    if job_type == "video":
+        message += " It can take 2+ minutes."
+    st.info(message + " You can keep using the app meanwhile.")
+
 
 @st.dialog("Form validation")
 def show_popup(title: str, message: str, msg_type: str = "success"):
@@ -133,26 +178,42 @@ class StreamlitLib:
 
     def init_db(self):
         """
-        Initialize the JSON file database
+        Returns the conversations database, shared by all sessions
         """
         db_type = os.getenv('DB_TYPE')
-        db = None
+        db_params = None
         if db_type == 'json':
-            db = CodegenDatabase("json", {
+            db_params = {
                 "JSON_DB_PATH": os.getenv(
                     'JSON_DB_PATH',
                     self.get_par_value("CONVERSATION_DB_PATH")
                 ),
-            })
+            }
         if db_type == 'mongodb':
-            db = CodegenDatabase("mongodb", {
+            db_params = {
                 "MONGODB_URI": os.getenv('MONGODB_URI'),
                 "MONGODB_DB_NAME": os.getenv('MONGODB_DB_NAME'),
                 "MONGODB_COLLECTION_NAME": os.getenv('MONGODB_COLLECTION_NAME')
-            })
-        if not db:
+            }
+        if db_type == 'sqlite':
+            db_params = {
+                "SQLITE_DB_PATH": os.getenv(
+                    'SQLITE_DB_PATH', './db/conversations.sqlite'),
+                "JSON_DB_PATH": os.getenv(
+                    'JSON_DB_PATH',
+                    self.get_par_value("CONVERSATION_DB_PATH")
+                ),
+            }
+        if not db_params:
             raise ValueError(f"Invalid DB_TYPE: {db_type}")
-        return db
+        return get_database(db_type, tuple(sorted(db_params.items())))
+
+    def init_generation_jobs(self) -> GenerationJobQueue:
+        """
+        Returns the video and image generation job queue, shared by all
+        sessions
+        """
+        return get_generation_jobs(self.init_db())
 
     def update_conversations(self):
         """
@@ -208,10 +269,11 @@ class StreamlitLib:
 
     def get_conversations(self):
         """
-        Returns the conversations in the database
+        Returns the conversations summaries (id, title, type and timestamp)
+        in the database, to be listed in the side bar
         """
         db = self.init_db()
-        conversations = db.get_list("timestamp", "desc")
+        conversations = db.get_summaries("timestamp", "desc")
         # Add the date_time field to each conversation
         for conversation in conversations:
             conversation['date_time'] = get_date_time(
@@ -589,10 +651,7 @@ class StreamlitLib:
                         self.verify_and_show_resource(
                             conversation['answer'], "video")
             else:
-                self.video_generation(
-                    result_container=container,
-                    question=conversation['question'],
-                    previous_response=conversation['ttv_response'])
+                self.show_generation_job(conversation, container)
 
         elif conversation['type'] == "image":
             if conversation.get('answer'):
@@ -608,9 +667,7 @@ class StreamlitLib:
                         self.verify_and_show_resource(
                             conversation['answer'], "image")
             else:
-                with container.container():
-                    self.show_conversation_debug(conversation)
-                    st.write("ERROR: No image found as answer")
+                self.show_generation_job(conversation, container)
 
         else:
             with container.container():
@@ -633,6 +690,42 @@ class StreamlitLib:
                                 conversation["presentation_file_path"],
                                 "other")
 
+    def show_generation_job(self, conversation: dict,
+                            container: st.container):
+        """
+        Show the status of a video or image generation without answer
+        """
+        jobs = self.init_generation_jobs()
+        job_status = jobs.get_job_status(conversation['id'])
+        if job_status and \
+           job_status['status'] not in PENDING_JOB_STATUSES and \
+           conversation.get('job_status') != job_status['status']:
+            # The job finished after the conversation was buffered
+            conversation = self.get_conversation(conversation['id']) or \
+                conversation
+            self.set_last_retrieved_conversation(
+                conversation['id'], conversation)
+            if conversation.get('answer'):
+                st.rerun()
+
+        with container.container():
+            self.show_conversation_debug(conversation)
+            if job_status and job_status['status'] in PENDING_JOB_STATUSES:
+                show_generation_job_status(
+                    jobs, conversation['id'], conversation['type'])
+                return
+            if conversation.get('error_message'):
+                st.warning(conversation['error_message'])
+            if conversation['type'] == "video" and \
+               conversation.get('ttv_response'):
+                if st.button("Check the video generation again"):
+                    self.video_generation(
+                        result_container=container,
+                        question=conversation['question'],
+                        previous_response=conversation['ttv_response'])
+            elif conversation['type'] == "image":
+                st.write("ERROR: No image found as answer")
+
     def show_conversation_question(self, id: str):
         if not id:
             return
@@ -1415,36 +1508,33 @@ class StreamlitLib:
             "ai_text_model_provider": llm_text_model_elements['llm_provider'],
             "ai_text_model_model": llm_text_model_elements['llm_model'],
         }
-        with st.spinner("Procesing image generation..."):
-            model_params = {
-                # "provider": self.get_par_or_env("TEXT_TO_IMAGE_PROVIDER"),
-                "provider": llm_provider,
-                "model_name": llm_model,
-                "text_model_class": llm_text_model_elements['class'],
-            }
-            model_params.update(self.get_model_configurations())
-
-            llm_model = ImageGenProvider(model_params)
+        model_params = {
+            # "provider": self.get_par_or_env("TEXT_TO_IMAGE_PROVIDER"),
+            "provider": llm_provider,
+            "model_name": llm_model,
+        }
+        model_params.update(self.get_model_configurations())
 
-            response = llm_model.image_gen(
-                question,
-                (self.get_par_value("REFINE_LLM_PROMPT_TEXT") if
-                 st.session_state.prompt_enhancement_flag else None)
-            )
-            if response['error']:
-                # result_container.write(
-                #     f"ERROR E-IG-100: {response['error_message']}")
-                other_data["error_message"] = (
-                    f"ERROR E-IG-100: {response['error_message']}")
-            self.save_conversation(
-                type="image",
-                question=question,
-                refined_prompt=response.get('refined_prompt'),
-                answer=response.get('response'),
-                other_data=other_data,
-            )
-            # result_container.write(response['response'])
-            st.rerun()
+        # Save a preliminar conversation and generate the image in the
+        # background job queue, which saves the result in the conversation
+        other_data["job_status"] = JOB_STATUS_QUEUED
+        image_id = self.save_conversation(
+            type="image",
+            question=question,
+            answer=None,
+            other_data=other_data,
+        )
+        self.init_generation_jobs().submit(
+            job_type="image",
+            id=image_id,
+            question=question,
+            prompt_enhancement_text=(
+                self.get_par_value("REFINE_LLM_PROMPT_TEXT") if
+                st.session_state.prompt_enhancement_flag else None),
+            model_params=model_params,
+            text_model_params=llm_text_model_elements['class'].params,
+        )
+        st.rerun()
 
     def video_generation(
         self,
@@ -1474,92 +1564,66 @@ class StreamlitLib:
             # "provider": self.get_par_or_env("TEXT_TO_VIDEO_PROVIDER"),
             "provider": llm_provider,
             "model_name": llm_model,
-            "text_model_class": llm_text_model_elements['class'],
         }
         model_params.update(self.get_model_configurations())
-        ttv_model = TextToVideoProvider(model_params)
+        jobs = self.init_generation_jobs()
 
         if previous_response:
-            response = previous_response.copy()
-            video_id = response['id']
-        else:
-            video_id = get_new_item_id()
-            if not question:
-                question = st.session_state.question
-            if not self.validate_question(question,
-               settings.get("assign_global")):
-                return
-            with st.spinner("Requesting the video generation..."):
-                # Requesting the video generation
-                response = ttv_model.video_gen(
-                    question,
-                    (self.get_par_value("REFINE_VIDEO_PROMPT_TEXT") if
-                     st.session_state.prompt_enhancement_flag else None)
-                )
-                if response['error']:
-                    result_container.write(
-                        f"ERROR E-200: {response['error_message']}")
-                    return
-
-        with st.spinner("Procesing video generation. It can take"
-                        " 2+ minutes..."):
-            #  Checking the video generation status
-            video_url = None
-            ttv_response = response.copy()
-            ttv_response['id'] = video_id
-
-            # Save a preliminar conversation with the video generation request
-            # follow-up data in the ttv_response attribute
-            other_data = {
-                "ttv_response": ttv_response,
-                "ai_provider": llm_provider,
-                "ai_model": llm_model,
-                "ai_text_model_provider":
-                    llm_text_model_elements['llm_provider'],
-                "ai_text_model_model": llm_text_model_elements['llm_model'],
-            }
-            self.save_conversation(
-                type="video",
-                question=question,
-                refined_prompt=ttv_response.get('refined_prompt'),
-                answer=video_url,
-                other_data=other_data,
+            # Check the status of a previous video generation request again
+            video_id = previous_response['id']
+            jobs.update_conversation(video_id, {
+                "job_status": JOB_STATUS_QUEUED,
+                "error_message": None,
+            })
+            jobs.submit(
+                job_type="video",
                 id=video_id,
-            )
-
-            response = ttv_model.video_gen_followup(ttv_response)
-            if response['error']:
-                other_data["error_message"] = (
-                    f"ERROR E-300: {response['error_message']}")
-            elif response.get("video_url"):
-                video_url = response["video_url"]
-            else:
-                other_data["error_message"] = (
-                    "ERROR E-400: Video generation failed."
-                    " No video URL. Try again later by clicking"
-                    " the corresponding previous answer.")
-                if response.get("ttv_followup_response"):
-                    other_data["ttv_followup_response"] = \
-                        response["ttv_followup_response"]
-
-            if previous_response and other_data.get("error_message"):
-                result_container.warning(other_data["error_message"])
-                return
-
-            # Save the conversation with the video generation result
-            self.save_conversation(
-                type="video",
                 question=question,
-                refined_prompt=ttv_response.get('refined_prompt'),
-                answer=video_url,
-                other_data=other_data,
-                id=video_id,
+                prompt_enhancement_text=None,
+                model_params=model_params,
+                text_model_params=llm_text_model_elements['class'].params,
+                state={
+                    "ttv_response": previous_response,
+                    "requested_at": time.time(),
+                },
             )
+            st.session_state.pop("last_retrieved_conversation", None)
+            st.rerun()
 
-            if previous_response:
-                result_container.video(video_url)
-            else:
-                st.rerun()
+        if not question:
+            question = st.session_state.question
+        if not self.validate_question(question,
+                                      settings.get("assign_global")):
+            return
+
+        # Save a preliminar conversation and request the video generation in
+        # the background job queue. The job saves the video generation
+        # follow-up data in the ttv_response attribute, checks the video
+        # status and saves the video URL in the conversation when it's done.
+        other_data = {
+            "ai_provider": llm_provider,
+            "ai_model": llm_model,
+            "ai_text_model_provider": llm_text_model_elements['llm_provider'],
+            "ai_text_model_model": llm_text_model_elements['llm_model'],
+            "job_status": JOB_STATUS_QUEUED,
+        }
+        video_id = self.save_conversation(
+            type="video",
+            question=question,
+            answer=None,
+            other_data=other_data,
+        )
+        jobs.submit(
+            job_type="video",
+            id=video_id,
+            question=question,
+            prompt_enhancement_text=(
+                self.get_par_value("REFINE_VIDEO_PROMPT_TEXT") if
+                st.session_state.prompt_enhancement_flag else None),
+            model_params=model_params,
+            text_model_params=llm_text_model_elements['class'].params,
+        )
+        st.rerun()
 
     # Gallery management
 
@@ -1576,16 +1640,16 @@ class StreamlitLib:
         """
         response = get_default_resultset()
         response['urls'] = []
-        for conversation in st.session_state.conversations:
-            if conversation['type'] == item_type:
-                if conversation.get('answer'):
-                    # Check for list type entries, and add them individually
-                    # to the list so all entries must be strings urls
-                    if isinstance(conversation['answer'], list):
-                        for url in conversation['answer']:
-                            response['urls'].append(url)
-                    else:
-                        response['urls'].append(conversation['answer'])
+        db = self.init_db()
+        # The type filter is done by the database
+        for answer in db.get_answers(item_type):
+            # Check for list type entries, and add them individually
+            # to the list so all entries must be strings urls
+            if isinstance(answer, list):
+                for url in answer:
+                    response['urls'].append(url)
+            else:
+                response['urls'].append(answer)
         return response
 
     def show_gallery(self, galley_type: str):
@@ -0,0 +1,207 @@
+"""
+Persistent LlamaIndex vector index for the schema generator embeddings
+"""
+import os
+import json
+import hashlib
+import threading
+
+from llama_index.core import (
+    Settings,
+    SimpleDirectoryReader,
+    StorageContext,
+    VectorStoreIndex,
+    load_index_from_storage,
+)
+
+from lib.codegen_utilities import log_debug, create_dirs
+
+
+DEBUG = False
+
+MANIFEST_FILE_NAME = "index_manifest.json"
+
+# Process-wide index cache, keyed by the persist directory
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_file_hash(file_path: str) -> str:
+    """
+    Returns the SHA-256 hash of the file content
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def get_embed_model_name() -> str:
+    """
+    Returns the name of the configured embedding model, so the index is
+    rebuilt if the embedding model changes
+    """
+    embed_model = Settings.embed_model
+    return getattr(embed_model, "model_name", None) or \
+        type(embed_model).__name__
+
+
+class PersistentVectorIndex:
+    """
+    Vector index over the files in a source directory, persisted to disk
+    and updated only for the files whose content hash changed
+    """
+    def __init__(self, sources_dir: str, persist_dir: str):
+        self.sources_dir = sources_dir
+        self.persist_dir = persist_dir
+        self.manifest_path = os.path.join(persist_dir, MANIFEST_FILE_NAME)
+        self.manifest = None
+        self.index = None
+        self.lock = threading.Lock()
+
+    def read_manifest(self) -> dict:
+        """
+        Returns the persisted manifest, or an empty one if there is none
+        """
+        if not os.path.exists(self.manifest_path):
+            return {"embed_model": None, "files": {}}
+        with open(self.manifest_path, 'r') as f:
+            return json.load(f)
+
+    def get_source_hashes(self) -> dict:
+        """
+        Returns the content hash of each file in the source directory
+        """
+        return {
+            file_name: get_file_hash(os.path.join(self.sources_dir, file_name))
+            for file_name in sorted(os.listdir(self.sources_dir))
+            if not file_name.startswith(".")
+            and os.path.isfile(os.path.join(self.sources_dir, file_name))
+        }
+
+    def load_documents(self, file_names: list) -> list:
+        """
+        Load the documents of the given files, with the file path as the
+        document id so they can be replaced later
+        """
+        return SimpleDirectoryReader(
+            input_files=[os.path.join(self.sources_dir, file_name)
+                         for file_name in file_names],
+            filename_as_id=True,
+        ).load_data()
+
+    def build(self, source_hashes: dict):
+        """
+        Build the index from scratch
+        """
+        log_debug("PersistentVectorIndex | Building the index from scratch",
+                  debug=DEBUG)
+        documents = self.load_documents(list(source_hashes))
+        self.index = VectorStoreIndex.from_documents(documents)
+        self.manifest = {"embed_model": get_embed_model_name(), "files": {}}
+        for file_name, file_hash in source_hashes.items():
+            self.manifest["files"][file_name] = {
+                "hash": file_hash,
+                "doc_ids": [],
+            }
+        for document in documents:
+            file_name = os.path.basename(document.metadata["file_path"])
+            self.manifest["files"][file_name]["doc_ids"].append(
+                document.doc_id)
+
+    def update(self, source_hashes: dict) -> bool:
+        """
+        Re-embed the new or changed files and delete the removed ones.
+        Returns True if the index was changed.
+        """
+        indexed_files = self.manifest["files"]
+        changed_files = [
+            file_name for file_name, file_hash in source_hashes.items()
+            if indexed_files.get(file_name, {}).get("hash") != file_hash
+        ]
+        removed_files = [
+            file_name for file_name in indexed_files
+            if file_name not in source_hashes
+        ]
+        if not changed_files and not removed_files:
+            return False
+
+        log_debug("PersistentVectorIndex | Updating the index | "
+                  f"changed: {changed_files} | removed: {removed_files}",
+                  debug=DEBUG)
+        for file_name in changed_files + removed_files:
+            for doc_id in indexed_files.get(file_name, {}).get("doc_ids", []):
+                self.index.delete_ref_doc(doc_id, delete_from_docstore=True)
+            indexed_files.pop(file_name, None)
+
+        if changed_files:
+            documents = self.load_documents(changed_files)
+            for file_name in changed_files:
+                indexed_files[file_name] = {
+                    "hash": source_hashes[file_name],
+                    "doc_ids": [],
+                }
+            for document in documents:
+                self.index.insert(document)
+                file_name = os.path.basename(document.metadata["file_path"])
+                indexed_files[file_name]["doc_ids"].append(document.doc_id)
+        return True
+
+    def persist(self):
+        """
+        Save the index and its manifest to the persist directory
+        """
+        create_dirs(self.persist_dir)
+        self.index.storage_context.persist(persist_dir=self.persist_dir)
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.manifest, f, indent=4)
+
+    def get_index(self) -> VectorStoreIndex:
+        """
+        Returns the index, loading it from disk on first use and updating it
+        if the source files changed since it was built
+        """
+        with self.lock:
+            source_hashes = self.get_source_hashes()
+
+            if self.index is None:
+                manifest = self.read_manifest()
+                if manifest["embed_model"] == get_embed_model_name():
+                    log_debug("PersistentVectorIndex | Loading the index "
+                              f"from {self.persist_dir}", debug=DEBUG)
+                    storage_context = StorageContext.from_defaults(
+                        persist_dir=self.persist_dir)
+                    self.index = load_index_from_storage(storage_context)
+                    self.manifest = manifest
+                    if self.update(source_hashes):
+                        self.persist()
+                else:
+                    self.build(source_hashes)
+                    self.persist()
+            elif self.update(source_hashes):
+                self.persist()
+
+            return self.index
+
+
+def get_vector_index(sources_dir: str, persist_dir: str) -> VectorStoreIndex:
+    """
+    Returns the process-wide persistent vector index for the given
+    source and persist directories
+    """
+    with _indexes_lock:
+        persistent_index = _indexes.get(persist_dir)
+        if persistent_index is None or \
+           persistent_index.sources_dir != sources_dir:
+            persistent_index = PersistentVectorIndex(sources_dir, persist_dir)
+            _indexes[persist_dir] = persistent_index
+    return persistent_index.get_index()
+
+
+def clear_vector_index_cache():
+    """
+    Drop the in-memory indexes (the persisted ones are kept on disk)
+    """
+    with _indexes_lock:
+        _indexes.clear()
@@ -0,0 +1,95 @@
+"""
+benchmark_conversations_db.py
+Compares the JSON file and SQLite conversations databases with a given
+number of conversations: bulk load / migration, side bar listing,
+single item read, save and delete.
+
+Usage (from the repository root):
+    python scripts/benchmark_conversations_db.py [--count 10000]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+from lib.codegen_db_json import JsonFileDatabase  # noqa: E402
+from lib.codegen_db_sqlite import SqliteDatabase  # noqa: E402
+from lib.codegen_utilities import get_new_item_id  # noqa: E402
+
+
+def get_fake_conversation(index: int) -> dict:
+    """
+    Returns a conversation with a long answer, like the generated code ones
+    """
+    return {
+        "type": random.choice(["text", "image", "video"]),
+        "title": f"Conversation {index}",
+        "question": f"Give me the code for application number {index}",
+        "answer": "Lorem ipsum dolor sit amet. " * 200,
+        "refined_prompt": None,
+        "timestamp": time.time() - index,
+    }
+
+
+def timed(label: str, function, *args, **kwargs):
+    """
+    Runs the function and prints its elapsed time
+    """
+    start_time = time.time()
+    result = function(*args, **kwargs)
+    print(f"  {label}: {(time.time() - start_time) * 1000:.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=10000,
+                        help='Number of conversations. Default: 10000')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_db_path = os.path.join(tmp_dir, "conversations.json")
+        conversations = {
+            get_new_item_id(): get_fake_conversation(index)
+            for index in range(args.count)
+        }
+        with open(json_db_path, 'w') as f:
+            json.dump(conversations, f)
+        some_id = random.choice(list(conversations))
+        print(f"{args.count} conversations | JSON file size: "
+              f"{os.path.getsize(json_db_path) / 1024 / 1024:.1f} MB")
+
+        print("JSON file database:")
+        json_db = JsonFileDatabase(json_db_path)
+        timed("side bar list (get_list)", json_db.get_list,
+              "timestamp", "desc")
+        timed("side bar list (get_summaries)", json_db.get_summaries,
+              "timestamp", "desc")
+        timed("get_item", json_db.get_item, some_id)
+        new_id = timed("save_item", json_db.save_item,
+                       get_fake_conversation(args.count))
+        timed("delete_item", json_db.delete_item, new_id)
+
+        print("SQLite database:")
+        sqlite_db = timed(
+            "migration from the JSON file", SqliteDatabase,
+            os.path.join(tmp_dir, "conversations.sqlite"), json_db_path)
+        timed("side bar list (get_list)", sqlite_db.get_list,
+              "timestamp", "desc")
+        timed("side bar list (get_summaries)", sqlite_db.get_summaries,
+              "timestamp", "desc")
+        timed("get_item", sqlite_db.get_item, some_id)
+        new_id = timed("save_item", sqlite_db.save_item,
+                       get_fake_conversation(args.count))
+        timed("delete_item", sqlite_db.delete_item, new_id)
+        sqlite_db.conn.close()
+
+
+if __name__ == "__main__":
+    main()
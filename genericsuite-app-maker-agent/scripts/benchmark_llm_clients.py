@@ -0,0 +1,121 @@
+"""
+benchmark_llm_clients.py
+Measures the per-query overhead of LlmProvider when a fresh OpenAI client
+(and HTTP connection pool) is created for every query (previous behavior)
+vs. the shared client registry. The queries are sent to a local fake
+OpenAI-compatible server, so only the client overhead is measured.
+
+Usage (from the repository root):
+    python scripts/benchmark_llm_clients.py [--queries 50]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+from lib.codegen_ai_utilities import LlmProvider  # noqa: E402
+from lib.codegen_ai_clients import (  # noqa: E402
+    clear_client_registry,
+    get_client_registry_stats,
+)
+
+CHAT_COMPLETION = {
+    "id": "chatcmpl-benchmark",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "benchmark-model",
+    "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": "OK"},
+        "finish_reason": "stop",
+    }],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """
+    Answers every chat completion request with the same response, keeping
+    the connection alive
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps(CHAT_COMPLETION).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_queries(queries: int, fresh_clients: bool) -> list:
+    """
+    Returns the seconds spent by each query, including the LlmProvider
+    construction
+    """
+    timings = []
+    for _ in range(queries):
+        if fresh_clients:
+            clear_client_registry()
+        start_time = time.time()
+        llm_model = LlmProvider({
+            "provider": "openai",
+            "model_name": "benchmark-model",
+            "api_key": "benchmark-api-key",
+        })
+        response = llm_model.query("{question}", "Say OK")
+        timings.append(time.time() - start_time)
+        if response['error']:
+            raise RuntimeError(response['error_message'])
+    return timings
+
+
+def print_result(label: str, timings: list):
+    """
+    Prints the average, best and worst query timings
+    """
+    print(f"{label}: avg {sum(timings) / len(timings) * 1000:.2f} ms | "
+          f"min {min(timings) * 1000:.2f} ms | "
+          f"max {max(timings) * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queries', type=int, default=50,
+                        help='Number of queries per scenario. Default: 50')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = \
+        f"http://127.0.0.1:{server.server_address[1]}/v1"
+    try:
+        fresh_timings = run_queries(args.queries, fresh_clients=True)
+        print_result("Fresh client per query", fresh_timings)
+
+        clear_client_registry()
+        shared_timings = run_queries(args.queries, fresh_clients=False)
+        print_result("Shared client registry", shared_timings)
+        print(f"Registry stats: {get_client_registry_stats()}")
+
+        overhead = (sum(fresh_timings) / len(fresh_timings) -
+                    sum(shared_timings) / len(shared_timings))
+        print(f"Per-query overhead saved: {overhead * 1000:.2f} ms")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
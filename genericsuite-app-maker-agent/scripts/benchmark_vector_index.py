@@ -0,0 +1,103 @@
+"""
+benchmark_vector_index.py
+Compares the per-call latency of the schema generator embeddings retrieval
+when the index is rebuilt on every call (previous behavior) vs. the
+persistent index: cold (built and persisted), loaded from disk and warm
+(in memory).
+
+Usage (from the repository root):
+    python scripts/benchmark_vector_index.py [--calls 5] [--mock_embeddings]
+
+Without --mock_embeddings the configured LlamaIndex embedding model is used
+(OpenAI by default, so OPENAI_API_KEY must be set).
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+from llama_index.core import (  # noqa: E402
+    Settings,
+    SimpleDirectoryReader,
+    VectorStoreIndex,
+)
+from llama_index.core.embeddings import MockEmbedding  # noqa: E402
+
+from lib.codegen_vector_index import (  # noqa: E402
+    get_vector_index,
+    clear_vector_index_cache,
+)
+
+QUERY = "Give me the generic CRUD editor configuration JSON files " + \
+        "for a users table"
+
+
+def timed_retrieve(get_index) -> float:
+    """
+    Returns the seconds spent to get the index and retrieve the query nodes
+    """
+    start_time = time.time()
+    index = get_index()
+    index.as_retriever().retrieve(QUERY)
+    return time.time() - start_time
+
+
+def print_result(label: str, timings: list):
+    """
+    Prints the average and per-call timings
+    """
+    print(f"{label}: avg {sum(timings) / len(timings):.3f}s | " +
+          " ".join(f"{timing:.3f}s" for timing in timings))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=5,
+                        help='Number of calls per scenario. Default: 5')
+    parser.add_argument('--sources_dir', type=str,
+                        default="./embeddings_sources",
+                        help='Embeddings sources directory. ' +
+                             'Default: ./embeddings_sources')
+    parser.add_argument('--mock_embeddings', action='store_true',
+                        help='Use mock embeddings (no API calls)')
+    args = parser.parse_args()
+
+    if args.mock_embeddings:
+        Settings.embed_model = MockEmbedding(embed_dim=256)
+
+    persist_dir = tempfile.mkdtemp(prefix="embeddings_index_")
+    try:
+        print_result(
+            "Rebuilt on every call", [
+                timed_retrieve(lambda: VectorStoreIndex.from_documents(
+                    SimpleDirectoryReader(args.sources_dir).load_data()))
+                for _ in range(args.calls)])
+
+        print_result(
+            "Persistent index, cold (build and persist)",
+            [timed_retrieve(
+                lambda: get_vector_index(args.sources_dir, persist_dir))])
+
+        load_timings = []
+        for _ in range(args.calls):
+            clear_vector_index_cache()
+            load_timings.append(timed_retrieve(
+                lambda: get_vector_index(args.sources_dir, persist_dir)))
+        print_result("Persistent index, loaded from disk", load_timings)
+
+        print_result(
+            "Persistent index, warm (in memory)", [
+                timed_retrieve(
+                    lambda: get_vector_index(args.sources_dir, persist_dir))
+                for _ in range(args.calls)])
+    finally:
+        shutil.rmtree(persist_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
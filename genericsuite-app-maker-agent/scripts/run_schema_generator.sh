@@ -84,6 +84,9 @@ fi
 if [ "${AGENTS_COUNT}" != "" ]; then
     PARAMETERS="${PARAMETERS} --agents_count ${AGENTS_COUNT}"
 fi
+if [ "${MAX_PARALLEL_AGENTS}" != "" ]; then
+    PARAMETERS="${PARAMETERS} --max_parallel_agents ${MAX_PARALLEL_AGENTS}"
+fi
 
 echo ""
 echo "Executing: python schema_generator.py --user_input \"${USER_INPUT}\" --provider ${CODEGEN_AI_PROVIDER} ${PARAMETERS}"
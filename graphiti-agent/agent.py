@@ -1,26 +1,125 @@
 from __future__ import annotations
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 from rich.markdown import Markdown
 from rich.console import Console
 from rich.live import Live
 import asyncio
+import time
 import os
 
 from pydantic_ai.providers.openai import OpenAIProvider
 from pydantic_ai.models.openai import OpenAIModel
 from pydantic_ai import Agent, RunContext
 from graphiti_core import Graphiti
+from graphiti_core.helpers import DEFAULT_DATABASE
 
 load_dotenv()
 
+# ========== Search cache configuration ==========
+# Seconds a search result is reused while the graph doesn't change, and maximum cached searches
+SEARCH_CACHE_TTL = float(os.getenv('GRAPHITI_SEARCH_CACHE_TTL', '300'))
+SEARCH_CACHE_SIZE = int(os.getenv('GRAPHITI_SEARCH_CACHE_SIZE', '256'))
+# Rerank the facts by graph distance to the main node of the previous turn results
+CENTER_NODE_RERANK = os.getenv('GRAPHITI_CENTER_NODE_RERANK', 'false').lower() == 'true'
+
+# ========== Search cache ==========
+@dataclass
+class SearchMetric:
+    """Latency of one search_graphiti call."""
+    query: str
+    cached: bool
+    results: int
+    version_ms: float
+    total_ms: float
+
+@dataclass
+class GraphSearchCache:
+    """TTL cache of the search results, keyed by normalized query, graph version and center node.
+
+    The graph version changes with every episode write, also from other processes such as
+    llm_evolution.py, so a cached result is never reused after the knowledge graph changed.
+    """
+    ttl: float = SEARCH_CACHE_TTL
+    max_size: int = SEARCH_CACHE_SIZE
+    center_node_rerank: bool = CENTER_NODE_RERANK
+    entries: OrderedDict = field(default_factory=OrderedDict)
+    # Source node of the top fact of the latest search, and the one remembered for this turn
+    last_node_uuid: Optional[str] = None
+    center_node_uuid: Optional[str] = None
+    graph_version: Optional[Tuple] = None
+    metrics: List[SearchMetric] = field(default_factory=list)
+    turn_start: int = 0
+
+    def start_turn(self):
+        """Remember the main node of the previous turn as center node, and start the turn metrics."""
+        if self.center_node_rerank:
+            self.center_node_uuid = self.last_node_uuid
+        self.turn_start = len(self.metrics)
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.lower().split()).strip("?!. ")
+
+    def get(self, key: Tuple) -> Optional[List[GraphitiSearchResult]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        stored_at, results = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return results
+
+    def put(self, key: Tuple, results: List[GraphitiSearchResult]):
+        self.entries[key] = (time.monotonic(), results)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def turn_summary(self) -> Optional[str]:
+        """Latency of the searches of the current turn."""
+        turn_metrics = self.metrics[self.turn_start:]
+        if not turn_metrics:
+            return None
+        return " | ".join(
+            f"{'cached' if metric.cached else 'graph'} {metric.total_ms:.0f} ms "
+            f"(version {metric.version_ms:.0f} ms, {metric.results} facts): {metric.query}"
+            for metric in turn_metrics
+        )
+
+    def summary(self) -> str:
+        if not self.metrics:
+            return "No searches."
+        cached = [metric.total_ms for metric in self.metrics if metric.cached]
+        uncached = [metric.total_ms for metric in self.metrics if not metric.cached]
+        return (f"{len(self.metrics)} searches, {len(cached)} from the cache | "
+                f"avg graph search {sum(uncached) / len(uncached) if uncached else 0:.0f} ms, "
+                f"avg cached search {sum(cached) / len(cached) if cached else 0:.0f} ms")
+
+async def get_graph_version(graphiti: Graphiti) -> Tuple:
+    """Version of the knowledge graph: changes when episodes are added or the graph is cleared."""
+    records, _, _ = await graphiti.driver.execute_query(
+        """
+        MATCH (e:Episodic)
+        RETURN count(e) AS episodes, max(e.created_at) AS last_created_at
+        """,
+        database_=DEFAULT_DATABASE,
+        routing_='r',
+    )
+    record = records[0]
+    return record['episodes'], str(record['last_created_at'])
+
 # ========== Define dependencies ==========
 @dataclass
 class GraphitiDependencies:
     """Dependencies for the Graphiti agent."""
     graphiti_client: Graphiti
+    search_cache: Optional[GraphSearchCache] = None
 
 # ========== Helper function to get model configuration ==========
 def get_model():
@@ -62,10 +161,28 @@ async def search_graphiti(ctx: RunContext[GraphitiDependencies], query: str) ->
     """
     # Access the Graphiti client from dependencies
     graphiti = ctx.deps.graphiti_client
+    cache = ctx.deps.search_cache
+    start_time = time.perf_counter()
     
     try:
-        # Perform the search
-        results = await graphiti.search(query)
+        # Reuse the results of the same search while the graph didn't change
+        if cache:
+            graph_version = await get_graph_version(graphiti)
+            version_ms = (time.perf_counter() - start_time) * 1000
+            if cache.graph_version and graph_version[0] < cache.graph_version[0]:
+                # The graph was cleared, the remembered center node is gone
+                cache.last_node_uuid = cache.center_node_uuid = None
+            cache.graph_version = graph_version
+            key = (cache.normalize(query), graph_version, cache.center_node_uuid)
+            cached_results = cache.get(key)
+            if cached_results is not None:
+                cache.last_node_uuid = cached_results[0].source_node_uuid if cached_results else cache.last_node_uuid
+                cache.metrics.append(SearchMetric(query, True, len(cached_results), version_ms,
+                                                  (time.perf_counter() - start_time) * 1000))
+                return list(cached_results)
+
+        # Perform the search, reranked by distance to the center node if any
+        results = await graphiti.search(query, center_node_uuid=cache.center_node_uuid if cache else None)
         
         # Format the results
         formatted_results = []
@@ -83,8 +200,15 @@ async def search_graphiti(ctx: RunContext[GraphitiDependencies], query: str) ->
                 formatted_result.invalid_at = str(result.invalid_at)
             
             formatted_results.append(formatted_result)
+
+        if cache:
+            cache.put(key, formatted_results)
+            if formatted_results:
+                cache.last_node_uuid = formatted_results[0].source_node_uuid
+            cache.metrics.append(SearchMetric(query, False, len(formatted_results), version_ms,
+                                              (time.perf_counter() - start_time) * 1000))
         
-        return formatted_results
+        return list(formatted_results)
     except Exception as e:
         # Log the error but don't close the connection since it's managed by the dependency
         print(f"Error searching Graphiti: {str(e)}")
@@ -114,6 +238,7 @@ async def main():
 
     console = Console()
     messages = []
+    search_cache = GraphSearchCache()
     
     try:
         while True:
@@ -128,9 +253,10 @@ async def main():
             try:
                 # Process the user input and output the response
                 print("\n[Assistant]")
+                search_cache.start_turn()
                 with Live('', console=console, vertical_overflow='visible') as live:
-                    # Pass the Graphiti client as a dependency
-                    deps = GraphitiDependencies(graphiti_client=graphiti_client)
+                    # Pass the Graphiti client and the search cache as dependencies
+                    deps = GraphitiDependencies(graphiti_client=graphiti_client, search_cache=search_cache)
                     
                     async with graphiti_agent.run_stream(
                         user_input, message_history=messages, deps=deps
@@ -142,11 +268,16 @@ async def main():
                     
                     # Add the new messages to the chat history
                     messages.extend(result.all_messages())
+
+                turn_summary = search_cache.turn_summary()
+                if turn_summary:
+                    console.print(f"[dim]Searches: {turn_summary}[/dim]")
                 
             except Exception as e:
                 print(f"\n[Error] An error occurred: {str(e)}")
     finally:
         # Close the Graphiti connection when done
+        print(f"\nSearch metrics: {search_cache.summary()}")
         await graphiti_client.close()
         print("\nGraphiti connection closed.")
 
@@ -0,0 +1,246 @@
+"""
+Bulk Episode Ingestion
+
+Utility to add many episodes to Graphiti, e.g. thousands of historical episodes,
+instead of awaiting graphiti.add_episode for one episode after the other.
+
+Modes:
+- sequential: one add_episode per episode, in order (temporal edge invalidation, the slowest)
+- concurrent: add_episode with up to max_concurrency episodes at the same time. The episodes of
+  the same group_id can depend on each other, so they are started in order with at most
+  group_window of them in flight (1 by default: one after the other); the episodes of different
+  groups (separate graph partitions) run concurrently. Episodes without a group_id all share the
+  '' group, so they need distinct group_ids (or a group_window above 1, at the cost of the facts
+  of an episode possibly not seeing those of the previous ones) to actually run concurrently.
+- bulk: graphiti.add_episode_bulk in batches of batch_size episodes (the fastest, but Graphiti
+  skips the edge invalidation and date extraction steps in bulk)
+
+The episodes are dicts with 'content' (str or JSON-serializable), 'type' (EpisodeType or its
+value), 'description', and optionally 'name', 'reference_time' and 'group_id'. Without a
+reference_time, the episodes get increasing reference times in list order, so their temporal
+order is kept.
+
+Usage:
+    python bulk_ingest.py episodes.jsonl [--mode bulk] [--batch-size 20] [--max-concurrency 4] [--group-window 1]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from logging import INFO
+
+from dotenv import load_dotenv
+from graphiti_core import Graphiti
+from graphiti_core.nodes import EpisodeType
+from graphiti_core.utils.bulk_utils import RawEpisode
+
+# Configure logging
+logging.basicConfig(
+    level=INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S',
+)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Default ingestion settings, overridable per call
+EPISODE_INGEST_MODE = os.environ.get('EPISODE_INGEST_MODE', 'sequential')
+EPISODE_INGEST_MAX_CONCURRENCY = int(os.environ.get('EPISODE_INGEST_MAX_CONCURRENCY', '4'))
+EPISODE_INGEST_BATCH_SIZE = int(os.environ.get('EPISODE_INGEST_BATCH_SIZE', '20'))
+EPISODE_INGEST_GROUP_WINDOW = int(os.environ.get('EPISODE_INGEST_GROUP_WINDOW', '1'))
+
+INGEST_MODES = ['sequential', 'concurrent', 'bulk']
+
+
+@dataclass
+class IngestionReport:
+    """Throughput of an ingestion run."""
+    mode: str
+    episodes: int
+    failed: int
+    seconds: float
+
+    @property
+    def episodes_per_second(self) -> float:
+        return self.episodes / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f'{self.episodes} episodes added ({self.failed} failed) in {self.seconds:.1f}s '
+                f'with mode {self.mode}: {self.episodes_per_second:.2f} episodes/sec')
+
+
+def to_raw_episodes(episodes, prefix, start_time=None):
+    """Convert the episode dicts to RawEpisodes, with increasing reference times when not given.
+    Returns (group_id, RawEpisode) pairs in temporal order."""
+    start_time = start_time or datetime.now(timezone.utc)
+    raw_episodes = []
+    for i, episode in enumerate(episodes):
+        reference_time = episode.get('reference_time') or start_time + timedelta(milliseconds=i)
+        if isinstance(reference_time, str):
+            reference_time = datetime.fromisoformat(reference_time)
+        if reference_time.tzinfo is None:
+            reference_time = reference_time.replace(tzinfo=timezone.utc)
+        raw_episodes.append((
+            episode.get('group_id', ''),
+            RawEpisode(
+                name=episode.get('name') or f'{prefix} {i}',
+                content=episode['content']
+                if isinstance(episode['content'], str)
+                else json.dumps(episode['content']),
+                source=EpisodeType(episode['type']),
+                source_description=episode['description'],
+                reference_time=reference_time,
+            ),
+        ))
+    # Stable sort: the episodes with the same reference time keep their list order
+    return sorted(raw_episodes, key=lambda pair: pair[1].reference_time)
+
+
+async def add_raw_episode(graphiti, group_id, episode):
+    await graphiti.add_episode(
+        name=episode.name,
+        episode_body=episode.content,
+        source=episode.source,
+        source_description=episode.source_description,
+        reference_time=episode.reference_time,
+        group_id=group_id,
+    )
+    print(f'Added episode: {episode.name} ({episode.source.value})')
+
+
+async def ingest_episodes(
+    graphiti,
+    episodes,
+    prefix='Episode',
+    mode=None,
+    max_concurrency=None,
+    batch_size=None,
+    group_window=None,
+):
+    """Add the episodes to the graph with the given mode. Returns an IngestionReport."""
+    mode = mode or EPISODE_INGEST_MODE
+    max_concurrency = max_concurrency or EPISODE_INGEST_MAX_CONCURRENCY
+    batch_size = batch_size or EPISODE_INGEST_BATCH_SIZE
+    group_window = group_window or EPISODE_INGEST_GROUP_WINDOW
+    if mode not in INGEST_MODES:
+        raise ValueError(f'Unknown ingest mode {mode}, expected one of {INGEST_MODES}')
+
+    raw_episodes = to_raw_episodes(episodes, prefix)
+    groups = defaultdict(list)
+    for group_id, episode in raw_episodes:
+        groups[group_id].append(episode)
+
+    start_time = time.time()
+    failed = 0
+
+    if mode == 'sequential':
+        for group_id, episode in raw_episodes:
+            try:
+                await add_raw_episode(graphiti, group_id, episode)
+            except Exception as e:
+                logger.error(f'Error adding episode {episode.name}: {e}')
+                failed += 1
+
+    elif mode == 'concurrent':
+        if len(groups) == 1 and group_window == 1 and max_concurrency > 1:
+            logger.warning('All the episodes are in one group, so concurrent mode adds them one after the other: '
+                           'give them distinct group_ids or a group window above 1')
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def add_group(group_id, group_episodes):
+            window = asyncio.Semaphore(group_window)
+
+            async def add_episode(episode):
+                try:
+                    async with semaphore:
+                        await add_raw_episode(graphiti, group_id, episode)
+                    return 0
+                except Exception as e:
+                    logger.error(f'Error adding episode {episode.name}: {e}')
+                    return 1
+                finally:
+                    window.release()
+
+            # Start the episodes of the group in order, with at most group_window in flight
+            tasks = []
+            for episode in group_episodes:
+                await window.acquire()
+                tasks.append(asyncio.create_task(add_episode(episode)))
+            return sum(await asyncio.gather(*tasks))
+
+        failed = sum(await asyncio.gather(*[
+            add_group(group_id, group_episodes) for group_id, group_episodes in groups.items()
+        ]))
+
+    else:
+        for group_id, group_episodes in groups.items():
+            for start in range(0, len(group_episodes), batch_size):
+                batch = group_episodes[start:start + batch_size]
+                try:
+                    await graphiti.add_episode_bulk(batch, group_id=group_id)
+                    print(f'Added {len(batch)} episodes in bulk: {batch[0].name} .. {batch[-1].name}')
+                except Exception as e:
+                    logger.error(f'Error adding the batch {batch[0].name} .. {batch[-1].name}: {e}')
+                    failed += len(batch)
+
+    report = IngestionReport(
+        mode=mode,
+        episodes=len(raw_episodes) - failed,
+        failed=failed,
+        seconds=time.time() - start_time,
+    )
+    print(report)
+    return report
+
+
+def load_episodes(path):
+    """Load the episodes of a JSON list or JSON Lines file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Add the episodes of a JSON or JSONL file to Graphiti')
+    parser.add_argument('file', help='JSON list or JSON Lines file of episodes')
+    parser.add_argument('--mode', choices=INGEST_MODES, default=EPISODE_INGEST_MODE)
+    parser.add_argument('--max-concurrency', type=int, default=EPISODE_INGEST_MAX_CONCURRENCY,
+                        help='Episodes added at the same time in concurrent mode')
+    parser.add_argument('--batch-size', type=int, default=EPISODE_INGEST_BATCH_SIZE,
+                        help='Episodes per add_episode_bulk call in bulk mode')
+    parser.add_argument('--group-window', type=int, default=EPISODE_INGEST_GROUP_WINDOW,
+                        help='Episodes of the same group_id in flight at the same time in concurrent mode')
+    parser.add_argument('--prefix', default='Episode', help='Name prefix of the episodes without a name')
+    args = parser.parse_args()
+
+    # Neo4j connection parameters
+    neo4j_uri = os.environ.get('NEO4J_URI', 'bolt://localhost:7687')
+    neo4j_user = os.environ.get('NEO4J_USER', 'neo4j')
+    neo4j_password = os.environ.get('NEO4J_PASSWORD', 'password')
+
+    graphiti = Graphiti(neo4j_uri, neo4j_user, neo4j_password)
+    try:
+        await graphiti.build_indices_and_constraints()
+        await ingest_episodes(
+            graphiti,
+            load_episodes(args.file),
+            prefix=args.prefix,
+            mode=args.mode,
+            max_concurrency=args.max_concurrency,
+            batch_size=args.batch_size,
+            group_window=args.group_window,
+        )
+    finally:
+        await graphiti.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
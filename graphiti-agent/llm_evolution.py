@@ -7,10 +7,8 @@ the field evolves over time.
 """
 
 import asyncio
-import json
 import logging
 import os
-from datetime import datetime, timezone
 from logging import INFO
 
 from dotenv import load_dotenv
@@ -18,6 +16,8 @@ from graphiti_core import Graphiti
 from graphiti_core.nodes import EpisodeType
 from graphiti_core.utils.maintenance.graph_data_operations import clear_data
 
+from bulk_ingest import ingest_episodes
+
 # Configure logging
 logging.basicConfig(
     level=INFO,
@@ -38,18 +38,12 @@ if not neo4j_uri or not neo4j_user or not neo4j_password:
 
 
 async def add_episodes(graphiti, episodes, prefix="LLM Evolution"):
-    """Add episodes to the graph with a given prefix."""
-    for i, episode in enumerate(episodes):
-        await graphiti.add_episode(
-            name=f'{prefix} {i}',
-            episode_body=episode['content']
-            if isinstance(episode['content'], str)
-            else json.dumps(episode['content']),
-            source=episode['type'],
-            source_description=episode['description'],
-            reference_time=datetime.now(timezone.utc),
-        )
-        print(f'Added episode: {prefix} {i} ({episode["type"].value})')
+    """Add episodes to the graph with a given prefix.
+
+    The ingestion mode is set with EPISODE_INGEST_MODE (see bulk_ingest.py). Keep the default
+    sequential mode to see the facts of the previous phases invalidated.
+    """
+    await ingest_episodes(graphiti, episodes, prefix)
 
 
 async def get_user_choice():
@@ -15,10 +15,8 @@ limitations under the License.
 """
 
 import asyncio
-import json
 import logging
 import os
-from datetime import datetime, timezone
 from logging import INFO
 
 from dotenv import load_dotenv
@@ -27,6 +25,8 @@ from graphiti_core import Graphiti
 from graphiti_core.nodes import EpisodeType
 from graphiti_core.search.search_config_recipes import NODE_HYBRID_SEARCH_RRF
 
+from bulk_ingest import ingest_episodes
+
 #################################################
 # CONFIGURATION
 #################################################
@@ -116,18 +116,10 @@ async def main():
             },
         ]
 
-        # Add episodes to the graph
-        for i, episode in enumerate(episodes):
-            await graphiti.add_episode(
-                name=f'AI Agents Unleashed {i}',
-                episode_body=episode['content']
-                if isinstance(episode['content'], str)
-                else json.dumps(episode['content']),
-                source=episode['type'],
-                source_description=episode['description'],
-                reference_time=datetime.now(timezone.utc),
-            )
-            print(f'Added episode: AI Agents Unleashed {i} ({episode["type"].value})')
+        # Add episodes to the graph. ingest_episodes keeps their order and reports the
+        # episodes/sec; set EPISODE_INGEST_MODE=bulk to use add_episode_bulk for large loads
+        # (see bulk_ingest.py)
+        await ingest_episodes(graphiti, episodes, 'AI Agents Unleashed')
 
         #################################################
         # BASIC SEARCH
@@ -0,0 +1,69 @@
+"""Benchmark of the per-question LightRAG retrieval latency, cold vs warm.
+
+Compares the previous behavior (LightRAG storages loaded for every question) with the
+process-lifetime LightRAG service: cold (first question, loads the storages), warm (new
+questions) and cached (repeated questions, answered from the aquery LRU).
+
+Run it after inserting the documents with insert_pydantic_docs.py. The queries call the
+OpenAI API, except the cached ones.
+"""
+
+import time
+import asyncio
+import argparse
+
+from lightrag import QueryParam
+
+from rag_agent import initialize_rag, get_lightrag_service
+
+QUESTIONS = [
+    "How do I define a tool for a Pydantic AI agent?",
+    "How are dependencies passed to the agent?",
+    "How do I stream the agent response?",
+]
+
+
+def print_timings(label: str, timings: list):
+    print(f"{label}: " + ", ".join(f"{timing:.2f}s" for timing in timings) +
+          f" | avg {sum(timings) / len(timings):.2f}s")
+
+
+async def benchmark(questions: list, mode: str):
+    # Previous behavior: the storages are loaded for every question
+    timings = []
+    for question in questions:
+        start_time = time.perf_counter()
+        rag = await initialize_rag()
+        await rag.aquery(question, param=QueryParam(mode=mode))
+        timings.append(time.perf_counter() - start_time)
+        await rag.finalize_storages()
+    print_timings("LightRAG loaded per question", timings)
+
+    service = get_lightrag_service()
+
+    start_time = time.perf_counter()
+    await service.warm_up(query="")
+    print(f"Service warm-up (storages load): {time.perf_counter() - start_time:.2f}s")
+
+    for label in ["Service, first run of the questions", "Service, repeated questions (cached)"]:
+        timings = []
+        for question in questions:
+            start_time = time.perf_counter()
+            await service.aquery(question, mode=mode)
+            timings.append(time.perf_counter() - start_time)
+        print_timings(label, timings)
+
+    print(f"Service cache stats: {service.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LightRAG per-question latency, cold vs warm")
+    parser.add_argument("--question", action="append", help="Question to ask (repeatable)")
+    parser.add_argument("--mode", default="mix", help="LightRAG query mode")
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.question or QUESTIONS, args.mode))
+
+
+if __name__ == "__main__":
+    main()
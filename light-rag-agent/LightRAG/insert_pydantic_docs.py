@@ -1,8 +1,27 @@
+"""Insert documentation into LightRAG, section by section.
+
+The sources (URLs or local files, the Pydantic AI llms.txt by default) are split into sections by
+markdown headers, and the sections are inserted with the async API, with at most --max-concurrent
+sections extracted at the same time. The hashes of the inserted sections are saved, so an
+interrupted run resumes with the sections not inserted yet.
+
+Usage:
+    python insert_pydantic_docs.py [--source URL_OR_FILE ...] [--max-concurrent 4] [--batch-size 8] [--restart]
+"""
+
 import os
+import re
+import json
+import time
 import asyncio
+import hashlib
+import argparse
+from typing import List, Dict
 from lightrag import LightRAG
+from lightrag.base import DocStatus
 from lightrag.llm.openai import gpt_4o_mini_complete, openai_embed
 from lightrag.kg.shared_storage import initialize_pipeline_status
+from lightrag.utils import TokenTracker
 import dotenv
 import httpx
 
@@ -17,25 +36,83 @@ if not os.path.exists(WORKING_DIR):
 # URL of the Pydantic AI documentation
 PYDANTIC_DOCS_URL = "https://ai.pydantic.dev/llms.txt"
 
-def fetch_pydantic_docs() -> str:
+# Hashes of the sections already inserted, to resume interrupted runs
+PROGRESS_FILE = os.path.join(WORKING_DIR, "insert_progress.json")
+
+def fetch_pydantic_docs(url: str = PYDANTIC_DOCS_URL) -> str:
     """Fetch the Pydantic AI documentation from the URL.
-    
+
     Returns:
         The content of the documentation
     """
     try:
-        response = httpx.get(PYDANTIC_DOCS_URL)
+        response = httpx.get(url)
         response.raise_for_status()
         return response.text
     except Exception as e:
         raise Exception(f"Error fetching Pydantic AI documentation: {e}")
 
 
-async def initialize_rag():
+def load_source(source: str) -> str:
+    """Fetch a URL or read a local file."""
+    if source.startswith(("http://", "https://")):
+        return fetch_pydantic_docs(source)
+    with open(source, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def split_into_sections(text: str, max_chars: int = 12000) -> List[str]:
+    """Split markdown into sections at the # and ## headers, merging the small ones up to max_chars.
+    Sections still longer than max_chars are split at paragraph breaks."""
+    parts = [part for part in re.split(r'(?m)^(?=#{1,2} )', text) if part.strip()]
+
+    sections = []
+    current = ""
+    for part in parts:
+        if current and len(current) + len(part) > max_chars:
+            sections.append(current)
+            current = ""
+        current += part
+    if current.strip():
+        sections.append(current)
+
+    final_sections = []
+    for section in sections:
+        while len(section) > max_chars:
+            split_at = section.rfind("\n\n", 0, max_chars)
+            if split_at <= max_chars * 0.3:
+                split_at = max_chars
+            final_sections.append(section[:split_at])
+            section = section[split_at:]
+        final_sections.append(section)
+    return [section.strip() for section in final_sections if section.strip()]
+
+
+def get_section_id(section: str) -> str:
+    return "section-" + hashlib.sha256(section.encode("utf-8")).hexdigest()[:32]
+
+
+def load_progress() -> Dict[str, Dict[str, str]]:
+    if not os.path.exists(PROGRESS_FILE):
+        return {}
+    with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_progress(progress: Dict[str, Dict[str, str]]):
+    tmp_path = f"{PROGRESS_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(progress, f, indent=2)
+    os.replace(tmp_path, PROGRESS_FILE)
+
+
+async def initialize_rag(max_concurrent: int = 2, token_tracker: TokenTracker = None):
     rag = LightRAG(
         working_dir=WORKING_DIR,
         embedding_func=openai_embed,
-        llm_model_func=gpt_4o_mini_complete
+        llm_model_func=gpt_4o_mini_complete,
+        llm_model_kwargs={"token_tracker": token_tracker} if token_tracker else {},
+        max_parallel_insert=max_concurrent
     )
 
     await rag.initialize_storages()
@@ -44,10 +121,76 @@ async def initialize_rag():
     return rag
 
 
+async def insert_sections(sources: List[str], max_concurrent: int, batch_size: int, max_section_chars: int,
+                          restart: bool = False):
+    """Insert the new sections of the sources, batch_size sections per LightRAG pipeline run."""
+    progress = {} if restart else load_progress()
+
+    sections = []
+    for source in sources:
+        for section in split_into_sections(load_source(source), max_section_chars):
+            sections.append((get_section_id(section), source, section))
+    # The same section can appear twice, in one source or in several ones
+    sections = list({section_id: (section_id, source, section) for section_id, source, section in sections}.values())
+    pending = [section for section in sections if section[0] not in progress]
+    print(f"{len(sections)} sections: {len(sections) - len(pending)} already inserted, {len(pending)} to insert")
+
+    token_tracker = TokenTracker()
+    rag = await initialize_rag(max_concurrent, token_tracker)
+    start_time = time.time()
+    inserted_sections = 0
+    inserted_chars = 0
+    failed_sections = 0
+    try:
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            ids = [section_id for section_id, _, _ in batch]
+            await rag.ainsert(
+                [section for _, _, section in batch],
+                ids=ids,
+                file_paths=[source for _, source, _ in batch]
+            )
+
+            for section_id, source, section in batch:
+                doc = await rag.doc_status.get_by_id(section_id)
+                if doc and doc.get("status") == DocStatus.PROCESSED:
+                    progress[section_id] = {"source": source, "title": section.splitlines()[0][:100]}
+                    inserted_sections += 1
+                    inserted_chars += len(section)
+                else:
+                    failed_sections += 1
+            save_progress(progress)
+
+            elapsed = time.time() - start_time
+            print(f"{inserted_sections}/{len(pending)} sections inserted ({failed_sections} failed) | "
+                  f"{inserted_sections / elapsed * 60 if elapsed else 0:.1f} sections/min, "
+                  f"{inserted_chars / elapsed if elapsed else 0:.0f} chars/sec | {token_tracker}")
+    finally:
+        await rag.finalize_storages()
+
+    elapsed = time.time() - start_time
+    print(f"Done in {elapsed:.1f}s: {inserted_sections} sections inserted, {failed_sections} failed "
+          f"(they are retried on the next run)")
+    print(f"Token usage: {token_tracker}")
+
+
 def main():
-    # Initialize RAG instance and insert Pydantic documentation
-    rag = asyncio.run(initialize_rag())
-    rag.insert(fetch_pydantic_docs())
+    parser = argparse.ArgumentParser(description="Insert documentation into LightRAG, section by section")
+    parser.add_argument("--source", action="append",
+                        help=f"URL or file to insert (repeatable). Default: {PYDANTIC_DOCS_URL}")
+    parser.add_argument("--max-concurrent", type=int, default=4, help="Sections extracted at the same time")
+    parser.add_argument("--batch-size", type=int, default=8, help="Sections per insert, progress saved after each")
+    parser.add_argument("--max-section-chars", type=int, default=12000, help="Maximum characters per section")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved progress")
+    args = parser.parse_args()
+
+    asyncio.run(insert_sections(
+        args.source or [PYDANTIC_DOCS_URL],
+        max_concurrent=args.max_concurrent,
+        batch_size=args.batch_size,
+        max_section_chars=args.max_section_chars,
+        restart=args.restart
+    ))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
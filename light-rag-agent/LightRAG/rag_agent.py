@@ -2,7 +2,10 @@
 
 import os
 import sys
+import atexit
 import argparse
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
 import asyncio
 
@@ -20,6 +23,10 @@ dotenv.load_dotenv()
 
 WORKING_DIR = "./pydantic-docs"
 
+# Number of aquery results kept in memory, and optional query run at startup to warm up the storages
+QUERY_CACHE_SIZE = int(os.getenv("LIGHTRAG_QUERY_CACHE_SIZE", "256"))
+WARMUP_QUERY = os.getenv("LIGHTRAG_WARMUP_QUERY", "")
+
 if not os.path.exists(WORKING_DIR):
     os.mkdir(WORKING_DIR)
 
@@ -38,14 +45,130 @@ async def initialize_rag():
     )
 
     await rag.initialize_storages()
+    await initialize_pipeline_status()
 
     return rag
 
 
+# Storage file written by the queries too (LLM response cache), so it's not a sign of new documents
+LLM_CACHE_FILE = "kv_store_llm_response_cache.json"
+
+
+def get_storage_mtime(working_dir: str) -> float:
+    """Last modification time of the LightRAG document storage files, to detect inserts by other processes."""
+    with os.scandir(working_dir) as entries:
+        return max(
+            (entry.stat().st_mtime for entry in entries if entry.is_file() and entry.name != LLM_CACHE_FILE),
+            default=0.0
+        )
+
+
+class LightRAGService:
+    """Process-lifetime LightRAG instance with an LRU of aquery results.
+
+    LightRAG's shared storage locks are bound to the event loop that uses them, so the instance
+    runs on its own event loop thread and can be shared by callers on different loops (Streamlit
+    runs every script rerun with asyncio.run).
+
+    The cache is keyed by (query, mode, storage version). The version is bumped by the inserts
+    done through the service, and the storages are reloaded if another process (e.g.
+    insert_pydantic_docs.py) changed them, so cached results never outlive the documents.
+    """
+
+    def __init__(self, working_dir: str = WORKING_DIR, cache_size: int = QUERY_CACHE_SIZE):
+        self.working_dir = working_dir
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.rag = None
+        self.storage_version = 0
+        self.storage_mtime = 0.0
+        self.stats = {"hits": 0, "misses": 0, "reloads": 0}
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="lightrag-loop", daemon=True).start()
+        self.lock = asyncio.Lock()
+
+    async def _run(self, coro):
+        """Run a coroutine on the LightRAG event loop and await its result from the caller's loop."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    async def _ensure_loaded(self):
+        """Load the storages on first use, and reload them if they changed on disk. Runs on the LightRAG loop."""
+        async with self.lock:
+            storage_mtime = get_storage_mtime(self.working_dir)
+            if self.rag is not None and storage_mtime <= self.storage_mtime:
+                return
+            if self.rag is not None:
+                await self.rag.finalize_storages()
+                self.stats["reloads"] += 1
+                self.invalidate()
+            self.rag = await initialize_rag()
+            self.storage_mtime = get_storage_mtime(self.working_dir)
+
+    async def warm_up(self, query: str = WARMUP_QUERY):
+        """Load the storages (and run the warm-up query, if any) before the first question."""
+        await self._run(self._ensure_loaded())
+        if query:
+            await self.aquery(query)
+
+    async def aquery(self, query: str, mode: str = "mix") -> str:
+        """LightRAG aquery, answered from the cache when the same query and mode were run on the current storages."""
+        await self._run(self._ensure_loaded())
+        key = (query.strip(), mode, self.storage_version)
+        with self.cache_lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return self.cache[key]
+            self.stats["misses"] += 1
+
+        result = await self._run(self.rag.aquery(query, param=QueryParam(mode=mode)))
+        with self.cache_lock:
+            self.cache[key] = result
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
+
+    def invalidate(self):
+        """Bump the storage version, so the cached query results are not used anymore."""
+        with self.cache_lock:
+            self.storage_version += 1
+            self.cache.clear()
+
+    async def ainsert(self, input, **kwargs):
+        """LightRAG ainsert. The cached query results are invalidated."""
+        await self._run(self._ensure_loaded())
+        try:
+            await self._run(self.rag.ainsert(input, **kwargs))
+        finally:
+            self.invalidate()
+            self.storage_mtime = get_storage_mtime(self.working_dir)
+
+    def close(self):
+        """Persist and close the storages."""
+        if self.rag is not None and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.rag.finalize_storages(), self.loop).result(timeout=30)
+            self.rag = None
+
+
+_lightrag_service = None
+_lightrag_service_lock = threading.Lock()
+
+
+def get_lightrag_service() -> LightRAGService:
+    """Returns the process-wide LightRAG service, created on the first call."""
+    global _lightrag_service
+    with _lightrag_service_lock:
+        if _lightrag_service is None:
+            _lightrag_service = LightRAGService()
+            atexit.register(_lightrag_service.close)
+        return _lightrag_service
+
+
 @dataclass
 class RAGDeps:
     """Dependencies for the RAG agent."""
-    lightrag: LightRAG
+    lightrag: LightRAGService
 
 
 # Create the Pydantic AI agent
@@ -70,9 +193,7 @@ async def retrieve(context: RunContext[RAGDeps], search_query: str) -> str:
     Returns:
         Formatted context information from the retrieved documents.
     """
-    return await context.deps.lightrag.aquery(
-        search_query, param=QueryParam(mode="mix")
-    )
+    return await context.deps.lightrag.aquery(search_query, mode="mix")
 
 
 async def run_rag_agent(question: str,) -> str:
@@ -84,8 +205,9 @@ async def run_rag_agent(question: str,) -> str:
     Returns:
         The agent's response.
     """
-    # Create dependencies
-    lightrag = await initialize_rag()
+    # Create dependencies with the shared LightRAG service (loaded once per process)
+    lightrag = get_lightrag_service()
+    await lightrag.warm_up()
     deps = RAGDeps(lightrag=lightrag)
     
     # Run the agent
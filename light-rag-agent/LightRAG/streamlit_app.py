@@ -1,7 +1,6 @@
 from dotenv import load_dotenv
 import streamlit as st
 import asyncio
-import os
 
 # Import all the message part classes
 from pydantic_ai.messages import (
@@ -17,31 +16,17 @@ from pydantic_ai.messages import (
     ModelMessagesTypeAdapter
 )
 
-from lightrag import LightRAG
-from lightrag.llm.openai import gpt_4o_mini_complete, openai_embed
-from lightrag.kg.shared_storage import initialize_pipeline_status
-
-from rag_agent import agent, RAGDeps
+from rag_agent import agent, RAGDeps, get_lightrag_service
 
 load_dotenv()
 
 async def get_agent_deps():
     """
-    Creates a LightRAG instance
+    Gets the process-wide LightRAG service, loaded once and shared by all the sessions,
     And then uses that to create the Pydantic AI agent dependencies.
     """
-    WORKING_DIR = "./pydantic-docs"
-
-    if not os.path.exists(WORKING_DIR):
-        os.mkdir(WORKING_DIR)
-
-    rag = LightRAG(
-        working_dir=WORKING_DIR,
-        embedding_func=openai_embed,
-        llm_model_func=gpt_4o_mini_complete
-    )
-
-    await rag.initialize_storages()
+    rag = get_lightrag_service()
+    await rag.warm_up()
     deps = RAGDeps(lightrag=rag)
     return deps
 
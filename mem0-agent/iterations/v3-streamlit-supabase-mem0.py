@@ -6,6 +6,14 @@ from mem0 import Memory
 import supabase
 from supabase.client import Client, ClientOptions
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import numpy as np
+import threading
+import atexit
+import time
 import uuid
 import sys
 
@@ -21,6 +29,20 @@ supabase_client = supabase.create_client(supabase_url, supabase_key)
 
 model = os.getenv('MODEL_CHOICE', 'gpt-4o-mini')
 
+# Memory writes run in background workers, coalescing the rapid successive turns of a user
+memory_writer_workers = int(os.getenv("MEMORY_WRITER_WORKERS", "2"))
+memory_write_coalesce_seconds = float(os.getenv("MEMORY_WRITE_COALESCE_SECONDS", "2"))
+memory_write_max_batch_turns = int(os.getenv("MEMORY_WRITE_MAX_BATCH_TURNS", "5"))
+memory_write_max_delay_seconds = float(os.getenv("MEMORY_WRITE_MAX_DELAY_SECONDS", "10"))
+memory_write_max_retries = int(os.getenv("MEMORY_WRITE_MAX_RETRIES", "3"))
+memory_write_retry_backoff_seconds = float(os.getenv("MEMORY_WRITE_RETRY_BACKOFF_SECONDS", "2"))
+
+# Per-user cache of the memories, searched locally and updated by the completed memory writes
+memory_cache_max_users = int(os.getenv("MEMORY_CACHE_MAX_USERS", "100"))
+memory_cache_max_memories = int(os.getenv("MEMORY_CACHE_MAX_MEMORIES", "500"))
+memory_query_embedding_cache_size = int(os.getenv("MEMORY_QUERY_EMBEDDING_CACHE_SIZE", "1000"))
+memory_rerank_recency_weight = float(os.getenv("MEMORY_RERANK_RECENCY_WEIGHT", "0"))
+
 # Streamlit page configuration
 st.set_page_config(
     page_title="Mem0 Chat Assistant",
@@ -53,9 +75,414 @@ def get_memory():
     }
     return Memory.from_config(config)
 
+@dataclass
+class PendingTurns:
+    """Conversation turns of a user waiting to be written to mem0."""
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    turns: int = 0
+    first_enqueued_at: float = 0.0
+    last_enqueued_at: float = 0.0
+    # Failed writes of these turns (of a batch being retried), and when they can be retried
+    attempts: int = 0
+    retry_at: float = 0.0
+
+
+class MemoryWriter:
+    """Background worker threads that write the conversation turns to mem0, so the reply doesn't wait
+    for the memory extraction (LLM call and vector upserts of memory.add).
+
+    The turns of a user are coalesced: they are written in one memory.add call once the user has been
+    idle for coalesce_seconds, or when max_batch_turns or max_delay_seconds is reached. The batches of a
+    user are written in order, one at a time. A failed batch is retried up to max_retries times, after
+    retry_backoff_seconds doubled on each attempt, before the newer turns of the user (batched separately,
+    with their own retries); then it is dropped and counted in turns_dropped.
+    """
+
+    def __init__(self, memory: Memory, workers: int = 2, coalesce_seconds: float = 2.0,
+                 max_batch_turns: int = 5, max_delay_seconds: float = 10.0, max_retries: int = 3,
+                 retry_backoff_seconds: float = 2.0):
+        self.memory = memory
+        self.coalesce_seconds = coalesce_seconds
+        self.max_batch_turns = max_batch_turns
+        self.max_delay_seconds = max_delay_seconds
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.pending: Dict[str, PendingTurns] = {}
+        # Failed batch of a user waiting for its retry, written before the pending turns of the user
+        self.retrying: Dict[str, PendingTurns] = {}
+        self.in_flight = set()
+        # Users discarded while their batch was in flight, so a failed batch is not retried
+        self.discarded = set()
+        self.flushing = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.listeners: List[Callable[[str, Any], None]] = []
+        self.stats = {"turns_queued": 0, "turns_written": 0, "batches_written": 0, "errors": 0,
+                      "retries": 0, "turns_dropped": 0, "batches_dropped": 0,
+                      "total_write_seconds": 0.0, "max_write_seconds": 0.0, "total_delay_seconds": 0.0}
+        self.threads = [
+            threading.Thread(target=self.run, name=f"memory-writer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def add_listener(self, listener: Callable[[str, Any], None]):
+        """Call listener(user_id, result) with the result of memory.add after each batch of the user is written."""
+        self.listeners.append(listener)
+
+    def submit(self, messages: List[Dict[str, str]], user_id: str):
+        """Queue a conversation turn to be written to the user memories."""
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("The memory writer is closed")
+            now = time.time()
+            pending = self.pending.setdefault(user_id, PendingTurns(first_enqueued_at=now))
+            pending.messages.extend(messages)
+            pending.turns += 1
+            pending.last_enqueued_at = now
+            self.stats["turns_queued"] += 1
+            self.condition.notify_all()
+
+    def discard(self, user_id: str):
+        """Drop the queued turns of a user (e.g. before clearing their memories) and wait for the batch being written."""
+        with self.condition:
+            self.pending.pop(user_id, None)
+            self.retrying.pop(user_id, None)
+            if user_id in self.in_flight:
+                self.discarded.add(user_id)
+            while user_id in self.in_flight:
+                self.condition.wait()
+
+    def get_ready_user(self, now: float):
+        """Returns the user whose turns must be written now and the seconds to wait for the next one."""
+        next_wait = None
+        for user_id, pending in self.retrying.items():
+            if user_id in self.in_flight:
+                continue
+            # Backing off after a failed write, even when flushing
+            if pending.retry_at <= now:
+                return user_id, None
+            next_wait = pending.retry_at - now if next_wait is None else min(next_wait, pending.retry_at - now)
+        for user_id, pending in self.pending.items():
+            if user_id in self.in_flight or user_id in self.retrying:
+                continue
+            ready_at = min(pending.last_enqueued_at + self.coalesce_seconds,
+                           pending.first_enqueued_at + self.max_delay_seconds)
+            if self.flushing or pending.turns >= self.max_batch_turns or ready_at <= now:
+                return user_id, None
+            next_wait = ready_at - now if next_wait is None else min(next_wait, ready_at - now)
+        return None, next_wait
+
+    def run(self):
+        while True:
+            with self.condition:
+                while True:
+                    user_id, wait = self.get_ready_user(time.time())
+                    if user_id is not None:
+                        break
+                    if self.closed and not self.pending and not self.retrying:
+                        return
+                    self.condition.wait(wait)
+                pending = self.retrying.pop(user_id, None) or self.pending.pop(user_id)
+                self.in_flight.add(user_id)
+
+            start_time = time.time()
+            try:
+                result = self.memory.add(pending.messages, user_id=user_id)
+                error = False
+            except Exception as e:
+                print(f"Error writing memories for user {user_id}: {str(e)}")
+                error = True
+            write_seconds = time.time() - start_time
+
+            with self.condition:
+                self.in_flight.discard(user_id)
+                discarded = user_id in self.discarded
+                self.discarded.discard(user_id)
+                if error:
+                    self.stats["errors"] += 1
+                    if not discarded:
+                        self.requeue(user_id, pending)
+                else:
+                    self.stats["turns_written"] += pending.turns
+                    self.stats["batches_written"] += 1
+                    self.stats["total_write_seconds"] += write_seconds
+                    self.stats["max_write_seconds"] = max(self.stats["max_write_seconds"], write_seconds)
+                    self.stats["total_delay_seconds"] += time.time() - pending.first_enqueued_at
+                self.condition.notify_all()
+
+            if not error:
+                for listener in self.listeners:
+                    listener(user_id, result)
+
+    def requeue(self, user_id: str, pending: PendingTurns):
+        """Retry a failed batch before the newer turns of the user, or drop it after max_retries."""
+        if pending.attempts >= self.max_retries:
+            print(f"Dropping {pending.turns} turns of user {user_id} after {pending.attempts + 1} failed writes")
+            self.stats["turns_dropped"] += pending.turns
+            self.stats["batches_dropped"] += 1
+            return
+        pending.attempts += 1
+        pending.retry_at = time.time() + self.retry_backoff_seconds * 2 ** (pending.attempts - 1)
+        self.retrying[user_id] = pending
+        self.stats["retries"] += 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write all the queued turns now and wait for them. Returns False on timeout."""
+        deadline = time.time() + timeout if timeout is not None else None
+        with self.condition:
+            self.flushing = True
+            self.condition.notify_all()
+            try:
+                while self.pending or self.retrying or self.in_flight:
+                    remaining = deadline - time.time() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self.condition.wait(remaining)
+                return True
+            finally:
+                self.flushing = False
+
+    def close(self, timeout: Optional[float] = 30.0) -> bool:
+        """Flush the queued turns and stop the workers (on shutdown)."""
+        flushed = self.flush(timeout)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        return flushed
+
+    def get_metrics(self) -> Dict[str, float]:
+        """Queue depth and write latency metrics."""
+        with self.condition:
+            batches = self.stats["batches_written"]
+            return {
+                "queue_depth": sum(pending.turns for pending in [*self.pending.values(), *self.retrying.values()]),
+                "users_pending": len(self.pending.keys() | self.retrying.keys()),
+                "users_in_flight": len(self.in_flight),
+                "turns_queued": self.stats["turns_queued"],
+                "turns_written": self.stats["turns_written"],
+                "batches_written": batches,
+                "errors": self.stats["errors"],
+                "retries": self.stats["retries"],
+                "turns_dropped": self.stats["turns_dropped"],
+                "batches_dropped": self.stats["batches_dropped"],
+                "avg_write_seconds": round(self.stats["total_write_seconds"] / batches, 3) if batches else 0.0,
+                "max_write_seconds": round(self.stats["max_write_seconds"], 3),
+                "avg_queue_to_written_seconds": round(self.stats["total_delay_seconds"] / batches, 3) if batches else 0.0,
+            }
+
+class MemorySearchCache:
+    """Per-user in-process copy of the user memories with their vectors, so memory.search becomes a
+    local cosine search for the active users instead of a query embedding plus a pgvector query.
+
+    The memories of a user are loaded on their first search (if they have at most max_memories, the
+    others keep using memory.search) and kept up to date with the results of the memory writes
+    (apply_write), so the cache never serves memories older than the last completed write.
+    The query embeddings are cached too, for the repeated and follow-up messages.
+    """
+
+    def __init__(self, memory: Memory, max_users: int = 100, max_memories: int = 500,
+                 query_cache_size: int = 1000, recency_weight: float = 0.0, recency_days: float = 30.0):
+        self.memory = memory
+        self.max_users = max_users
+        self.max_memories = max_memories
+        self.query_cache_size = query_cache_size
+        # Optional local rerank: cosine similarity + recency_weight * exp(-age / recency_days)
+        self.recency_weight = recency_weight
+        self.recency_days = recency_days
+        self.users: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.query_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Bumped on every write of a user, so a load racing with a write is not stored
+        self.versions: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.stats = {"local_searches": 0, "remote_searches": 0, "loads": 0, "query_embedding_hits": 0,
+                      "query_embedding_misses": 0, "writes_applied": 0, "invalidations": 0,
+                      "total_search_seconds": 0.0}
+
+    def embed_query(self, query: str) -> np.ndarray:
+        key = " ".join(query.split())
+        with self.lock:
+            if key in self.query_embeddings:
+                self.query_embeddings.move_to_end(key)
+                self.stats["query_embedding_hits"] += 1
+                return self.query_embeddings[key]
+            self.stats["query_embedding_misses"] += 1
+        embedding = normalize(self.memory.embedding_model.embed(query, "search"))
+        with self.lock:
+            self.query_embeddings[key] = embedding
+            while len(self.query_embeddings) > self.query_cache_size:
+                self.query_embeddings.popitem(last=False)
+        return embedding
+
+    def get_vectors(self, items: List[Dict[str, Any]]) -> List[np.ndarray]:
+        """Vectors of the memories: read from the vector store when it returns them (Supabase), else embedded again."""
+        vectors = {}
+        collection = getattr(self.memory.vector_store, "collection", None)
+        if collection is not None and hasattr(collection, "fetch"):
+            try:
+                for record in collection.fetch(ids=[item["id"] for item in items]):
+                    vectors[str(record[0])] = normalize(record[1])
+            except Exception as e:
+                print(f"Error fetching the memory vectors, embedding them instead: {str(e)}")
+        return [vectors[item["id"]] if item["id"] in vectors
+                else normalize(self.memory.embedding_model.embed(item["memory"], "add"))
+                for item in items]
+
+    def load_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Load the memories of the user into the cache. Returns None if they have more than max_memories."""
+        with self.lock:
+            version = self.versions.get(user_id, 0)
+        results = self.memory.get_all(user_id=user_id, limit=self.max_memories + 1)
+        items = results["results"] if isinstance(results, dict) else results
+        if len(items) > self.max_memories:
+            entry = None
+        else:
+            entry = {"memories": {}}
+            for item, vector in zip(items, self.get_vectors(items)):
+                entry["memories"][item["id"]] = (item, vector)
+
+        with self.lock:
+            self.stats["loads"] += 1
+            if self.versions.get(user_id, 0) == version:
+                self.users[user_id] = entry
+                while len(self.users) > self.max_users:
+                    self.users.popitem(last=False)
+        return entry
+
+    def search(self, query: str, user_id: str, limit: int = 3) -> Dict[str, List[Dict[str, Any]]]:
+        """Same results format as memory.search, from the cached memories of the user."""
+        start_time = time.time()
+        with self.lock:
+            cached = user_id in self.users
+            entry = self.users.get(user_id)
+            if cached:
+                self.users.move_to_end(user_id)
+        if not cached:
+            entry = self.load_user(user_id)
+
+        if entry is None:
+            results = self.memory.search(query=query, user_id=user_id, limit=limit)
+            key = "remote_searches"
+        else:
+            results = {"results": self.rank(self.embed_query(query), list(entry["memories"].values()), limit)}
+            key = "local_searches"
+
+        with self.lock:
+            self.stats[key] += 1
+            self.stats["total_search_seconds"] += time.time() - start_time
+        return results
+
+    def rank(self, query_embedding: np.ndarray, memories: List[tuple], limit: int) -> List[Dict[str, Any]]:
+        if not memories:
+            return []
+        similarities = np.stack([vector for _, vector in memories]) @ query_embedding
+        scores = similarities.copy()
+        if self.recency_weight:
+            scores += self.recency_weight * np.array([recency(item, self.recency_days) for item, _ in memories])
+        top = np.argsort(-scores)[:limit]
+        # score is the cosine distance, like the Supabase vector store returns
+        return [{**memories[i][0], "score": float(1 - similarities[i])} for i in top]
+
+    def apply_write(self, user_id: str, result: Any):
+        """Write-through: apply the ADD/UPDATE/DELETE events returned by memory.add to the cached memories."""
+        with self.lock:
+            self.versions[user_id] = self.versions.get(user_id, 0) + 1
+            entry = self.users.get(user_id)
+        if entry is None:
+            return
+
+        try:
+            events = result["results"] if isinstance(result, dict) else result
+            changed = [event for event in events if event["event"] in ("ADD", "UPDATE")]
+            vectors = self.get_vectors(changed)
+            with self.lock:
+                memories = dict(entry["memories"])
+                for event in events:
+                    if event["event"] == "DELETE":
+                        memories.pop(event["id"], None)
+                for event, vector in zip(changed, vectors):
+                    item = dict(memories[event["id"]][0]) if event["id"] in memories else {"id": event["id"], "user_id": user_id}
+                    item["memory"] = event["memory"]
+                    item["updated_at"] = datetime.now(timezone.utc).isoformat()
+                    memories[event["id"]] = (item, vector)
+                if len(memories) > self.max_memories:
+                    self.users[user_id] = None
+                elif self.users.get(user_id) is entry:
+                    self.users[user_id] = {"memories": memories}
+                self.stats["writes_applied"] += 1
+        except Exception as e:
+            print(f"Error updating the memory cache of user {user_id}: {str(e)}")
+            self.invalidate(user_id)
+
+    def invalidate(self, user_id: str):
+        """Drop the cached memories of the user (e.g. after clearing them); reloaded on the next search."""
+        with self.lock:
+            self.versions[user_id] = self.versions.get(user_id, 0) + 1
+            self.users.pop(user_id, None)
+            self.stats["invalidations"] += 1
+
+    def get_metrics(self) -> Dict[str, float]:
+        with self.lock:
+            searches = self.stats["local_searches"] + self.stats["remote_searches"]
+            return {
+                "cached_users": len(self.users),
+                **{key: value for key, value in self.stats.items() if key != "total_search_seconds"},
+                "avg_search_seconds": round(self.stats["total_search_seconds"] / searches, 4) if searches else 0.0,
+            }
+
+
+def normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def recency(item: Dict[str, Any], recency_days: float) -> float:
+    """1 for a memory written now, decaying exponentially with its age in days."""
+    timestamp = item.get("updated_at") or item.get("created_at")
+    if not timestamp:
+        return 0.0
+    try:
+        written_at = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return 0.0
+    if written_at.tzinfo is None:
+        written_at = written_at.replace(tzinfo=timezone.utc)
+    age_days = (datetime.now(timezone.utc) - written_at).total_seconds() / 86400
+    return float(np.exp(-max(age_days, 0.0) / recency_days))
+
+@st.cache_resource
+def get_memory_cache():
+    return MemorySearchCache(
+        get_memory(),
+        max_users=memory_cache_max_users,
+        max_memories=memory_cache_max_memories,
+        query_cache_size=memory_query_embedding_cache_size,
+        recency_weight=memory_rerank_recency_weight
+    )
+
+@st.cache_resource
+def get_memory_writer():
+    writer = MemoryWriter(
+        get_memory(),
+        workers=memory_writer_workers,
+        coalesce_seconds=memory_write_coalesce_seconds,
+        max_batch_turns=memory_write_max_batch_turns,
+        max_delay_seconds=memory_write_max_delay_seconds,
+        max_retries=memory_write_max_retries,
+        retry_backoff_seconds=memory_write_retry_backoff_seconds
+    )
+    writer.add_listener(get_memory_cache().apply_write)
+    # Write the queued turns before the Streamlit server exits
+    atexit.register(writer.close)
+    return writer
+
 # Get cached resources
 openai_client = get_openai_client()
 memory = get_memory()
+memory_cache = get_memory_cache()
+memory_writer = get_memory_writer()
 
 # Authentication functions
 def sign_up(email, password, full_name):
@@ -108,7 +535,7 @@ def sign_out():
 # Chat function with memory
 def chat_with_memories(message, user_id):
     # Retrieve relevant memories
-    relevant_memories = memory.search(query=message, user_id=user_id, limit=3)
+    relevant_memories = memory_cache.search(query=message, user_id=user_id, limit=3)
     memories_str = "\n".join(f"- {entry['memory']}" for entry in relevant_memories["results"])
     
     # Generate Assistant response
@@ -119,9 +546,12 @@ def chat_with_memories(message, user_id):
         response = openai_client.chat.completions.create(model=model, messages=messages)
         assistant_response = response.choices[0].message.content
 
-    # Create new memories from the conversation
-    messages.append({"role": "assistant", "content": assistant_response})
-    memory.add(messages, user_id=user_id)
+    # Queue the new memories from the conversation (the system prompt is left out, so the
+    # coalesced turns don't repeat the retrieved memories)
+    memory_writer.submit([
+        {"role": "user", "content": message},
+        {"role": "assistant", "content": assistant_response}
+    ], user_id=user_id)
 
     return assistant_response
 
@@ -188,11 +618,22 @@ with st.sidebar:
             # Memory management options
             st.subheader("Memory Management")
             if st.button("Clear All Memories"):
+                # Drop the queued writes first, so they don't recreate the cleared memories
+                memory_writer.discard(user.id)
                 memory.clear(user_id=user.id)
+                memory_cache.invalidate(user.id)
                 st.success("All memories cleared!")
                 st.session_state.messages = []
                 st.rerun()
 
+            metrics = memory_writer.get_metrics()
+            st.caption(f"Memory writes queued: {metrics['queue_depth']} | "
+                       f"avg write {metrics['avg_write_seconds']}s, max {metrics['max_write_seconds']}s | "
+                       f"turns dropped: {metrics['turns_dropped']}")
+            cache_metrics = memory_cache.get_metrics()
+            st.caption(f"Memory searches: {cache_metrics['local_searches']} local, "
+                       f"{cache_metrics['remote_searches']} remote | avg {cache_metrics['avg_search_seconds']}s")
+
 # Main chat interface
 if st.session_state.authenticated and st.session_state.user:
     # Use the user from session state directly
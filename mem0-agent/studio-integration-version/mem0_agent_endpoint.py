@@ -19,6 +19,8 @@ from pydantic_ai.messages import (
 )
 
 from mem0_agent import mem0_agent, Mem0Deps
+from memory_writer import MemoryWriter
+from memory_cache import MemorySearchCache
 
 # Load environment variables
 load_dotenv()
@@ -60,6 +62,33 @@ config = {
 
 memory = Memory.from_config(config)
 
+# Memory writes (memory.add) run in background workers, coalescing the rapid successive turns of a user
+memory_writer = MemoryWriter(
+    memory,
+    workers=int(os.getenv("MEMORY_WRITER_WORKERS", "2")),
+    coalesce_seconds=float(os.getenv("MEMORY_WRITE_COALESCE_SECONDS", "2")),
+    max_batch_turns=int(os.getenv("MEMORY_WRITE_MAX_BATCH_TURNS", "5")),
+    max_delay_seconds=float(os.getenv("MEMORY_WRITE_MAX_DELAY_SECONDS", "10")),
+    max_retries=int(os.getenv("MEMORY_WRITE_MAX_RETRIES", "3")),
+    retry_backoff_seconds=float(os.getenv("MEMORY_WRITE_RETRY_BACKOFF_SECONDS", "2"))
+)
+
+# Per-user cache of the memories, searched locally and updated by the completed memory writes
+memory_cache = MemorySearchCache(
+    memory,
+    max_users=int(os.getenv("MEMORY_CACHE_MAX_USERS", "100")),
+    max_memories=int(os.getenv("MEMORY_CACHE_MAX_MEMORIES", "500")),
+    query_cache_size=int(os.getenv("MEMORY_QUERY_EMBEDDING_CACHE_SIZE", "1000")),
+    recency_weight=float(os.getenv("MEMORY_RERANK_RECENCY_WEIGHT", "0"))
+)
+memory_writer.add_listener(memory_cache.apply_write)
+
+@app.on_event("shutdown")
+def flush_memory_writes():
+    """Write the queued conversation turns before the process exits."""
+    if not memory_writer.close(timeout=float(os.getenv("MEMORY_WRITE_SHUTDOWN_TIMEOUT", "30"))):
+        print(f"Memory writes still pending on shutdown: {memory_writer.get_metrics()}")
+
 # Request/Response Models
 class AgentRequest(BaseModel):
     query: str
@@ -144,7 +173,7 @@ async def web_search(
         )       
 
         # Retrieve relevant memories with Mem0
-        relevant_memories = memory.search(query=request.query, user_id=request.user_id, limit=3)
+        relevant_memories = memory_cache.search(query=request.query, user_id=request.user_id, limit=3)
         memories_str = "\n".join(f"- {entry['memory']}" for entry in relevant_memories["results"])     
 
         # Initialize agent dependencies
@@ -168,12 +197,12 @@ async def web_search(
             data={"request_id": request.request_id}
         )
 
-        # Update memories based on the last user message and agent response
+        # Queue the memory update based on the last user message and agent response
         memory_messages = [
             {"role": "user", "content": request.query},
             {"role": "assistant", "content": result.data}
         ]
-        memory.add(memory_messages, user_id=request.user_id)        
+        memory_writer.submit(memory_messages, user_id=request.user_id)
 
         return AgentResponse(success=True)
 
@@ -188,6 +217,11 @@ async def web_search(
         )
         return AgentResponse(success=False)
 
+@app.get("/api/mem0-agent/memory-metrics")
+async def memory_metrics(authenticated: bool = Depends(verify_token)) -> Dict[str, float]:
+    """Queue depth and write latency of the background memory writes, and the memory search cache stats."""
+    return {**memory_writer.get_metrics(), **{f"cache_{key}": value for key, value in memory_cache.get_metrics().items()}}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,189 @@
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from datetime import datetime, timezone
+import threading
+import time
+
+import numpy as np
+from mem0 import Memory
+
+
+class MemorySearchCache:
+    """Per-user in-process copy of the user memories with their vectors, so memory.search becomes a
+    local cosine search for the active users instead of a query embedding plus a pgvector query.
+
+    The memories of a user are loaded on their first search (if they have at most max_memories, the
+    others keep using memory.search) and kept up to date with the results of the memory writes
+    (apply_write), so the cache never serves memories older than the last completed write.
+    The query embeddings are cached too, for the repeated and follow-up messages.
+    """
+
+    def __init__(self, memory: Memory, max_users: int = 100, max_memories: int = 500,
+                 query_cache_size: int = 1000, recency_weight: float = 0.0, recency_days: float = 30.0):
+        self.memory = memory
+        self.max_users = max_users
+        self.max_memories = max_memories
+        self.query_cache_size = query_cache_size
+        # Optional local rerank: cosine similarity + recency_weight * exp(-age / recency_days)
+        self.recency_weight = recency_weight
+        self.recency_days = recency_days
+        self.users: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.query_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Bumped on every write of a user, so a load racing with a write is not stored
+        self.versions: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.stats = {"local_searches": 0, "remote_searches": 0, "loads": 0, "query_embedding_hits": 0,
+                      "query_embedding_misses": 0, "writes_applied": 0, "invalidations": 0,
+                      "total_search_seconds": 0.0}
+
+    def embed_query(self, query: str) -> np.ndarray:
+        key = " ".join(query.split())
+        with self.lock:
+            if key in self.query_embeddings:
+                self.query_embeddings.move_to_end(key)
+                self.stats["query_embedding_hits"] += 1
+                return self.query_embeddings[key]
+            self.stats["query_embedding_misses"] += 1
+        embedding = normalize(self.memory.embedding_model.embed(query, "search"))
+        with self.lock:
+            self.query_embeddings[key] = embedding
+            while len(self.query_embeddings) > self.query_cache_size:
+                self.query_embeddings.popitem(last=False)
+        return embedding
+
+    def get_vectors(self, items: List[Dict[str, Any]]) -> List[np.ndarray]:
+        """Vectors of the memories: read from the vector store when it returns them (Supabase), else embedded again."""
+        vectors = {}
+        collection = getattr(self.memory.vector_store, "collection", None)
+        if collection is not None and hasattr(collection, "fetch"):
+            try:
+                for record in collection.fetch(ids=[item["id"] for item in items]):
+                    vectors[str(record[0])] = normalize(record[1])
+            except Exception as e:
+                print(f"Error fetching the memory vectors, embedding them instead: {str(e)}")
+        return [vectors[item["id"]] if item["id"] in vectors
+                else normalize(self.memory.embedding_model.embed(item["memory"], "add"))
+                for item in items]
+
+    def load_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Load the memories of the user into the cache. Returns None if they have more than max_memories."""
+        with self.lock:
+            version = self.versions.get(user_id, 0)
+        results = self.memory.get_all(user_id=user_id, limit=self.max_memories + 1)
+        items = results["results"] if isinstance(results, dict) else results
+        if len(items) > self.max_memories:
+            entry = None
+        else:
+            entry = {"memories": {}}
+            for item, vector in zip(items, self.get_vectors(items)):
+                entry["memories"][item["id"]] = (item, vector)
+
+        with self.lock:
+            self.stats["loads"] += 1
+            if self.versions.get(user_id, 0) == version:
+                self.users[user_id] = entry
+                while len(self.users) > self.max_users:
+                    self.users.popitem(last=False)
+        return entry
+
+    def search(self, query: str, user_id: str, limit: int = 3) -> Dict[str, List[Dict[str, Any]]]:
+        """Same results format as memory.search, from the cached memories of the user."""
+        start_time = time.time()
+        with self.lock:
+            cached = user_id in self.users
+            entry = self.users.get(user_id)
+            if cached:
+                self.users.move_to_end(user_id)
+        if not cached:
+            entry = self.load_user(user_id)
+
+        if entry is None:
+            results = self.memory.search(query=query, user_id=user_id, limit=limit)
+            key = "remote_searches"
+        else:
+            results = {"results": self.rank(self.embed_query(query), list(entry["memories"].values()), limit)}
+            key = "local_searches"
+
+        with self.lock:
+            self.stats[key] += 1
+            self.stats["total_search_seconds"] += time.time() - start_time
+        return results
+
+    def rank(self, query_embedding: np.ndarray, memories: List[tuple], limit: int) -> List[Dict[str, Any]]:
+        if not memories:
+            return []
+        similarities = np.stack([vector for _, vector in memories]) @ query_embedding
+        scores = similarities.copy()
+        if self.recency_weight:
+            scores += self.recency_weight * np.array([recency(item, self.recency_days) for item, _ in memories])
+        top = np.argsort(-scores)[:limit]
+        # score is the cosine distance, like the Supabase vector store returns
+        return [{**memories[i][0], "score": float(1 - similarities[i])} for i in top]
+
+    def apply_write(self, user_id: str, result: Any):
+        """Write-through: apply the ADD/UPDATE/DELETE events returned by memory.add to the cached memories."""
+        with self.lock:
+            self.versions[user_id] = self.versions.get(user_id, 0) + 1
+            entry = self.users.get(user_id)
+        if entry is None:
+            return
+
+        try:
+            events = result["results"] if isinstance(result, dict) else result
+            changed = [event for event in events if event["event"] in ("ADD", "UPDATE")]
+            vectors = self.get_vectors(changed)
+            with self.lock:
+                memories = dict(entry["memories"])
+                for event in events:
+                    if event["event"] == "DELETE":
+                        memories.pop(event["id"], None)
+                for event, vector in zip(changed, vectors):
+                    item = dict(memories[event["id"]][0]) if event["id"] in memories else {"id": event["id"], "user_id": user_id}
+                    item["memory"] = event["memory"]
+                    item["updated_at"] = datetime.now(timezone.utc).isoformat()
+                    memories[event["id"]] = (item, vector)
+                if len(memories) > self.max_memories:
+                    self.users[user_id] = None
+                elif self.users.get(user_id) is entry:
+                    self.users[user_id] = {"memories": memories}
+                self.stats["writes_applied"] += 1
+        except Exception as e:
+            print(f"Error updating the memory cache of user {user_id}: {str(e)}")
+            self.invalidate(user_id)
+
+    def invalidate(self, user_id: str):
+        """Drop the cached memories of the user (e.g. after clearing them); reloaded on the next search."""
+        with self.lock:
+            self.versions[user_id] = self.versions.get(user_id, 0) + 1
+            self.users.pop(user_id, None)
+            self.stats["invalidations"] += 1
+
+    def get_metrics(self) -> Dict[str, float]:
+        with self.lock:
+            searches = self.stats["local_searches"] + self.stats["remote_searches"]
+            return {
+                "cached_users": len(self.users),
+                **{key: value for key, value in self.stats.items() if key != "total_search_seconds"},
+                "avg_search_seconds": round(self.stats["total_search_seconds"] / searches, 4) if searches else 0.0,
+            }
+
+
+def normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def recency(item: Dict[str, Any], recency_days: float) -> float:
+    """1 for a memory written now, decaying exponentially with its age in days."""
+    timestamp = item.get("updated_at") or item.get("created_at")
+    if not timestamp:
+        return 0.0
+    try:
+        written_at = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return 0.0
+    if written_at.tzinfo is None:
+        written_at = written_at.replace(tzinfo=timezone.utc)
+    age_days = (datetime.now(timezone.utc) - written_at).total_seconds() / 86400
+    return float(np.exp(-max(age_days, 0.0) / recency_days))
@@ -0,0 +1,204 @@
+from typing import Any, Callable, Dict, List, Optional
+from dataclasses import dataclass, field
+import threading
+import time
+
+from mem0 import Memory
+
+
+@dataclass
+class PendingTurns:
+    """Conversation turns of a user waiting to be written to mem0."""
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    turns: int = 0
+    first_enqueued_at: float = 0.0
+    last_enqueued_at: float = 0.0
+    # Failed writes of these turns (of a batch being retried), and when they can be retried
+    attempts: int = 0
+    retry_at: float = 0.0
+
+
+class MemoryWriter:
+    """Background worker threads that write the conversation turns to mem0, so the reply doesn't wait
+    for the memory extraction (LLM call and vector upserts of memory.add).
+
+    The turns of a user are coalesced: they are written in one memory.add call once the user has been
+    idle for coalesce_seconds, or when max_batch_turns or max_delay_seconds is reached. The batches of a
+    user are written in order, one at a time. A failed batch is retried up to max_retries times, after
+    retry_backoff_seconds doubled on each attempt, before the newer turns of the user (batched separately,
+    with their own retries); then it is dropped and counted in turns_dropped.
+    """
+
+    def __init__(self, memory: Memory, workers: int = 2, coalesce_seconds: float = 2.0,
+                 max_batch_turns: int = 5, max_delay_seconds: float = 10.0, max_retries: int = 3,
+                 retry_backoff_seconds: float = 2.0):
+        self.memory = memory
+        self.coalesce_seconds = coalesce_seconds
+        self.max_batch_turns = max_batch_turns
+        self.max_delay_seconds = max_delay_seconds
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.pending: Dict[str, PendingTurns] = {}
+        # Failed batch of a user waiting for its retry, written before the pending turns of the user
+        self.retrying: Dict[str, PendingTurns] = {}
+        self.in_flight = set()
+        # Users discarded while their batch was in flight, so a failed batch is not retried
+        self.discarded = set()
+        self.flushing = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.listeners: List[Callable[[str, Any], None]] = []
+        self.stats = {"turns_queued": 0, "turns_written": 0, "batches_written": 0, "errors": 0,
+                      "retries": 0, "turns_dropped": 0, "batches_dropped": 0,
+                      "total_write_seconds": 0.0, "max_write_seconds": 0.0, "total_delay_seconds": 0.0}
+        self.threads = [
+            threading.Thread(target=self.run, name=f"memory-writer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def add_listener(self, listener: Callable[[str, Any], None]):
+        """Call listener(user_id, result) with the result of memory.add after each batch of the user is written."""
+        self.listeners.append(listener)
+
+    def submit(self, messages: List[Dict[str, str]], user_id: str):
+        """Queue a conversation turn to be written to the user memories."""
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("The memory writer is closed")
+            now = time.time()
+            pending = self.pending.setdefault(user_id, PendingTurns(first_enqueued_at=now))
+            pending.messages.extend(messages)
+            pending.turns += 1
+            pending.last_enqueued_at = now
+            self.stats["turns_queued"] += 1
+            self.condition.notify_all()
+
+    def discard(self, user_id: str):
+        """Drop the queued turns of a user (e.g. before clearing their memories) and wait for the batch being written."""
+        with self.condition:
+            self.pending.pop(user_id, None)
+            self.retrying.pop(user_id, None)
+            if user_id in self.in_flight:
+                self.discarded.add(user_id)
+            while user_id in self.in_flight:
+                self.condition.wait()
+
+    def get_ready_user(self, now: float):
+        """Returns the user whose turns must be written now and the seconds to wait for the next one."""
+        next_wait = None
+        for user_id, pending in self.retrying.items():
+            if user_id in self.in_flight:
+                continue
+            # Backing off after a failed write, even when flushing
+            if pending.retry_at <= now:
+                return user_id, None
+            next_wait = pending.retry_at - now if next_wait is None else min(next_wait, pending.retry_at - now)
+        for user_id, pending in self.pending.items():
+            if user_id in self.in_flight or user_id in self.retrying:
+                continue
+            ready_at = min(pending.last_enqueued_at + self.coalesce_seconds,
+                           pending.first_enqueued_at + self.max_delay_seconds)
+            if self.flushing or pending.turns >= self.max_batch_turns or ready_at <= now:
+                return user_id, None
+            next_wait = ready_at - now if next_wait is None else min(next_wait, ready_at - now)
+        return None, next_wait
+
+    def run(self):
+        while True:
+            with self.condition:
+                while True:
+                    user_id, wait = self.get_ready_user(time.time())
+                    if user_id is not None:
+                        break
+                    if self.closed and not self.pending and not self.retrying:
+                        return
+                    self.condition.wait(wait)
+                pending = self.retrying.pop(user_id, None) or self.pending.pop(user_id)
+                self.in_flight.add(user_id)
+
+            start_time = time.time()
+            try:
+                result = self.memory.add(pending.messages, user_id=user_id)
+                error = False
+            except Exception as e:
+                print(f"Error writing memories for user {user_id}: {str(e)}")
+                error = True
+            write_seconds = time.time() - start_time
+
+            with self.condition:
+                self.in_flight.discard(user_id)
+                discarded = user_id in self.discarded
+                self.discarded.discard(user_id)
+                if error:
+                    self.stats["errors"] += 1
+                    if not discarded:
+                        self.requeue(user_id, pending)
+                else:
+                    self.stats["turns_written"] += pending.turns
+                    self.stats["batches_written"] += 1
+                    self.stats["total_write_seconds"] += write_seconds
+                    self.stats["max_write_seconds"] = max(self.stats["max_write_seconds"], write_seconds)
+                    self.stats["total_delay_seconds"] += time.time() - pending.first_enqueued_at
+                self.condition.notify_all()
+
+            if not error:
+                for listener in self.listeners:
+                    listener(user_id, result)
+
+    def requeue(self, user_id: str, pending: PendingTurns):
+        """Retry a failed batch before the newer turns of the user, or drop it after max_retries."""
+        if pending.attempts >= self.max_retries:
+            print(f"Dropping {pending.turns} turns of user {user_id} after {pending.attempts + 1} failed writes")
+            self.stats["turns_dropped"] += pending.turns
+            self.stats["batches_dropped"] += 1
+            return
+        pending.attempts += 1
+        pending.retry_at = time.time() + self.retry_backoff_seconds * 2 ** (pending.attempts - 1)
+        self.retrying[user_id] = pending
+        self.stats["retries"] += 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write all the queued turns now and wait for them. Returns False on timeout."""
+        deadline = time.time() + timeout if timeout is not None else None
+        with self.condition:
+            self.flushing = True
+            self.condition.notify_all()
+            try:
+                while self.pending or self.retrying or self.in_flight:
+                    remaining = deadline - time.time() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self.condition.wait(remaining)
+                return True
+            finally:
+                self.flushing = False
+
+    def close(self, timeout: Optional[float] = 30.0) -> bool:
+        """Flush the queued turns and stop the workers (on shutdown)."""
+        flushed = self.flush(timeout)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        return flushed
+
+    def get_metrics(self) -> Dict[str, float]:
+        """Queue depth and write latency metrics."""
+        with self.condition:
+            batches = self.stats["batches_written"]
+            return {
+                "queue_depth": sum(pending.turns for pending in [*self.pending.values(), *self.retrying.values()]),
+                "users_pending": len(self.pending.keys() | self.retrying.keys()),
+                "users_in_flight": len(self.in_flight),
+                "turns_queued": self.stats["turns_queued"],
+                "turns_written": self.stats["turns_written"],
+                "batches_written": batches,
+                "errors": self.stats["errors"],
+                "retries": self.stats["retries"],
+                "turns_dropped": self.stats["turns_dropped"],
+                "batches_dropped": self.stats["batches_dropped"],
+                "avg_write_seconds": round(self.stats["total_write_seconds"] / batches, 3) if batches else 0.0,
+                "max_write_seconds": round(self.stats["max_write_seconds"], 3),
+                "avg_queue_to_written_seconds": round(self.stats["total_delay_seconds"] / batches, 3) if batches else 0.0,
+            }
@@ -11,11 +11,14 @@ import os
 import logging
 from openai import OpenAI
 import asyncio
-import requests
 from datetime import datetime, timedelta
 import dateparser
 import httpx
 import re
+import time
+import json
+import hashlib
+from collections import OrderedDict
 from fastapi.responses import HTMLResponse
 import pytz
 
@@ -41,6 +44,58 @@ if missing_vars:
 
 logger.info("All required environment variables are set")
 
+# Maximum number of matchup predictions generated at the same time
+MAX_CONCURRENT_PREDICTIONS = int(os.getenv("MAX_CONCURRENT_PREDICTIONS", "4"))
+
+# Seconds the balldontlie API responses are cached, by endpoint
+API_CACHE_TTL_SECONDS = {
+    "standings": int(os.getenv("STANDINGS_CACHE_TTL", "600")),
+    "leaders": int(os.getenv("LEADERS_CACHE_TTL", "600")),
+    "games": int(os.getenv("GAMES_CACHE_TTL", "86400")),
+    "odds": int(os.getenv("ODDS_CACHE_TTL", "30")),
+    "player_injuries": int(os.getenv("INJURIES_CACHE_TTL", "300")),
+    "season_averages": int(os.getenv("PLAYER_STATS_CACHE_TTL", "3600")),
+    "stats/advanced": int(os.getenv("PLAYER_STATS_CACHE_TTL", "3600")),
+}
+
+# Retries of the balldontlie API requests rate limited (429) or failed with a 5xx error
+API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "3"))
+
+# Generate the predictions of all the games of a date in one structured-output request
+BATCH_PREDICTIONS = os.getenv("BATCH_PREDICTIONS", "true").lower() == "true"
+BATCH_PREDICTION_MODEL = os.getenv("BATCH_PREDICTION_MODEL", "gpt-4o")
+
+# Seconds a prediction is reused for the same game and odds
+PREDICTION_CACHE_TTL = int(os.getenv("PREDICTION_CACHE_TTL", "86400"))
+
+# Maximum entries of the API responses and predictions caches (least recently used evicted first)
+API_CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "2000"))
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "1000"))
+
+# JSON schema of the batched predictions response
+SLATE_PREDICTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "predictions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "game_id": {"type": "integer"},
+                    "winner": {"type": "string"},
+                    "win_probability": {"type": "integer"},
+                    "analysis": {"type": "string"},
+                    "confidence": {"type": "string", "enum": ["High", "Medium", "Low"]}
+                },
+                "required": ["game_id", "winner", "win_probability", "analysis", "confidence"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["predictions"],
+    "additionalProperties": False
+}
+
 # Initialize FastAPI app
 app = FastAPI()
 security = HTTPBearer()
@@ -59,6 +114,70 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class TTLCache:
+    """In-memory LRU cache with a TTL per entry, at most max_entries entries, and hit/miss stats."""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.time():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Any, value: Any, ttl_seconds: float):
+        if ttl_seconds <= 0:
+            return
+        now = time.time()
+        # Drop the expired entries, so keys that are never read again don't stay forever
+        for expired_key in [k for k, (expires_at, _) in self._entries.items() if expires_at < now]:
+            del self._entries[expired_key]
+        self._entries[key] = (now + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self._entries)
+        }
+
+# balldontlie API responses cache, shared by all the requests
+api_cache = TTLCache(API_CACHE_MAX_ENTRIES)
+
+# Formatted predictions cache, keyed by game id and odds snapshot
+prediction_cache = TTLCache(PREDICTION_CACHE_MAX_ENTRIES)
+
+# Long-lived HTTP client, so the connections to the balldontlie API are kept alive
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared async HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(15.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        )
+    return _http_client
+
+@app.on_event("shutdown")
+async def close_http_client():
+    if _http_client is not None:
+        await _http_client.aclose()
+
 # Request/Response Models
 class AgentRequest(BaseModel):
     query: str
@@ -83,6 +202,36 @@ class NBAPredictor:
         """
         return 2024  # Hardcode to 2024 for now since that's what the API expects
 
+    async def _api_get(self, endpoint: str, params: Dict = None) -> Dict:
+        """
+        GET a balldontlie API endpoint through the shared client. The responses are cached
+        by endpoint and params for API_CACHE_TTL_SECONDS[endpoint], and rate limited (429)
+        or 5xx responses are retried, waiting for the Retry-After header if there is one.
+        """
+        params = params or {}
+        cache_key = (endpoint, tuple(sorted((key, str(value)) for key, value in params.items())))
+        cached = api_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        client = get_http_client()
+        for attempt in range(API_MAX_RETRIES + 1):
+            response = await client.get(
+                f"{self.base_url}/{endpoint}",
+                params=params,
+                headers={"Authorization": self.api_key}
+            )
+            if (response.status_code == 429 or response.status_code >= 500) and attempt < API_MAX_RETRIES:
+                retry_after = response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+                logger.warning(f"balldontlie {endpoint} returned {response.status_code}, retrying in {delay}s")
+                await asyncio.sleep(delay)
+                continue
+            response.raise_for_status()
+            data = response.json()
+            api_cache.set(cache_key, data, API_CACHE_TTL_SECONDS.get(endpoint, 0))
+            return data
+
     async def _is_notable_player(self, player: Dict) -> bool:
         """Determine if a player is notable based on various factors."""
         try:
@@ -106,112 +255,87 @@ class NBAPredictor:
     async def _get_season_averages(self, player_id: int) -> Dict:
         """Get player's season averages for the current season."""
         current_season = 2024  # NBA season 2024-25
-        url = f"{self.base_url}/season_averages"
         params = {
             "season": current_season,
             "player_ids[]": [player_id]  # API expects array of player IDs
         }
-        headers = {"Authorization": self.api_key}
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, headers=headers)
-                response.raise_for_status()
-                data = response.json()
-                return data['data'][0] if data.get('data') else {}
+            data = await self._api_get("season_averages", params)
+            return data['data'][0] if data.get('data') else {}
         except Exception as e:
             logger.error(f"Error fetching season averages: {str(e)}")
             return {}
 
     async def _get_advanced_stats(self, player_id: int, season: int) -> Dict:
         """Get player's advanced stats."""
-        url = f"{self.base_url}/stats/advanced"
         params = {
             "player_ids[]": [player_id],
             "seasons[]": [season],
             "per_page": 100
         }
-        headers = {"Authorization": self.api_key}
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, headers=headers)
-                response.raise_for_status()
-                return response.json()
+            return await self._api_get("stats/advanced", params)
         except Exception as e:
             logger.error(f"Error fetching advanced stats: {str(e)}")
             return {}
 
     async def _get_team_standings(self, player_id: int) -> Dict:
         """Get current team standings."""
-        url = f"{self.base_url}/standings"
         params = {"season": 2024}
-        headers = {"Authorization": self.api_key}
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, headers=headers)
-                response.raise_for_status()
-                data = response.json()
-                
-                # Convert list to dictionary with team_id as key
-                standings_dict = {}
-                for team in data.get('data', []):
-                    if team['team']['id'] == player_id:
-                        standings_dict[player_id] = {
-                            'wins': team.get('wins', 0),
-                            'losses': team.get('losses', 0),
-                            'conference': team.get('conference', 'N/A'),
-                            'conference_rank': team.get('conference_rank', 'N/A'),
-                            'home_record': f"{team.get('home_wins', 0)}-{team.get('home_losses', 0)}",
-                            'road_record': f"{team.get('road_wins', 0)}-{team.get('road_losses', 0)}",
-                            'last_ten': f"{team.get('last_ten_wins', 0)}-{team.get('last_ten_losses', 0)}",
-                            'streak': f"{'W' if team.get('streak_type') == 'win' else 'L'}{team.get('streak', 0)}"
-                        }
-                return standings_dict
-                
+            data = await self._api_get("standings", params)
+            
+            # Convert list to dictionary with team_id as key
+            standings_dict = {}
+            for team in data.get('data', []):
+                if team['team']['id'] == player_id:
+                    standings_dict[player_id] = {
+                        'wins': team.get('wins', 0),
+                        'losses': team.get('losses', 0),
+                        'conference': team.get('conference', 'N/A'),
+                        'conference_rank': team.get('conference_rank', 'N/A'),
+                        'home_record': f"{team.get('home_wins', 0)}-{team.get('home_losses', 0)}",
+                        'road_record': f"{team.get('road_wins', 0)}-{team.get('road_losses', 0)}",
+                        'last_ten': f"{team.get('last_ten_wins', 0)}-{team.get('last_ten_losses', 0)}",
+                        'streak': f"{'W' if team.get('streak_type') == 'win' else 'L'}{team.get('streak', 0)}"
+                    }
+            return standings_dict
+            
         except Exception as e:
             logger.error(f"Error fetching standings: {str(e)}")
             return {}
 
     async def _get_team_leaders(self, team_id: int, season: int) -> Dict:
         """Get team statistical leaders."""
-        url = f"{self.base_url}/leaders"
         stats = ['pts', 'reb', 'ast', 'stl', 'blk']
         leaders = {}
         
-        for stat in stats:
-            params = {
-                "season": season,
-                "stat_type": stat
-            }
-            headers = {"Authorization": self.api_key}
-            
-            try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(url, params=params, headers=headers)
-                    response.raise_for_status()
-                    data = response.json()
-                    # Filter for team's leaders
-                    team_leaders = [p for p in data['data'] if p['player']['team_id'] == team_id]
-                    if team_leaders:
-                        leaders[stat] = team_leaders[0]
-            except Exception as e:
-                logger.error(f"Error fetching {stat} leaders: {str(e)}")
+        # The league leaders of each stat are fetched concurrently
+        results = await asyncio.gather(
+            *[self._api_get("leaders", {"season": season, "stat_type": stat}) for stat in stats],
+            return_exceptions=True
+        )
+        for stat, data in zip(stats, results):
+            if isinstance(data, Exception):
+                logger.error(f"Error fetching {stat} leaders: {str(data)}")
+                continue
+            # Filter for team's leaders
+            team_leaders = [p for p in data['data'] if p['player']['team_id'] == team_id]
+            if team_leaders:
+                leaders[stat] = team_leaders[0]
         
         return leaders
 
     async def get_games(self, date: str) -> List[Dict]:
         """Fetch games for a specific date"""
         logger.info(f"Fetching games for date: {date}")
-        url = f"{self.base_url}/games"
-        headers = {'Authorization': self.api_key}
         params = {'dates[]': date}
         
         try:
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            games = response.json()['data']
+            games = (await self._api_get("games", params))['data']
             logger.info(f"Found {len(games)} games for {date}")
             return games
         except Exception as e:
@@ -220,74 +344,63 @@ class NBAPredictor:
 
     async def get_team_injuries(self, team_id: int) -> List[Dict]:
         """Fetch current injuries for a team"""
-        url = f"{self.base_url}/player_injuries"
-        headers = {'Authorization': self.api_key}
         params = {'team_ids[]': [team_id]}
         
         try:
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()['data']
+            return (await self._api_get("player_injuries", params))['data']
         except Exception as e:
             logger.error(f"Error fetching injuries: {str(e)}")
             return []
 
     async def get_standings(self, season: int = 2024) -> Dict:
         """Get current standings."""
-        url = f"{self.base_url}/standings"
         params = {"season": season}
-        headers = {"Authorization": self.api_key}
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, headers=headers)
-                response.raise_for_status()
-                data = response.json()
-                
-                # Convert list to dictionary with team_id as key
-                standings_dict = {}
-                for team in data.get('data', []):
-                    standings_dict[team['team']['id']] = {
-                        'wins': team.get('wins', 0),
-                        'losses': team.get('losses', 0),
-                        'conference': team.get('conference', 'N/A'),
-                        'conference_rank': team.get('conference_rank', 'N/A'),
-                        'home_record': f"{team.get('home_wins', 0)}-{team.get('home_losses', 0)}",
-                        'road_record': f"{team.get('road_wins', 0)}-{team.get('road_losses', 0)}",
-                        'last_ten': f"{team.get('last_ten_wins', 0)}-{team.get('last_ten_losses', 0)}",
-                        'streak': f"{'W' if team.get('streak_type') == 'win' else 'L'}{team.get('streak', 0)}"
-                    }
-                return standings_dict
-                
+            data = await self._api_get("standings", params)
+            
+            # Convert list to dictionary with team_id as key
+            standings_dict = {}
+            for team in data.get('data', []):
+                standings_dict[team['team']['id']] = {
+                    'wins': team.get('wins', 0),
+                    'losses': team.get('losses', 0),
+                    'conference': team.get('conference', 'N/A'),
+                    'conference_rank': team.get('conference_rank', 'N/A'),
+                    'home_record': f"{team.get('home_wins', 0)}-{team.get('home_losses', 0)}",
+                    'road_record': f"{team.get('road_wins', 0)}-{team.get('road_losses', 0)}",
+                    'last_ten': f"{team.get('last_ten_wins', 0)}-{team.get('last_ten_losses', 0)}",
+                    'streak': f"{'W' if team.get('streak_type') == 'win' else 'L'}{team.get('streak', 0)}"
+                }
+            return standings_dict
+            
         except Exception as e:
             logger.error(f"Error fetching standings: {str(e)}")
             return {}
 
     async def get_betting_odds(self, game_id: int = None, game_date: str = None) -> List[Dict]:
-        """Fetch betting odds for a game"""
+        """Fetch betting odds for a game, or for all the games of a date, following every page"""
         try:
-            async with httpx.AsyncClient() as client:
-                url = "https://api.balldontlie.io/v1/odds"
-                params = {}
-                if game_id:
-                    params['game_id'] = game_id
-                if game_date:
-                    params['date'] = game_date
-                    
-                response = await client.get(
-                    url,
-                    params=params,
-                    headers={"Authorization": self.api_key}
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"Odds API error: {response.status_code} - {response.text}")
-                    return []
-                
-                data = response.json()
-                logger.info(f"Odds data received: {data}")
-                return data.get('data', [])
-                
+            params = {"per_page": 100}
+            if game_id:
+                params['game_id'] = game_id
+            if game_date:
+                params['date'] = game_date
+
+            odds = []
+            while True:
+                data = await self._api_get("odds", params)
+                odds.extend(data.get('data', []))
+                next_cursor = data.get('meta', {}).get('next_cursor')
+                if not next_cursor:
+                    break
+                params = {**params, "cursor": next_cursor}
+            logger.info(f"Odds data received: {len(odds)} odds")
+            return odds
+            
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Odds API error: {e.response.status_code} - {e.response.text}")
+            return []
         except Exception as e:
             logger.error(f"Error fetching betting odds: {str(e)}")
             return []
@@ -344,60 +457,129 @@ class NBAPredictor:
             
             ai_analysis = response.choices[0].message.content.strip()
             
-            # Format the prediction
-            prediction = f"🏀 {away_team['full_name']} (Away) @ {home_team['full_name']} (Home)\n\n"
-            
             # Split the AI response into components
             lines = ai_analysis.split('\n')
             winner_line = next((line for line in lines if line.startswith('Winner:')), '')
             analysis_line = next((line for line in lines if line.startswith('Analysis:')), '')
             confidence_line = next((line for line in lines if line.startswith('Confidence:')), '')
             
-            prediction += f"{winner_line}\n"
-            prediction += f"{analysis_line}\n"
-            prediction += f"{confidence_line}\n"
-            
-            # Format betting lines
-            betting_lines = "\nBetting Lines:"  # Note: only one newline here
-            if odds_data:
-                latest_spread = None
-                latest_over_under = None
-                
-                for odds in odds_data:
-                    if not odds:
-                        continue
-                    
-                    if odds.get('type') == 'spread':
-                        if not latest_spread or odds.get('last_update', '') > latest_spread.get('last_update', ''):
-                            latest_spread = odds
-                    elif odds.get('type') == 'over/under':
-                        if not latest_over_under or odds.get('last_update', '') > latest_over_under.get('last_update', ''):
-                            latest_over_under = odds
-
-                if latest_spread:
-                    try:
-                        away_spread = latest_spread.get('away_spread')
-                        if away_spread is not None:
-                            betting_lines += f"\n{away_team['full_name']} {away_spread}"
-                    except (ValueError, TypeError) as e:
-                        logger.error(f"Error processing spread: {str(e)}")
-
-                if latest_over_under:
-                    try:
-                        total = latest_over_under.get('over_under')
-                        if total is not None:
-                            betting_lines += f"\nO {total}"
-                    except (ValueError, TypeError) as e:
-                        logger.error(f"Error processing over/under: {str(e)}")
-            
-            prediction += betting_lines
-            
-            return prediction
+            return self._format_prediction(
+                home_team, away_team, winner_line, analysis_line, confidence_line, odds_data
+            )
 
         except Exception as e:
             logger.error(f"Error generating prediction: {str(e)}")
             raise
 
+    async def _generate_batch_predictions(self, games: List[Dict], slate_data: Dict) -> Dict[int, str]:
+        """
+        Generate the predictions of several games in one structured-output request.
+        Returns the formatted predictions by game id, only for the games the model answered.
+        """
+        standings = slate_data["standings"]
+        matchups = []
+        for game in games:
+            home_team, away_team = game['home_team'], game['visitor_team']
+            home_injuries = slate_data["injuries"].get(home_team['id'], [])
+            away_injuries = slate_data["injuries"].get(away_team['id'], [])
+            matchups.append(
+                f"Game {game['id']}: {away_team['full_name']} (Away) @ {home_team['full_name']} (Home)\n"
+                f"Current records: {away_team['full_name']}: {standings.get(away_team['id'], {}).get('wins', 0)}-{standings.get(away_team['id'], {}).get('losses', 0)}, "
+                f"{home_team['full_name']}: {standings.get(home_team['id'], {}).get('wins', 0)}-{standings.get(home_team['id'], {}).get('losses', 0)}\n"
+                f"Injuries: {home_team['full_name']} ({len(home_injuries)} players out), {away_team['full_name']} ({len(away_injuries)} players out)"
+            )
+
+        analysis_prompt = (
+            "Analyze each of these NBA matchups. Consider their records, injuries, and recent performance.\n"
+            "For every game, return its game_id, the predicted winner team name, the win probability (%), "
+            "3-4 sentences analyzing key factors including records, matchup advantages, and injury impact, "
+            "and your confidence (High/Medium/Low).\n\n" + "\n\n".join(matchups)
+        )
+
+        response = await asyncio.to_thread(
+            self.openai_client.chat.completions.create,
+            model=BATCH_PREDICTION_MODEL,
+            messages=[
+                {"role": "system", "content": "You are an expert NBA analyst. Provide a prediction for every game."},
+                {"role": "user", "content": analysis_prompt}
+            ],
+            response_format={
+                "type": "json_schema",
+                "json_schema": {"name": "slate_predictions", "strict": True, "schema": SLATE_PREDICTIONS_SCHEMA}
+            },
+            temperature=0.7,
+            max_tokens=250 * len(games)
+        )
+        answers = json.loads(response.choices[0].message.content)["predictions"]
+
+        games_by_id = {game['id']: game for game in games}
+        predictions = {}
+        for answer in answers:
+            game = games_by_id.get(answer["game_id"])
+            if game is None:
+                continue
+            predictions[game['id']] = self._format_prediction(
+                game['home_team'],
+                game['visitor_team'],
+                f"Winner: {answer['winner']} ({answer['win_probability']}%)",
+                f"Analysis: {answer['analysis']}",
+                f"Confidence: {answer['confidence']}",
+                slate_data["odds"].get(game['id'], [])
+            )
+        return predictions
+
+    def _format_prediction(self, home_team: Dict, away_team: Dict, winner_line: str,
+                           analysis_line: str, confidence_line: str, odds_data: List = None) -> str:
+        """Format the prediction and the betting lines."""
+        prediction = f"🏀 {away_team['full_name']} (Away) @ {home_team['full_name']} (Home)\n\n"
+        prediction += f"{winner_line}\n"
+        prediction += f"{analysis_line}\n"
+        prediction += f"{confidence_line}\n"
+        
+        # Format betting lines
+        betting_lines = "\nBetting Lines:"  # Note: only one newline here
+        if odds_data:
+            latest_spread = None
+            latest_over_under = None
+            
+            for odds in odds_data:
+                if not odds:
+                    continue
+                
+                if odds.get('type') == 'spread':
+                    if not latest_spread or odds.get('last_update', '') > latest_spread.get('last_update', ''):
+                        latest_spread = odds
+                elif odds.get('type') == 'over/under':
+                    if not latest_over_under or odds.get('last_update', '') > latest_over_under.get('last_update', ''):
+                        latest_over_under = odds
+
+            if latest_spread:
+                try:
+                    away_spread = latest_spread.get('away_spread')
+                    if away_spread is not None:
+                        betting_lines += f"\n{away_team['full_name']} {away_spread}"
+                except (ValueError, TypeError) as e:
+                    logger.error(f"Error processing spread: {str(e)}")
+
+            if latest_over_under:
+                try:
+                    total = latest_over_under.get('over_under')
+                    if total is not None:
+                        betting_lines += f"\nO {total}"
+                except (ValueError, TypeError) as e:
+                    logger.error(f"Error processing over/under: {str(e)}")
+        
+        prediction += betting_lines
+        
+        return prediction
+
+    def _prediction_cache_key(self, game: Dict, odds_data: List) -> tuple:
+        """Cache key of a game prediction: the game id and a hash of its odds snapshot."""
+        odds_snapshot = hashlib.sha256(
+            json.dumps(odds_data or [], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return (game['id'], odds_snapshot)
+
     def _analyze_over_under(self, total: float, home_team: Dict, away_team: Dict, standings: Dict) -> str:
         """Analyze over/under based on team statistics"""
         try:
@@ -416,29 +598,72 @@ class NBAPredictor:
         except Exception:
             return "Unable to analyze over/under"
 
-    async def analyze_matchup(self, game: Dict) -> Dict:
-        """Analyze a matchup and generate prediction."""
+    async def prefetch_slate_data(self, games: List[Dict], game_date: str = None) -> Dict:
+        """
+        Fetch the data shared by all the matchups of a request once: the standings,
+        the odds of the date and the injuries of every team playing, concurrently.
+        """
+        current_season = self._get_current_nba_season()
+        team_ids = sorted({
+            team_id
+            for game in games
+            for team_id in (game['home_team']['id'], game['visitor_team']['id'])
+        })
+
+        results = await asyncio.gather(
+            self.get_standings(current_season),
+            self.get_betting_odds(game_date=game_date) if game_date else asyncio.sleep(0, result=[]),
+            *[self.get_team_injuries(team_id) for team_id in team_ids]
+        )
+        standings, date_odds = results[0], results[1]
+        injuries = dict(zip(team_ids, results[2:]))
+
+        # Group the odds of the date by game
+        odds = {game['id']: [] for game in games}
+        for game_odds in date_odds or []:
+            if game_odds.get('game_id') in odds:
+                odds[game_odds['game_id']].append(game_odds)
+
+        # Fall back to the per-game odds for the games missing from the date odds
+        missing_games = [game for game in games if not odds[game['id']]]
+        if missing_games:
+            games_odds = await asyncio.gather(
+                *[self.get_betting_odds(game_id=game['id']) for game in missing_games]
+            )
+            for game, game_odds in zip(missing_games, games_odds):
+                odds[game['id']] = game_odds
+
+        return {
+            "standings": standings,
+            "injuries": injuries,
+            "odds": odds
+        }
+
+    async def analyze_matchup(self, game: Dict, slate_data: Dict = None, prediction: str = None) -> Dict:
+        """Analyze a matchup and generate prediction, unless it was already generated."""
         try:
-            # Get current season
-            current_season = self._get_current_nba_season()
-            
-            # Get additional data needed for analysis
-            home_injuries = await self.get_team_injuries(game['home_team']['id'])
-            away_injuries = await self.get_team_injuries(game['visitor_team']['id'])
-            standings = await self.get_standings(current_season)
-            
-            # Get odds data for the game
-            odds_data = await self.get_betting_odds(game_id=game['id'])
+            # Get the data needed for analysis, unless it was prefetched for the whole slate
+            if slate_data is None:
+                slate_data = await self.prefetch_slate_data([game])
+
+            standings = slate_data["standings"]
+            home_injuries = slate_data["injuries"].get(game['home_team']['id'], [])
+            away_injuries = slate_data["injuries"].get(game['visitor_team']['id'], [])
+            odds_data = slate_data["odds"].get(game['id'], [])
             
             # Generate prediction
-            prediction = await self._generate_prediction(
-                game['home_team'],
-                game['visitor_team'],
-                standings,
-                home_injuries,
-                away_injuries,
-                odds_data
-            )
+            if prediction is None:
+                prediction = await self._generate_prediction(
+                    game['home_team'],
+                    game['visitor_team'],
+                    standings,
+                    home_injuries,
+                    away_injuries,
+                    odds_data
+                )
+                prediction_cache.set(
+                    self._prediction_cache_key(game, odds_data), prediction, PREDICTION_CACHE_TTL
+                )
             
             return {
                 "matchup": f"{game['visitor_team']['full_name']} @ {game['home_team']['full_name']}",
@@ -458,6 +683,61 @@ class NBAPredictor:
             logger.error(f"Error in analyze_matchup: {str(e)}")
             raise
 
+    async def analyze_slate(self, games: List[Dict], game_date: str = None) -> List[Dict]:
+        """
+        Analyze all the games of a request: prefetch the shared data once, reuse the cached
+        predictions of the games whose odds didn't change, generate the others in one batched
+        request, and fall back to per-game predictions in parallel, up to
+        MAX_CONCURRENT_PREDICTIONS at the same time, for the games the batch didn't answer.
+        The predictions are returned in the same order as the games.
+        """
+        if not games:
+            return []
+
+        start_time = time.perf_counter()
+        slate_data = await self.prefetch_slate_data(games, game_date)
+        prefetch_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        ready_predictions = {}
+        for game in games:
+            cached = prediction_cache.get(
+                self._prediction_cache_key(game, slate_data["odds"].get(game['id'], []))
+            )
+            if cached is not None:
+                ready_predictions[game['id']] = cached
+
+        missing_games = [game for game in games if game['id'] not in ready_predictions]
+        if BATCH_PREDICTIONS and len(missing_games) > 1:
+            try:
+                batch_predictions = await self._generate_batch_predictions(missing_games, slate_data)
+                for game in missing_games:
+                    if game['id'] in batch_predictions:
+                        prediction_cache.set(
+                            self._prediction_cache_key(game, slate_data["odds"].get(game['id'], [])),
+                            batch_predictions[game['id']],
+                            PREDICTION_CACHE_TTL
+                        )
+                ready_predictions.update(batch_predictions)
+            except Exception as e:
+                logger.error(f"Error generating batch predictions, falling back to per-game predictions: {str(e)}")
+
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_PREDICTIONS)
+
+        async def analyze_with_limit(game: Dict) -> Dict:
+            async with semaphore:
+                return await self.analyze_matchup(game, slate_data, ready_predictions.get(game['id']))
+
+        predictions = await asyncio.gather(*[analyze_with_limit(game) for game in games])
+        predictions_seconds = time.perf_counter() - start_time
+
+        logger.info(
+            f"Slate timings | games: {len(games)} | prefetch: {prefetch_seconds:.2f}s | "
+            f"predictions: {predictions_seconds:.2f}s | API cache: {api_cache.stats()} | "
+            f"prediction cache: {prediction_cache.stats()}"
+        )
+        return predictions
+
     async def parse_game_date(self, query: str) -> str:
         """Parse date from query with timezone handling."""
         try:
@@ -598,8 +878,9 @@ async def nba_agent(
 
         logger.info(f"Parsed date for games: {game_date}")
         
+        start_time = time.perf_counter()
         games = await predictor.get_games(game_date)
-        logger.info(f"Found {len(games)} games for {game_date}")
+        logger.info(f"Found {len(games)} games for {game_date} in {time.perf_counter() - start_time:.2f}s")
         
         if not games:
             agent_response = f"I couldn't find any NBA games scheduled for {game_date}."
@@ -661,8 +942,7 @@ async def nba_agent(
             
             # Analyze filtered games
             all_predictions = []
-            for game in games:
-                prediction_data = await predictor.analyze_matchup(game)
+            for prediction_data in await predictor.analyze_slate(games, game_date):
                 all_predictions.append({
                     "matchup": prediction_data["matchup"],
                     "prediction": prediction_data["prediction"],
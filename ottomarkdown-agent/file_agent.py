@@ -10,13 +10,20 @@ import sys
 import os
 import base64
 from openai import OpenAI
-from markitdown import MarkItDown
+from markitdown import MarkItDown, StreamInfo, UnsupportedFormatException
 import hashlib
 from datetime import datetime
 import logging
 import imghdr
 import io
 import re
+import asyncio
+import functools
+import tempfile
+import threading
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(
@@ -50,6 +57,32 @@ md = MarkItDown(
     llm_model=os.getenv("OPENROUTER_MODEL", "mistralai/mistral-7b-instruct")
 )
 
+# Worker pool for the blocking conversions and LLM calls, and maximum number of files
+# converted at the same time for a single request
+CONVERSION_WORKERS = int(os.getenv("CONVERSION_WORKERS", "8"))
+MAX_CONCURRENT_CONVERSIONS = int(os.getenv("MAX_CONCURRENT_CONVERSIONS", "4"))
+conversion_pool = ThreadPoolExecutor(max_workers=CONVERSION_WORKERS, thread_name_prefix="markitdown")
+
+# MarkItDown converters, one per model, reused by all the requests
+converters: Dict[str, MarkItDown] = {}
+converters_lock = threading.Lock()
+
+# Local document cache in front of the Supabase document_cache table: an in-process LRU and
+# an optional disk LRU (disabled if DOCUMENT_DISK_CACHE_DIR is empty)
+DOCUMENT_MEMORY_CACHE_SIZE = int(os.getenv("DOCUMENT_MEMORY_CACHE_SIZE", "256"))
+DOCUMENT_DISK_CACHE_DIR = os.getenv("DOCUMENT_DISK_CACHE_DIR", "markdown_results/document_cache")
+DOCUMENT_DISK_CACHE_SIZE = int(os.getenv("DOCUMENT_DISK_CACHE_SIZE", "2000"))
+
+# Seconds the last_accessed updates of the Supabase cache hits are buffered before being
+# written in bulk
+LAST_ACCESSED_FLUSH_SECONDS = float(os.getenv("LAST_ACCESSED_FLUSH_SECONDS", "10"))
+
+# document_cache table eviction: least recently accessed rows beyond the maximum number of
+# rows, and rows not accessed for the maximum age, are deleted every N stored documents
+DOCUMENT_CACHE_MAX_ROWS = int(os.getenv("DOCUMENT_CACHE_MAX_ROWS", "10000"))
+DOCUMENT_CACHE_MAX_AGE_DAYS = int(os.getenv("DOCUMENT_CACHE_MAX_AGE_DAYS", "30"))
+DOCUMENT_CACHE_EVICT_EVERY = int(os.getenv("DOCUMENT_CACHE_EVICT_EVERY", "50"))
+
 # Supabase setup
 supabase: Client = create_client(
     os.getenv("SUPABASE_URL"),
@@ -144,6 +177,44 @@ async def store_message(session_id: str, message_type: str, content: str, data:
         # Don't raise the exception, just log it
         # This prevents message storage failures from breaking the main functionality
 
+def get_converter(model: str) -> MarkItDown:
+    """Return the shared MarkItDown converter for the model, creating it on first use."""
+    with converters_lock:
+        if model not in converters:
+            converters[model] = MarkItDown(
+                llm_client=openai_client,
+                llm_model=model
+            )
+        return converters[model]
+
+def convert_bytes_to_markdown(content: bytes, file_name: str, file_type: Optional[str], model: str) -> str:
+    """
+    Convert the file content to markdown. The content is passed to MarkItDown as a stream;
+    a uniquely named temporary file is only used if the stream format isn't recognized.
+    Blocking, it's run in the conversion pool.
+    """
+    converter = get_converter(model)
+    extension = os.path.splitext(file_name)[1] or None
+    try:
+        result = converter.convert_stream(
+            io.BytesIO(content),
+            stream_info=StreamInfo(extension=extension, filename=file_name, mimetype=file_type or None),
+            use_llm=True
+        )
+    except UnsupportedFormatException:
+        with tempfile.NamedTemporaryFile(prefix="temp_file_", suffix=extension or "", delete=False) as temp_file:
+            temp_file.write(content)
+        try:
+            result = converter.convert(temp_file.name, use_llm=True)
+        finally:
+            os.remove(temp_file.name)
+    return result.text_content
+
+async def run_in_conversion_pool(func, *args, **kwargs):
+    """Run a blocking function in the conversion pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(conversion_pool, functools.partial(func, *args, **kwargs))
+
 async def generate_summary(text: str) -> str:
     """Generate a summary using the OpenRouter API with Mistral model."""
     try:
@@ -151,7 +222,8 @@ async def generate_summary(text: str) -> str:
         if not model:
             raise ValueError("OPENROUTER_MODEL environment variable not set")
             
-        response = openai_client.chat.completions.create(
+        response = await run_in_conversion_pool(
+            openai_client.chat.completions.create,
             model=model,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that provides concise summaries."},
@@ -190,99 +262,235 @@ async def save_markdown_file(filename: str, content: str, summary: str = None) -
         logger.error(f"Error saving markdown file: {str(e)}")
         return ""
 
+async def process_file_to_string(i: int, file: Dict[str, Any], query: str = "") -> str:
+    """Convert one file with base64 content into its formatted section using MarkItDown."""
+    # Skip system files
+    if file['name'].startswith('.'):
+        logger.info(f"Skipping system file: {file['name']}")
+        return ""
+
+    decoded_content = b""
+    is_image = False
+    try:
+        decoded_content = base64.b64decode(file['base64'])
+        
+        # Detect if the content is an image using imghdr
+        content_stream = io.BytesIO(decoded_content)
+        image_type = imghdr.what(content_stream)
+        is_image = image_type is not None
+        
+        # Use the appropriate model based on file type
+        if is_image:
+            model = os.getenv("OPENROUTER_VLM_MODEL")
+            if not model:
+                raise ValueError("OPENROUTER_VLM_MODEL environment variable not set")
+            logger.info(f"Detected image type: {image_type}, using vision model: {model}")
+        else:
+            model = os.getenv("OPENROUTER_MODEL")
+            if not model:
+                raise ValueError("OPENROUTER_MODEL environment variable not set")
+        
+        # Convert file to markdown using MarkItDown
+        markdown_content = await run_in_conversion_pool(
+            convert_bytes_to_markdown, decoded_content, file['name'], file.get('type'), model
+        )
+        
+        # If query is provided, use it with LLM
+        if query:
+            response = await run_in_conversion_pool(
+                openai_client.chat.completions.create,
+                model=os.getenv("OPENROUTER_MODEL"),
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant that processes text based on user queries."},
+                    {"role": "user", "content": f"{query}\n\nText to process:\n{markdown_content}"}
+                ]
+            )
+            processed_content = response.choices[0].message.content
+            section = f"{i}. {file['name']}:\n\n{processed_content}\n\n"
+        else:
+            section = f"{i}. {file['name']}:\n\n{markdown_content}\n\n"
+            
+        logger.info(f"Successfully processed {file['name']}")
+        return section
+        
+    except Exception as e:
+        logger.error(f"Error processing file {file['name']}: {str(e)}")
+        # Fallback to direct text conversion if markdown conversion fails
+        try:
+            if is_image:
+                return f"{i}. {file['name']} (image file - processing failed)\n\n"
+            text_content = decoded_content.decode('utf-8')
+            return f"{i}. {file['name']} (plain text):\n\n{text_content}\n\n"
+        except:
+            return f"{i}. {file['name']} (failed to process)\n\n"
+
 async def process_files_to_string(files: Optional[List[Dict[str, Any]]], query: str = "") -> str:
-    """Convert a list of files with base64 content into a formatted string using MarkItDown."""
+    """
+    Convert a list of files with base64 content into a formatted string using MarkItDown.
+    The files are converted concurrently, up to MAX_CONCURRENT_CONVERSIONS at the same time,
+    and the sections keep the order of the files.
+    """
     if not files:
         return ""
         
-    file_content = "File content to use as context:\n\n"
-    
-    for i, file in enumerate(files, 1):
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_CONVERSIONS)
+
+    async def process_with_limit(i: int, file: Dict[str, Any]) -> str:
+        async with semaphore:
+            return await process_file_to_string(i, file, query)
+
+    sections = await asyncio.gather(
+        *[process_with_limit(i, file) for i, file in enumerate(files, 1)]
+    )
+    return "File content to use as context:\n\n" + "".join(sections)
+
+class LocalDocumentCache:
+    """
+    Local LRU of converted documents, keyed by the document hash. Entries are kept in memory
+    and, if a directory is given, also on disk so they survive restarts.
+    """
+
+    def __init__(self, memory_size: int, disk_dir: str = "", disk_size: int = 0):
+        self.memory_size = memory_size
+        self.disk_dir = disk_dir
+        self.disk_size = disk_size
+        self.entries: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        self.lock = threading.Lock()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, doc_hash: str) -> str:
+        return os.path.join(self.disk_dir, f"{doc_hash}.json")
+
+    def _remember(self, doc_hash: str, entry: Dict[str, str]):
+        with self.lock:
+            self.entries[doc_hash] = entry
+            self.entries.move_to_end(doc_hash)
+            while len(self.entries) > self.memory_size:
+                self.entries.popitem(last=False)
+
+    def get(self, doc_hash: str) -> Optional[Dict[str, str]]:
+        """Return the cached entry (file_name and markdown_content). Blocking on a memory miss."""
+        with self.lock:
+            entry = self.entries.get(doc_hash)
+            if entry is not None:
+                self.entries.move_to_end(doc_hash)
+                return entry
+        if not self.disk_dir:
+            return None
         try:
-            # Skip system files
-            if file['name'].startswith('.'):
-                logger.info(f"Skipping system file: {file['name']}")
-                continue
-                
-            # Save base64 content to a temporary file
-            decoded_content = base64.b64decode(file['base64'])
-            
-            # Detect if the content is an image using imghdr
-            content_stream = io.BytesIO(decoded_content)
-            image_type = imghdr.what(content_stream)
-            is_image = image_type is not None
-            
-            temp_file_path = f"/tmp/temp_file_{file['name']}"
-            with open(temp_file_path, "wb") as f:
-                f.write(decoded_content)
-            
-            # Create appropriate MarkItDown instance based on file type
-            if is_image:
-                vlm_model = os.getenv("OPENROUTER_VLM_MODEL")
-                if not vlm_model:
-                    raise ValueError("OPENROUTER_VLM_MODEL environment variable not set")
-                    
-                logger.info(f"Detected image type: {image_type}, using vision model: {vlm_model}")
-                temp_md = MarkItDown(
-                    llm_client=openai_client,
-                    llm_model=vlm_model
-                )
-            else:
-                model = os.getenv("OPENROUTER_MODEL")
-                if not model:
-                    raise ValueError("OPENROUTER_MODEL environment variable not set")
-                    
-                temp_md = MarkItDown(
-                    llm_client=openai_client,
-                    llm_model=model
-                )
-            
-            # Convert file to markdown using MarkItDown
-            result = temp_md.convert(temp_file_path, use_llm=True)
-            markdown_content = result.text_content
-            
-            # Clean up temporary file
-            os.remove(temp_file_path)
-            
-            # If query is provided, use it with LLM
-            if query:
-                response = openai_client.chat.completions.create(
-                    model=os.getenv("OPENROUTER_MODEL"),
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant that processes text based on user queries."},
-                        {"role": "user", "content": f"{query}\n\nText to process:\n{markdown_content}"}
-                    ]
-                )
-                processed_content = response.choices[0].message.content
-                file_content += f"{i}. {file['name']}:\n\n{processed_content}\n\n"
-            else:
-                file_content += f"{i}. {file['name']}:\n\n{markdown_content}\n\n"
-                
-            logger.info(f"Successfully processed {file['name']}")
-            
-        except Exception as e:
-            logger.error(f"Error processing file {file['name']}: {str(e)}")
-            # Fallback to direct text conversion if markdown conversion fails
+            with open(self._disk_path(doc_hash), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            # Touch the file, so the disk eviction removes the least recently used ones
+            os.utime(self._disk_path(doc_hash))
+        except (OSError, ValueError):
+            return None
+        self._remember(doc_hash, entry)
+        return entry
+
+    def set(self, doc_hash: str, file_name: str, markdown: str):
+        """Cache the document. Blocking when the disk cache is enabled."""
+        entry = {"file_name": file_name, "markdown_content": markdown}
+        self._remember(doc_hash, entry)
+        if not self.disk_dir:
+            return
+        try:
+            with tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', dir=self.disk_dir, suffix=".tmp", delete=False
+            ) as f:
+                json.dump(entry, f)
+            os.replace(f.name, self._disk_path(doc_hash))
+            self._evict_disk()
+        except OSError as e:
+            logger.error(f"Error writing the document disk cache: {str(e)}")
+
+    def _evict_disk(self):
+        paths = [
+            os.path.join(self.disk_dir, name)
+            for name in os.listdir(self.disk_dir) if name.endswith(".json")
+        ]
+        if len(paths) <= self.disk_size:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - self.disk_size]:
             try:
-                if is_image:
-                    file_content += f"{i}. {file['name']} (image file - processing failed)\n\n"
-                else:
-                    text_content = decoded_content.decode('utf-8')
-                    file_content += f"{i}. {file['name']} (plain text):\n\n{text_content}\n\n"
-            except:
-                file_content += f"{i}. {file['name']} (failed to process)\n\n"
-    
-    return file_content
+                os.remove(path)
+            except OSError:
+                pass
+
+local_document_cache = LocalDocumentCache(
+    DOCUMENT_MEMORY_CACHE_SIZE, DOCUMENT_DISK_CACHE_DIR, DOCUMENT_DISK_CACHE_SIZE
+)
+
+class LastAccessedBatcher:
+    """Buffer the last_accessed updates of the document_cache hits and write them in bulk."""
+
+    def __init__(self, flush_seconds: float):
+        self.flush_seconds = flush_seconds
+        self.pending: set = set()
+        self.flush_task: Optional[asyncio.Task] = None
+
+    def touch(self, doc_hash: str):
+        self.pending.add(doc_hash)
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_seconds)
+        await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+        doc_hashes, self.pending = list(self.pending), set()
+        try:
+            await asyncio.to_thread(
+                lambda: supabase.table('document_cache')
+                    .update({'last_accessed': datetime.utcnow().isoformat()})
+                    .in_('doc_hash', doc_hashes)
+                    .execute()
+            )
+        except Exception as e:
+            logger.error(f"Error updating document cache last_accessed: {str(e)}")
+
+last_accessed_batcher = LastAccessedBatcher(LAST_ACCESSED_FLUSH_SECONDS)
+stored_documents_count = 0
+# Running document cache eviction tasks
+eviction_tasks = set()
+
+@app.on_event("shutdown")
+async def flush_document_cache_updates():
+    await last_accessed_batcher.flush()
 
 async def get_document_hash(file_data: Dict[str, Any]) -> str:
-    """Generate a unique hash for a document based on its content"""
-    content = file_data.get('base64', '') or file_data.get('content', '')
-    name = file_data.get('name', '')
-    file_type = file_data.get('type', '')
-    
-    # Combine all fields to create a unique hash
-    hash_input = f"{content}{name}{file_type}".encode('utf-8')
-    return hashlib.sha256(hash_input).hexdigest()
+    """
+    Generate a unique hash for a document based on its decoded content, so the same document
+    uploaded with a different name still hits the cache
+    """
+    content = file_data.get('base64', '')
+    if content:
+        content_bytes = base64.b64decode(content)
+    else:
+        content_bytes = (file_data.get('content', '') or '').encode('utf-8')
+    return hashlib.sha256(content_bytes).hexdigest()
+
+def rename_cached_markdown(markdown: str, cached_name: Optional[str], name: str) -> str:
+    """Replace the file name of a cached conversion with the name of the uploaded file."""
+    if not cached_name or cached_name == name:
+        return markdown
+    return markdown.replace(f"1. {cached_name}", f"1. {name}", 1)
+
+async def evict_document_cache(supabase_client):
+    """Apply the document_cache table size and age limits."""
+    try:
+        await asyncio.to_thread(
+            lambda: supabase_client.rpc('evict_document_cache', {
+                'max_rows': DOCUMENT_CACHE_MAX_ROWS,
+                'max_age_days': DOCUMENT_CACHE_MAX_AGE_DAYS
+            }).execute()
+        )
+    except Exception as e:
+        logger.error(f"Error evicting the document cache: {str(e)}")
 
 async def store_document_markdown(
     supabase_client,
@@ -290,7 +498,8 @@ async def store_document_markdown(
     markdown: str,
     file_data: Dict[str, Any]
 ) -> Dict[str, Any]:
-    """Store document markdown in Supabase"""
+    """Store document markdown in Supabase, evicting old entries every DOCUMENT_CACHE_EVICT_EVERY documents"""
+    global stored_documents_count
     doc_data = {
         'doc_hash': doc_hash,
         'file_name': file_data.get('name'),
@@ -300,30 +509,59 @@ async def store_document_markdown(
         'last_accessed': datetime.utcnow().isoformat()
     }
     
-    result = supabase_client.table('document_cache').upsert(doc_data).execute()
+    result = await asyncio.to_thread(
+        lambda: supabase_client.table('document_cache').upsert(doc_data, on_conflict='doc_hash').execute()
+    )
+    stored_documents_count += 1
+    if DOCUMENT_CACHE_EVICT_EVERY and stored_documents_count % DOCUMENT_CACHE_EVICT_EVERY == 0:
+        # Keep a reference to the task, so it isn't garbage collected before it finishes
+        task = asyncio.create_task(evict_document_cache(supabase_client))
+        eviction_tasks.add(task)
+        task.add_done_callback(eviction_tasks.discard)
     return result.data[0] if result.data else None
 
 async def get_cached_markdown(
     supabase_client,
     doc_hash: str
-) -> Optional[str]:
-    """Retrieve cached markdown from Supabase"""
-    result = supabase_client.table('document_cache')\
-        .select('markdown_content')\
-        .eq('doc_hash', doc_hash)\
-        .execute()
+) -> Optional[Dict[str, str]]:
+    """
+    Retrieve cached markdown (and the file name it was converted with) from Supabase.
+    The last_accessed timestamp is updated in bulk in the background.
+    """
+    result = await asyncio.to_thread(
+        lambda: supabase_client.table('document_cache')
+            .select('file_name, markdown_content')
+            .eq('doc_hash', doc_hash)
+            .execute()
+    )
     
     if result.data:
-        # Update last accessed timestamp
-        supabase_client.table('document_cache')\
-            .update({'last_accessed': datetime.utcnow().isoformat()})\
-            .eq('doc_hash', doc_hash)\
-            .execute()
-        return result.data[0]['markdown_content']
+        last_accessed_batcher.touch(doc_hash)
+        return result.data[0]
     return None
 
-async def process_file_cached(name: str, file_type: str, base64_content: str, model: str, use_cache: bool = True) -> Optional[str]:
-    """Process a single file with caching."""
+def new_cache_stats() -> Dict[str, Any]:
+    """Per-request document cache counters."""
+    return {"local_hits": 0, "supabase_hits": 0, "misses": 0}
+
+def get_cache_hit_ratios(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the local, Supabase and total hit ratios to the cache counters."""
+    total = stats["local_hits"] + stats["supabase_hits"] + stats["misses"]
+    return {
+        **stats,
+        "local_hit_ratio": round(stats["local_hits"] / total, 3) if total else 0.0,
+        "supabase_hit_ratio": round(stats["supabase_hits"] / total, 3) if total else 0.0,
+        "hit_ratio": round((stats["local_hits"] + stats["supabase_hits"]) / total, 3) if total else 0.0
+    }
+
+async def process_file_cached(name: str, file_type: str, base64_content: str, model: str, use_cache: bool = True,
+                              stats: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    Process a single file with caching: the local LRU first, then the Supabase document_cache
+    table, and the conversion on a miss. The tier that answered is counted in stats.
+    """
+    if stats is None:
+        stats = new_cache_stats()
     try:
         # Create file data
         file_data = {
@@ -337,15 +575,26 @@ async def process_file_cached(name: str, file_type: str, base64_content: str, mo
         doc_hash = await get_document_hash(file_data)
         
         if use_cache:
-            # Try to get cached markdown
-            cached_markdown = await get_cached_markdown(supabase, doc_hash)
-            if cached_markdown:
-                return cached_markdown
+            # Try the local cache, then the Supabase cache
+            cached = await asyncio.to_thread(local_document_cache.get, doc_hash)
+            if cached:
+                stats["local_hits"] += 1
+                return rename_cached_markdown(cached['markdown_content'], cached.get('file_name'), name)
+
+            cached = await get_cached_markdown(supabase, doc_hash)
+            if cached and cached.get('markdown_content'):
+                stats["supabase_hits"] += 1
+                await asyncio.to_thread(
+                    local_document_cache.set, doc_hash, cached.get('file_name'), cached['markdown_content']
+                )
+                return rename_cached_markdown(cached['markdown_content'], cached.get('file_name'), name)
         
         # Convert file if not in cache
+        stats["misses"] += 1
         markdown = await process_files_to_string([file_data])
         if markdown:
             # Store in cache
+            await asyncio.to_thread(local_document_cache.set, doc_hash, name, markdown)
             await store_document_markdown(supabase, doc_hash, markdown, file_data)
             return markdown
             
@@ -426,7 +675,6 @@ async def convert_to_markdown(
     try:
         logger.info(f"Processing file: {request.file['name']}")
         
-        # Save base64 content to a temporary file
         decoded_content = base64.b64decode(request.file['base64'])
         
         # Detect if the content is an image using imghdr
@@ -434,22 +682,16 @@ async def convert_to_markdown(
         image_type = imghdr.what(content_stream)
         is_image = image_type is not None
         
-        temp_file_path = f"/tmp/temp_file_{request.file['name']}"
         try:
-            with open(temp_file_path, "wb") as f:
-                f.write(decoded_content)
-            logger.info(f"Saved content to temporary file: {temp_file_path}")
-            
             if is_image:
                 logger.info(f"Detected image type: {image_type}, using vision model: {os.getenv('OPENROUTER_VLM_MODEL')}")
                 try:
-                    # Create a new MarkItDown instance with the vision model
-                    temp_md = MarkItDown(
-                        llm_client=openai_client,
-                        llm_model=os.getenv("OPENROUTER_VLM_MODEL")
+                    # Use the shared MarkItDown converter of the vision model
+                    markdown_content = await run_in_conversion_pool(
+                        convert_bytes_to_markdown, decoded_content, request.file['name'],
+                        request.file.get('type'), os.getenv("OPENROUTER_VLM_MODEL")
                     )
-                    result = temp_md.convert(temp_file_path, use_llm=True)
-                    if not result.text_content:
+                    if not markdown_content:
                         raise Exception("Vision model returned empty response")
                     logger.info("Successfully used vision model")
                 except Exception as vision_error:
@@ -466,22 +708,16 @@ async def convert_to_markdown(
                     )
             else:
                 # Use default model for non-image files
-                temp_md = MarkItDown(
-                    llm_client=openai_client,
-                    llm_model=os.getenv("OPENROUTER_MODEL")
+                markdown_content = await run_in_conversion_pool(
+                    convert_bytes_to_markdown, decoded_content, request.file['name'],
+                    request.file.get('type'), os.getenv("OPENROUTER_MODEL")
                 )
-                result = temp_md.convert(temp_file_path, use_llm=True)
             
-            markdown_content = result.text_content
             if not markdown_content:
                 raise Exception("No markdown content generated")
             
             logger.info(f"Successfully converted file. Output length: {len(markdown_content)}")
             
-            # Clean up temporary file
-            os.remove(temp_file_path)
-            logger.info("Cleaned up temporary file")
-            
             return MarkdownResponse(
                 success=True,
                 markdown=markdown_content
@@ -536,6 +772,7 @@ async def process_files_cached(
 
         # Process each file
         results = []
+        cache_stats = new_cache_stats()
         for file_data in files:
             try:
                 # Extract file info
@@ -553,7 +790,8 @@ async def process_files_cached(
                     file_type=file_type,
                     base64_content=base64_content,
                     model=model,
-                    use_cache=use_cache
+                    use_cache=use_cache,
+                    stats=cache_stats
                 )
                 
                 if result:
@@ -568,7 +806,8 @@ async def process_files_cached(
             return {
                 "success": False,
                 "error": "No valid files were processed",
-                "markdown": ""
+                "markdown": "",
+                "cache_stats": get_cache_hit_ratios(cache_stats)
             }
         
         # Store conversation messages
@@ -590,9 +829,12 @@ async def process_files_cached(
             logger.error(f"Error storing messages: {str(e)}")
             # Continue even if message storage fails
         
+        cache_stats = get_cache_hit_ratios(cache_stats)
+        logger.info(f"Document cache stats: {cache_stats}")
         return {
             "success": True,
-            "markdown": "\n\n".join(results)
+            "markdown": "\n\n".join(results),
+            "cache_stats": cache_stats
         }
         
     except Exception as e:
@@ -0,0 +1,36 @@
+-- Create index for the least recently accessed lookups of the eviction
+create index if not exists idx_document_cache_last_accessed on document_cache(last_accessed);
+
+-- Allow delete access to authenticated users
+create policy "Users can delete document cache"
+    on document_cache for delete
+    using (true);
+
+-- Delete the documents not accessed for max_age_days, and the least recently
+-- accessed ones beyond max_rows. Returns the number of deleted rows.
+create or replace function evict_document_cache(max_rows integer, max_age_days integer)
+returns integer
+language plpgsql
+as $$
+declare
+    deleted_count integer := 0;
+    affected_rows integer;
+begin
+    delete from document_cache
+    where last_accessed < now() - make_interval(days => max_age_days);
+    get diagnostics affected_rows = row_count;
+    deleted_count := deleted_count + affected_rows;
+
+    delete from document_cache
+    where id in (
+        select id from document_cache
+        order by last_accessed desc
+        offset max_rows
+    );
+    get diagnostics affected_rows = row_count;
+    return deleted_count + affected_rows;
+end;
+$$;
+
+-- Notify Supabase of schema changes
+notify pgrst, 'reload schema';
@@ -1,20 +1,24 @@
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import StateGraph, START, END
 from langgraph.config import get_stream_writer
-from typing import Annotated, Dict, List, Any
+from typing import Annotated, Dict, List, Any, Tuple, Union
 from typing_extensions import TypedDict
 from langgraph.types import interrupt
 from pydantic import ValidationError
 from dataclasses import dataclass
+from contextlib import asynccontextmanager
+from functools import lru_cache, wraps
 import logfire
 import asyncio
+import time
 import sys
 import os
 
 # Import the message classes from Pydantic AI
 from pydantic_ai.messages import (
     ModelMessage,
-    ModelMessagesTypeAdapter
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    SystemPromptPart
 )
 
 # Import the agents
@@ -24,20 +28,47 @@ from agents.flight_agent import flight_agent, FlightDeps
 from agents.hotel_agent import hotel_agent, HotelDeps
 from agents.activity_agent import activity_agent
 from agents.final_planner_agent import final_planner_agent
+from agents.summary_agent import summary_agent
+from checkpointer import get_memory_checkpointer, open_checkpointer
+from node_cache import get_node_cache, make_cache_key
 
 logfire.configure(send_to_logfire='if-token-present')
 
+# Maximum number of conversation turns kept verbatim in the state (0 keeps every turn).
+# Once the history grows past this, the oldest turns are replaced by a summary and only
+# the most recent half of the window is kept.
+MAX_HISTORY_TURNS = int(os.getenv('MAX_HISTORY_TURNS', '10'))
+
+# Cache of the recommendation node results, keyed by the inputs each node uses
+node_cache = get_node_cache()
+
+SUMMARY_PREFIX = "Summary of the earlier conversation with the user:\n"
+
+@dataclass
+class MessageWindow:
+    """Update for the messages channel that replaces the history instead of appending to it."""
+    messages: List[bytes]
+
+def update_messages(existing: List[bytes], new: Union[List[bytes], MessageWindow]) -> List[bytes]:
+    """Reducer for the messages channel: append new turns, or replace the window after a compaction."""
+    if isinstance(new, MessageWindow):
+        return list(new.messages)
+    return existing + new
+
 # Define the state for our graph
 class TravelState(TypedDict):
     # Chat messages and travel details
     user_input: str
-    messages: Annotated[List[bytes], lambda x, y: x + y]
+    messages: Annotated[List[bytes], update_messages]
     travel_details: Dict[str, Any]
 
     # User preferences
     preferred_airlines: List[str]
     hotel_amenities: List[str]
     budget_level: str
+
+    # Stream each recommendation as soon as it's ready and draft the plan incrementally
+    incremental_planning: bool
     
     # Results from each agent
     flight_results: str
@@ -47,17 +78,85 @@ class TravelState(TypedDict):
     # Final summary
     final_plan: str
 
+# Helpers for the conversation history
+
+@lru_cache(maxsize=2048)
+def parse_message_row(message_row: bytes) -> Tuple[ModelMessage, ...]:
+    """Deserialize one stored turn. Turns never change once stored, so each one is only validated once."""
+    return tuple(ModelMessagesTypeAdapter.validate_json(message_row))
+
+def render_transcript(messages: List[ModelMessage]) -> str:
+    """Turn messages into a plain text transcript for the summary agent."""
+    lines = []
+    for message in messages:
+        for part in message.parts:
+            if part.part_kind == 'system-prompt' and part.content.startswith(SUMMARY_PREFIX):
+                lines.append(f"Previous summary: {part.content[len(SUMMARY_PREFIX):]}")
+            elif part.part_kind == 'user-prompt':
+                lines.append(f"User: {part.content}")
+            elif part.part_kind == 'text':
+                lines.append(f"Assistant: {part.content}")
+            elif part.part_kind == 'tool-call':
+                lines.append(f"Assistant: {part.args_as_json_str()}")
+    return "\n".join(lines)
+
+async def compact_history(message_rows: List[bytes]) -> MessageWindow:
+    """Summarize the oldest turns and keep only the most recent half of the window verbatim.
+
+    The system prompt parts of the dropped turns are carried over into the new first message,
+    since Pydantic AI does not add the system prompt again when a message history is given.
+    """
+    keep = max(1, MAX_HISTORY_TURNS // 2)
+    old_messages = [message for row in message_rows[:-keep] for message in parse_message_row(row)]
+
+    system_parts = [
+        part
+        for message in old_messages if isinstance(message, ModelRequest)
+        for part in message.parts
+        if part.part_kind == 'system-prompt' and not part.content.startswith(SUMMARY_PREFIX)
+    ]
+
+    result = await summary_agent.run(render_transcript(old_messages))
+    summary_message = ModelRequest(parts=[*system_parts, SystemPromptPart(content=SUMMARY_PREFIX + result.data)])
+
+    return MessageWindow([ModelMessagesTypeAdapter.dump_json([summary_message]), *message_rows[-keep:]])
+
+async def run_cached(node: str, inputs: Dict[str, Any], run_agent) -> str:
+    """Return the cached result for these node inputs, or run the agent and cache its result."""
+    if node_cache is None:
+        return await run_agent()
+
+    key = make_cache_key(node, inputs)
+    cached = node_cache.get(key)
+    if cached is not None:
+        return cached
+
+    data = await run_agent()
+    node_cache.set(key, data)
+    return data
+
+def timed_node(node):
+    """Emit how long a node took through the custom stream writer, so the UI can show where time goes."""
+    @wraps(node)
+    async def timed(state: TravelState, writer) -> Dict[str, Any]:
+        start = time.perf_counter()
+        update = await node(state, writer)
+        writer({"node": node.__name__, "seconds": time.perf_counter() - start})
+        return update
+    return timed
+
 # Node functions for the graph
 
 # Info gathering node
+@timed_node
 async def gather_info(state: TravelState, writer) -> Dict[str, Any]:
     """Gather necessary travel information from the user."""
     user_input = state["user_input"]
 
     # Get the message history into the format for Pydantic AI
     message_history: list[ModelMessage] = []
-    for message_row in state['messages']:
-        message_history.extend(ModelMessagesTypeAdapter.validate_json(message_row))    
+    for message_row in state.get('messages', []):
+        message_history.extend(parse_message_row(message_row))
     
     # Call the info gathering agent
     # result = await info_gathering_agent.run(user_input)
@@ -80,12 +179,20 @@ async def gather_info(state: TravelState, writer) -> Dict[str, Any]:
 
     # Return the response asking for more details if necessary
     data = await result.get_data()
+    new_messages = [result.new_messages_json()]
+
+    # Keep the history bounded - the reply has already been streamed so the summary doesn't delay it
+    message_rows = state.get('messages', []) + new_messages
+    if MAX_HISTORY_TURNS and len(message_rows) > MAX_HISTORY_TURNS:
+        new_messages = await compact_history(message_rows)
+
     return {
         "travel_details": data.model_dump(),
-        "messages": [result.new_messages_json()]
+        "messages": new_messages
     }
 
 # Flight recommendation node
+@timed_node
 async def get_flight_recommendations(state: TravelState, writer) -> Dict[str, Any]:
     """Get flight recommendations based on travel details."""
     writer("\n#### Getting flight recommendations...\n")
@@ -98,13 +205,25 @@ async def get_flight_recommendations(state: TravelState, writer) -> Dict[str, An
     # Prepare the prompt for the flight agent
     prompt = f"I need flight recommendations from {travel_details['origin']} to {travel_details['destination']} on {travel_details['date_leaving']}. Return flight on {travel_details['date_returning']}."
     
-    # Call the flight agent
-    result = await flight_agent.run(prompt, deps=flight_dependencies)
+    # Call the flight agent, unless these exact flight inputs were already planned
+    async def run_flight_agent():
+        result = await flight_agent.run(prompt, deps=flight_dependencies)
+        return result.data
+
+    cache_inputs = {
+        "origin": travel_details['origin'],
+        "destination": travel_details['destination'],
+        "date_leaving": travel_details['date_leaving'],
+        "date_returning": travel_details['date_returning'],
+        "preferred_airlines": preferred_airlines
+    }
+    flight_results = await run_cached("get_flight_recommendations", cache_inputs, run_flight_agent)
     
     # Return the flight recommendations
-    return {"flight_results": result.data}
+    return {"flight_results": flight_results}
 
 # Hotel recommendation node
+@timed_node
 async def get_hotel_recommendations(state: TravelState, writer) -> Dict[str, Any]:
     """Get hotel recommendations based on travel details."""
     writer("\n#### Getting hotel recommendations...\n")
@@ -121,13 +240,26 @@ async def get_hotel_recommendations(state: TravelState, writer) -> Dict[str, Any
     # Prepare the prompt for the hotel agent
     prompt = f"I need hotel recommendations in {travel_details['destination']} from {travel_details['date_leaving']} to {travel_details['date_returning']} with a maximum price of ${travel_details['max_hotel_price']} per night."
     
-    # Call the hotel agent
-    result = await hotel_agent.run(prompt, deps=hotel_dependencies)
+    # Call the hotel agent, unless these exact hotel inputs were already planned
+    async def run_hotel_agent():
+        result = await hotel_agent.run(prompt, deps=hotel_dependencies)
+        return result.data
+
+    cache_inputs = {
+        "destination": travel_details['destination'],
+        "date_leaving": travel_details['date_leaving'],
+        "date_returning": travel_details['date_returning'],
+        "max_hotel_price": travel_details['max_hotel_price'],
+        "hotel_amenities": hotel_amenities,
+        "budget_level": budget_level
+    }
+    hotel_results = await run_cached("get_hotel_recommendations", cache_inputs, run_hotel_agent)
     
     # Return the hotel recommendations
-    return {"hotel_results": result.data}
+    return {"hotel_results": hotel_results}
 
 # Activity recommendation node
+@timed_node
 async def get_activity_recommendations(state: TravelState, writer) -> Dict[str, Any]:
     """Get activity recommendations based on travel details."""
     writer("\n#### Getting activity recommendations...\n")
@@ -136,13 +268,23 @@ async def get_activity_recommendations(state: TravelState, writer) -> Dict[str,
     # Prepare the prompt for the activity agent
     prompt = f"I need activity recommendations for {travel_details['destination']} from {travel_details['date_leaving']} to {travel_details['date_returning']}."
     
-    # Call the activity agent
-    result = await activity_agent.run(prompt)
+    # Call the activity agent, unless these exact activity inputs were already planned
+    async def run_activity_agent():
+        result = await activity_agent.run(prompt)
+        return result.data
+
+    cache_inputs = {
+        "destination": travel_details['destination'],
+        "date_leaving": travel_details['date_leaving'],
+        "date_returning": travel_details['date_returning']
+    }
+    activity_results = await run_cached("get_activity_recommendations", cache_inputs, run_activity_agent)
     
     # Return the activity recommendations
-    return {"activity_results": result.data}
+    return {"activity_results": activity_results}
 
 # Final planning node
+@timed_node
 async def create_final_plan(state: TravelState, writer) -> Dict[str, Any]:
     """Create a final travel plan based on all recommendations."""
     travel_details = state["travel_details"]
@@ -176,6 +318,69 @@ async def create_final_plan(state: TravelState, writer) -> Dict[str, Any]:
     data = await result.get_data()
     return {"final_plan": data}
 
+# Incremental planning node
+@timed_node
+async def create_incremental_plan(state: TravelState, writer) -> Dict[str, Any]:
+    """Run the recommendation agents concurrently, streaming each result as soon as it completes
+    and letting the final planner draft the plan section by section with the results available so far."""
+    travel_details = state["travel_details"]
+    branches = {
+        "flight_results": ("flight", get_flight_recommendations),
+        "hotel_results": ("hotel", get_hotel_recommendations),
+        "activity_results": ("activity", get_activity_recommendations)
+    }
+
+    async def run_branch(key: str):
+        update = await branches[key][1](state, writer)
+        return key, update[key]
+
+    tasks = [asyncio.create_task(run_branch(key)) for key in branches]
+    results: Dict[str, Any] = {}
+    message_history: list[ModelMessage] = []
+    plan_sections: List[str] = []
+
+    try:
+        for completed in asyncio.as_completed(tasks):
+            key, branch_results = await completed
+            results[key] = branch_results
+            label = branches[key][0]
+
+            # Show this branch's recommendations right away
+            writer(f"\n#### {label.capitalize()} recommendations\n{branch_results}\n\n")
+
+            # Have the final planner write the section for this branch while the others keep running
+            if not message_history:
+                prompt = f"""
+                I'm planning a trip to {travel_details['destination']} from {travel_details['origin']} on {travel_details['date_leaving']} and returning on {travel_details['date_returning']}.
+
+                The recommendations are still coming in, so I'll send them to you one at a time. Here are the {label} recommendations:
+                {branch_results}
+
+                Start the travel plan with a short overview of the trip and a section based on these recommendations.
+                """
+            else:
+                prompt = f"""
+                Here are the {label} recommendations:
+                {branch_results}
+
+                Continue the travel plan with a section based on these recommendations. Don't repeat what you already wrote.
+                """
+            if len(results) == len(branches):
+                prompt += "\nThese were the last recommendations, so finish the travel plan with a short summary of the whole trip.\n"
+
+            async with final_planner_agent.run_stream(prompt, message_history=message_history) as result:
+                async for chunk in result.stream_text(delta=True):
+                    writer(chunk)
+            writer("\n\n")
+
+            plan_sections.append(await result.get_data())
+            message_history = result.all_messages()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return {**results, "final_plan": "\n\n".join(plan_sections)}
+
 # Conditional edge function to determine next steps after info gathering
 def route_after_info_gathering(state: TravelState):
     """Determine what to do after gathering information."""
@@ -185,6 +390,10 @@ def route_after_info_gathering(state: TravelState):
     if not travel_details.get("all_details_given", False):
         return "get_next_user_message"
     
+    # Recommendations are gathered and planned incrementally within a single node
+    if state.get("incremental_planning", False):
+        return "create_incremental_plan"
+
     # If all details are given, we can proceed to parallel recommendations
     # Return a list of Send objects to fan out to multiple nodes
     return ["get_flight_recommendations", "get_hotel_recommendations", "get_activity_recommendations"]
@@ -199,8 +408,12 @@ def get_next_user_message(state: TravelState):
     }    
 
 # Build the graph
-def build_travel_agent_graph():
-    """Build and return the travel agent graph."""
+def build_travel_agent_graph(checkpointer=None):
+    """Build and return the travel agent graph.
+
+    Uses the process-wide in-memory checkpointer unless one is given. Use open_travel_agent_graph
+    to run with the checkpointer configured in the environment (see checkpointer.py).
+    """
     # Create the graph with our state
     graph = StateGraph(TravelState)
     
@@ -211,6 +424,7 @@ def build_travel_agent_graph():
     graph.add_node("get_hotel_recommendations", get_hotel_recommendations)
     graph.add_node("get_activity_recommendations", get_activity_recommendations)
     graph.add_node("create_final_plan", create_final_plan)
+    graph.add_node("create_incremental_plan", create_incremental_plan)
     
     # Add edges
     graph.add_edge(START, "gather_info")
@@ -219,7 +433,7 @@ def build_travel_agent_graph():
     graph.add_conditional_edges(
         "gather_info",
         route_after_info_gathering,
-        ["get_next_user_message", "get_flight_recommendations", "get_hotel_recommendations", "get_activity_recommendations"]
+        ["get_next_user_message", "get_flight_recommendations", "get_hotel_recommendations", "get_activity_recommendations", "create_incremental_plan"]
     )
 
     # After getting a user message (required if not enough details given), route back to the info gathering agent
@@ -232,14 +446,26 @@ def build_travel_agent_graph():
     
     # Connect final planning to END
     graph.add_edge("create_final_plan", END)
+    graph.add_edge("create_incremental_plan", END)
     
     # Compile the graph
-    memory = MemorySaver()
-    return graph.compile(checkpointer=memory)
+    if checkpointer is None:
+        checkpointer = get_memory_checkpointer()
+    return graph.compile(checkpointer=checkpointer)
 
-# Create the travel agent graph
+# Create the travel agent graph (in-memory checkpointer, safe to build at import time)
 travel_agent_graph = build_travel_agent_graph()
 
+@asynccontextmanager
+async def open_travel_agent_graph():
+    """Travel agent graph with the configured checkpointer, opened in the running event loop.
+
+    The SQLite checkpointer is bound to the event loop it is created in, so callers that start
+    a new loop per run (like Streamlit's asyncio.run on every rerun) open the graph for that run.
+    """
+    async with open_checkpointer() as checkpointer:
+        yield build_travel_agent_graph(checkpointer)
+
 # Function to run the travel agent
 async def run_travel_agent(user_input: str):
     """Run the travel agent with the given user input."""
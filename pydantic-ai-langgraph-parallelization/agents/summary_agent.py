@@ -0,0 +1,23 @@
+from pydantic_ai import Agent
+import logfire
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import get_model
+
+logfire.configure(send_to_logfire='if-token-present')
+
+model = get_model()
+
+system_prompt = """
+You are an assistant that compresses the earlier part of a conversation between a user and a
+travel planning assistant.
+
+You will be given a previous summary (if there is one) and the transcript of the turns that are
+being removed from the conversation history. Write a short summary that keeps every travel detail
+the user has given (destination, origin, dates, hotel budget, preferences) and anything they
+have corrected or changed their mind about. Leave out greetings and small talk.
+"""
+
+summary_agent = Agent(model, system_prompt=system_prompt)
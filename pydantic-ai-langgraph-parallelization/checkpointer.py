@@ -0,0 +1,113 @@
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.checkpoint.memory import MemorySaver
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+import aiosqlite
+import time
+import os
+
+load_dotenv()
+
+class TTLAsyncSqliteSaver(AsyncSqliteSaver):
+    """SQLite checkpointer that deletes threads which have been idle for longer than a TTL.
+
+    Every checkpoint write records the time the thread was last used. At most once every
+    `eviction_interval` seconds the saver removes all the checkpoints and pending writes
+    of the threads that have not been used within `ttl_seconds`.
+
+    The saver is bound to the event loop it is created in, so create it inside the running
+    loop (see open_checkpointer).
+    """
+
+    # Shared by the savers of the process, which are short-lived (one per event loop)
+    _last_eviction = 0.0
+
+    def __init__(self, conn: aiosqlite.Connection, ttl_seconds: float, eviction_interval: float = 300):
+        super().__init__(conn)
+        self.ttl_seconds = ttl_seconds
+        self.eviction_interval = eviction_interval
+        self._activity_is_setup = False
+
+    async def setup(self) -> None:
+        await super().setup()
+        if self._activity_is_setup:
+            return
+
+        async with self.lock:
+            await self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS thread_activity (
+                    thread_id TEXT PRIMARY KEY,
+                    last_seen REAL NOT NULL
+                )
+                """
+            )
+            await self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_thread_activity_last_seen ON thread_activity (last_seen)"
+            )
+            await self.conn.commit()
+        self._activity_is_setup = True
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        next_config = await super().aput(config, checkpoint, metadata, new_versions)
+
+        now = time.time()
+        async with self.lock:
+            await self.conn.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, last_seen) VALUES (?, ?)",
+                (str(config["configurable"]["thread_id"]), now)
+            )
+            await self.conn.commit()
+
+        if now - TTLAsyncSqliteSaver._last_eviction >= self.eviction_interval:
+            TTLAsyncSqliteSaver._last_eviction = now
+            await self.evict_idle_threads()
+
+        return next_config
+
+    async def evict_idle_threads(self) -> int:
+        """Delete every thread that has been idle for longer than the TTL. Returns the number of threads removed."""
+        await self.setup()
+        cutoff = time.time() - self.ttl_seconds
+
+        async with self.lock:
+            rows = await self.conn.execute_fetchall(
+                "SELECT thread_id FROM thread_activity WHERE last_seen < ?", (cutoff,)
+            )
+            thread_ids = [(row[0],) for row in rows]
+            if thread_ids:
+                await self.conn.executemany("DELETE FROM checkpoints WHERE thread_id = ?", thread_ids)
+                await self.conn.executemany("DELETE FROM writes WHERE thread_id = ?", thread_ids)
+                await self.conn.executemany("DELETE FROM thread_activity WHERE thread_id = ?", thread_ids)
+                await self.conn.commit()
+
+        return len(thread_ids)
+
+# Threads of the memory backend, kept for the lifetime of the process
+_memory_saver = MemorySaver()
+
+def get_memory_checkpointer():
+    """Process-wide in-memory checkpointer, usable from any event loop."""
+    return _memory_saver
+
+@asynccontextmanager
+async def open_checkpointer():
+    """Open the checkpointer configured through the environment in the running event loop.
+
+    CHECKPOINTER_BACKEND=sqlite (default) keeps threads on disk in CHECKPOINTER_DB_PATH and evicts
+    threads idle for longer than CHECKPOINTER_TTL_SECONDS. Its aiosqlite connection is bound to the
+    current event loop, so it is opened here and closed on exit. CHECKPOINTER_BACKEND=memory keeps
+    every thread in RAM for the lifetime of the process.
+    """
+    backend = os.getenv('CHECKPOINTER_BACKEND', 'sqlite')
+    if backend == 'memory':
+        yield get_memory_checkpointer()
+        return
+
+    db_path = os.getenv('CHECKPOINTER_DB_PATH', 'checkpoints.sqlite')
+    ttl_seconds = float(os.getenv('CHECKPOINTER_TTL_SECONDS', str(24 * 60 * 60)))
+
+    async with aiosqlite.connect(db_path) as conn:
+        saver = TTLAsyncSqliteSaver(conn, ttl_seconds=ttl_seconds)
+        await saver.setup()
+        yield saver
@@ -0,0 +1,113 @@
+"""
+Benchmark of the per-turn latency and memory of the info gathering loop over long conversations.
+
+The LLM calls are replaced with Pydantic AI test models so only the graph, the state handling
+and the checkpointer are measured. Each configuration runs a conversation where the user never
+gives all the details, so every turn goes gather_info -> get_next_user_message.
+
+Usage:
+    python extras/benchmark_conversation_state.py --turns 100
+"""
+from pydantic_ai.models.function import FunctionModel, AgentInfo, DeltaToolCall
+from pydantic_ai.models.test import TestModel
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Command
+import statistics
+import tempfile
+import argparse
+import resource
+import asyncio
+import logfire
+import json
+import time
+import uuid
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Imported with the default (SQLite) checkpointer configuration, like the Streamlit UI
+import agent_graph
+from agent_graph import build_travel_agent_graph, open_travel_agent_graph, info_gathering_agent, summary_agent, parse_message_row
+
+# Configure logfire to suppress warnings
+logfire.configure(send_to_logfire='never')
+
+async def stream_travel_details(messages, info: AgentInfo):
+    """Fake info gathering response that is always missing details."""
+    travel_details = {
+        "response": "Where will you be flying from? " * 20,
+        "destination": "Paris",
+        "origin": "",
+        "max_hotel_price": 200,
+        "date_leaving": "06-15",
+        "date_returning": "06-22",
+        "all_details_given": False
+    }
+    yield {0: DeltaToolCall(name=info.result_tools[0].name, json_args=json.dumps(travel_details))}
+
+def get_rss_mb() -> float:
+    """Current resident set size in MB (peak RSS when /proc is not available)."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+async def run_conversation(graph, turns: int):
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    initial_state = {
+        "user_input": "I want to go to Paris.",
+        "preferred_airlines": [],
+        "hotel_amenities": [],
+        "budget_level": "mid-range"
+    }
+
+    latencies = []
+    rss_start = get_rss_mb()
+    for turn in range(turns):
+        graph_input = initial_state if turn == 0 else Command(resume=f"Some more details for turn {turn}.")
+        start = time.perf_counter()
+        async for _ in graph.astream(graph_input, config, stream_mode="custom"):
+            pass
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    state = await graph.aget_state(config)
+    return latencies, get_rss_mb() - rss_start, len(state.values["messages"])
+
+def report(name: str, latencies, rss_growth: float, stored_turns: int):
+    print(f"\n{name}")
+    print(f"  first 10 turns avg: {statistics.mean(latencies[:10]):.1f} ms")
+    print(f"  last 10 turns avg:  {statistics.mean(latencies[-10:]):.1f} ms")
+    print(f"  p95 turn latency:   {statistics.quantiles(latencies, n=20)[-1]:.1f} ms")
+    print(f"  RSS growth:         {rss_growth:.1f} MB")
+    print(f"  turns in state:     {stored_turns}")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark conversation state handling")
+    parser.add_argument("--turns", type=int, default=100, help="Turns per conversation")
+    parser.add_argument("--window", type=int, default=10, help="MAX_HISTORY_TURNS for the bounded run")
+    args = parser.parse_args()
+
+    with info_gathering_agent.override(model=FunctionModel(stream_function=stream_travel_details)), \
+            summary_agent.override(model=TestModel(custom_result_text="The user wants to go to Paris.")):
+        # Unbounded history kept in memory
+        agent_graph.MAX_HISTORY_TURNS = 0
+        parse_message_row.cache_clear()
+        latencies, rss_growth, stored_turns = await run_conversation(build_travel_agent_graph(MemorySaver()), args.turns)
+        report("Unbounded history, MemorySaver", latencies, rss_growth, stored_turns)
+
+        # Bounded history on disk
+        agent_graph.MAX_HISTORY_TURNS = args.window
+        parse_message_row.cache_clear()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.environ['CHECKPOINTER_BACKEND'] = 'sqlite'
+            os.environ['CHECKPOINTER_DB_PATH'] = os.path.join(tmp_dir, "checkpoints.sqlite")
+            async with open_travel_agent_graph() as graph:
+                latencies, rss_growth, stored_turns = await run_conversation(graph, args.turns)
+        report(f"Bounded history (window={args.window}), TTL SQLite checkpointer", latencies, rss_growth, stored_turns)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+from typing import Any, Dict, Optional
+from collections import OrderedDict
+from dotenv import load_dotenv
+import threading
+import hashlib
+import sqlite3
+import json
+import time
+import os
+
+load_dotenv()
+
+def normalize_inputs(value: Any) -> Any:
+    """Normalize node inputs so equivalent requests produce the same cache key.
+
+    Strings are stripped and lowercased, lists are sorted (the order of preferred airlines or
+    amenities doesn't change the recommendations) and dictionaries are normalized recursively.
+    """
+    if isinstance(value, str):
+        return value.strip().lower()
+    if isinstance(value, dict):
+        return {key: normalize_inputs(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return sorted((normalize_inputs(item) for item in value), key=json.dumps)
+    return value
+
+def make_cache_key(node: str, inputs: Dict[str, Any]) -> str:
+    """Build the cache key for a node from the inputs it actually uses."""
+    payload = json.dumps({"node": node, "inputs": normalize_inputs(inputs)}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class InMemoryNodeCache:
+    """Process-local node result cache with a TTL, holding at most max_entries (least recently used evicted first)."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            now = time.time()
+            # Drop expired entries on write so a long-running process doesn't keep them forever
+            for expired_key in [k for k, (expires_at, _) in self._entries.items() if expires_at < now]:
+                del self._entries[expired_key]
+            self._entries[key] = (now + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class SqliteNodeCache:
+    """Node result cache stored in SQLite so results survive restarts and are shared between processes."""
+
+    def __init__(self, db_path: str, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS node_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM node_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute("DELETE FROM node_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO node_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl_seconds)
+            )
+            # Drop expired entries on write so the table doesn't grow forever
+            self._conn.execute("DELETE FROM node_cache WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+def get_node_cache():
+    """Create the node result cache configured through the environment.
+
+    NODE_CACHE_BACKEND can be "memory" (default), "sqlite" (stored in NODE_CACHE_DB_PATH) or
+    "none" to disable caching. Entries expire after NODE_CACHE_TTL_SECONDS, and the memory
+    backend keeps at most NODE_CACHE_MAX_ENTRIES entries.
+    """
+    backend = os.getenv('NODE_CACHE_BACKEND', 'memory')
+    ttl_seconds = float(os.getenv('NODE_CACHE_TTL_SECONDS', str(60 * 60)))
+
+    if backend == 'none':
+        return None
+    if backend == 'sqlite':
+        return SqliteNodeCache(os.getenv('NODE_CACHE_DB_PATH', 'node_cache.sqlite'), ttl_seconds)
+    return InMemoryNodeCache(ttl_seconds, int(os.getenv('NODE_CACHE_MAX_ENTRIES', '1000')))
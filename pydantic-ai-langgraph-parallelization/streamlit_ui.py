@@ -8,7 +8,7 @@ import uuid
 import json
 import os
 
-from agent_graph import travel_agent_graph
+from agent_graph import open_travel_agent_graph
 
 
 # Page configuration
@@ -40,6 +40,7 @@ class UserContext(BaseModel):
     preferred_airlines: List[str]
     hotel_amenities: List[str]
     budget_level: str
+    incremental_planning: bool = False
 
 @st.cache_resource
 def get_thread_id():
@@ -78,6 +79,10 @@ def handle_user_message(user_input: str):
     # Set the message for processing in the next rerun
     st.session_state.processing_message = user_input
 
+# Format the per-node timings emitted by the agent graph
+def format_timings(timings: List[Dict[str, Any]]) -> str:
+    return "⏱️ " + " | ".join(f"{timing['node']}: {timing['seconds']:.1f}s" for timing in timings)
+
 # Function to invoke the agent graph to interact with the Travel Planning Agent
 async def invoke_agent_graph(user_input: str):
     """
@@ -97,16 +102,18 @@ async def invoke_agent_graph(user_input: str):
             "user_input": user_input,
             "preferred_airlines": user_context.preferred_airlines,
             "hotel_amenities": user_context.hotel_amenities,
-            "budget_level": user_context.budget_level
+            "budget_level": user_context.budget_level,
+            "incremental_planning": user_context.incremental_planning
         }
-        async for msg in travel_agent_graph.astream(
-                initial_state, config, stream_mode="custom"
-            ):
-                yield msg
+        graph_input = initial_state
     # Continue the conversation
     else:
+        graph_input = Command(resume=user_input)
+
+    # The checkpointer is opened in this rerun's event loop
+    async with open_travel_agent_graph() as travel_agent_graph:
         async for msg in travel_agent_graph.astream(
-            Command(resume=user_input), config, stream_mode="custom"
+            graph_input, config, stream_mode="custom"
         ):
             yield msg
 
@@ -137,10 +144,17 @@ async def main():
             value=st.session_state.user_context.budget_level or "mid-range"
         )
         
+        incremental_planning = st.toggle(
+            "Show recommendations as they arrive",
+            value=st.session_state.user_context.incremental_planning,
+            help="Stream each recommendation as soon as it's ready and draft the plan while the others are still running"
+        )
+        
         if st.button("Save Preferences"):
             st.session_state.user_context.preferred_airlines = preferred_airlines
             st.session_state.user_context.hotel_amenities = preferred_amenities
             st.session_state.user_context.budget_level = budget_level
+            st.session_state.user_context.incremental_planning = incremental_planning
             st.success("Preferences saved!")
         
         st.divider()
@@ -164,6 +178,8 @@ async def main():
             with st.chat_message("assistant", avatar="https://api.dicebear.com/7.x/bottts/svg?seed=travel-agent"):
                 st.markdown(message["content"])
                 st.caption(message["timestamp"])
+                if message.get("timings"):
+                    st.caption(format_timings(message["timings"]))
 
     # User input
     # Example: I want to go to Tokyo from Minneapolis. Jun 1st, returning on 6th. Max price for hotel is $300 per night
@@ -192,13 +208,21 @@ async def main():
 
                 # Display assistant response in chat message container
                 response_content = ""
+                timings = []
                 
                 # Create a chat message container using Streamlit's built-in component
                 with st.chat_message("assistant", avatar="https://api.dicebear.com/7.x/bottts/svg?seed=travel-agent"):
                     message_placeholder = st.empty()
+                    timings_placeholder = st.empty()
                     
                     # Run the async generator to fetch responses
                     async for chunk in invoke_agent_graph(user_input):
+                        # Node timings are sent as dictionaries, everything else is response text
+                        if isinstance(chunk, dict):
+                            timings.append(chunk)
+                            timings_placeholder.caption(format_timings(timings))
+                            continue
+
                         response_content += chunk
                         # Update only the text content
                         message_placeholder.markdown(response_content)
@@ -207,7 +231,8 @@ async def main():
                 st.session_state.chat_history.append({
                     "role": "assistant",
                     "content": response_content,
-                    "timestamp": datetime.now().strftime("%I:%M %p")
+                    "timestamp": datetime.now().strftime("%I:%M %p"),
+                    "timings": timings
                 })
                 
             except Exception as e:
@@ -1,67 +1,199 @@
-from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader
+from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+from langchain_chroma import Chroma
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
+import argparse
+import hashlib
+import json
+import glob
+import time
 import os
 import shutil
 
 load_dotenv()
 
-def load_and_process_pdfs(data_dir: str):
-    """Load PDFs from directory and split into chunks."""
-    loader = DirectoryLoader(
-        data_dir,
-        glob="**/*.pdf",
-        loader_cls=PyPDFLoader
-    )
-    documents = loader.load()
-    
+EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+# Chunks per embedding batch on CPU, and embedding backend: torch (default) or onnx
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "128"))
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Optional ONNX file of the model repository for the onnx backend, e.g. onnx/model_qint8_avx512.onnx
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")
+# Chunks added to the vector store per request
+VECTOR_STORE_BATCH_SIZE = 1000
+# Per-PDF content hashes and chunk IDs of the last ingest, stored with the vector store
+MANIFEST_FILE = "ingest_manifest.json"
+
+def get_file_hash(path: str) -> str:
+    """SHA-256 of the file content."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def load_and_split_pdf(path: str):
+    """Load a PDF and split it into chunks. Runs in a worker process."""
+    documents = PyPDFLoader(path).load()
+
     # Split documents into chunks
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=200,
         length_function=len,
     )
-    chunks = text_splitter.split_documents(documents)
-    return chunks
+    return text_splitter.split_documents(documents)
+
+def load_and_process_pdfs(data_dir: str, paths=None, max_workers: int = None):
+    """Load PDFs (all the ones in the directory, or the given paths) in a process pool and split into chunks.
+    Returns the chunks of each PDF, by path."""
+    if paths is None:
+        paths = sorted(glob.glob(os.path.join(data_dir, "**", "*.pdf"), recursive=True))
+    if not paths:
+        return {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(paths, executor.map(load_and_split_pdf, paths)))
 
-def create_vector_store(chunks, persist_directory: str):
+def get_embeddings():
+    """HuggingFace embeddings on CPU, in large batches, optionally on ONNX Runtime."""
+    model_kwargs = {'device': 'cpu'}
+    if EMBEDDING_BACKEND == "onnx":
+        # Same model exported to ONNX, so the vectors stay compatible with the torch queries
+        model_kwargs['backend'] = "onnx"
+        if EMBEDDING_ONNX_FILE:
+            model_kwargs['model_kwargs'] = {'file_name': EMBEDDING_ONNX_FILE}
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs=model_kwargs,
+        encode_kwargs={'batch_size': EMBEDDING_BATCH_SIZE}
+    )
+
+def load_manifest(persist_directory: str) -> dict:
+    manifest_path = os.path.join(persist_directory, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+def save_manifest(persist_directory: str, manifest: dict):
+    os.makedirs(persist_directory, exist_ok=True)
+    with open(os.path.join(persist_directory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+def add_chunks(vectordb, path: str, file_hash: str, chunks) -> list:
+    """Add the chunks of a PDF to the vector store. Returns their IDs."""
+    ids = [f"{path}:{file_hash[:16]}:{i}" for i in range(len(chunks))]
+    for start in range(0, len(chunks), VECTOR_STORE_BATCH_SIZE):
+        vectordb.add_documents(
+            documents=chunks[start:start + VECTOR_STORE_BATCH_SIZE],
+            ids=ids[start:start + VECTOR_STORE_BATCH_SIZE]
+        )
+    return ids
+
+def create_vector_store(chunks_by_path, persist_directory: str, file_hashes: dict):
     """Create and persist Chroma vector store."""
     # Clear existing vector store if it exists
     if os.path.exists(persist_directory):
         print(f"Clearing existing vector store at {persist_directory}")
         shutil.rmtree(persist_directory)
-    
-    # Initialize HuggingFace embeddings
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-mpnet-base-v2",
-        model_kwargs={'device': 'cpu'}
-    )
-    
+
     # Create and persist Chroma vector store
     print("Creating new vector store...")
-    vectordb = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=persist_directory
-    )
-    return vectordb
+    vectordb = Chroma(persist_directory=persist_directory, embedding_function=get_embeddings())
+    files = {}
+    for path, chunks in chunks_by_path.items():
+        files[path] = {"hash": file_hashes[path], "chunk_ids": add_chunks(vectordb, path, file_hashes[path], chunks)}
+    return vectordb, files
+
+def update_vector_store(data_dir: str, persist_directory: str, max_workers: int = None, rebuild: bool = False):
+    """Incremental ingest: only the new and changed PDFs are parsed and embedded, and the chunks of the
+    changed and removed PDFs are deleted. A full rebuild is done with rebuild=True, on the first run,
+    or if the embedding model changed.
+    Returns the ingest stats, the stats of the last full rebuild and whether this ingest was a full rebuild."""
+    start_time = time.time()
+    manifest = load_manifest(persist_directory)
+    previous_files = manifest.get("files", {})
+    embedding_config = {"model": EMBEDDING_MODEL, "backend": EMBEDDING_BACKEND, "onnx_file": EMBEDDING_ONNX_FILE}
+    rebuild = rebuild or not previous_files or manifest.get("embedding") != embedding_config
+
+    paths = sorted(glob.glob(os.path.join(data_dir, "**", "*.pdf"), recursive=True))
+    file_hashes = {os.path.relpath(path, data_dir): get_file_hash(path) for path in paths}
+    if rebuild:
+        changed = list(file_hashes)
+    else:
+        changed = [path for path, file_hash in file_hashes.items()
+                   if previous_files.get(path, {}).get("hash") != file_hash]
+    removed = [path for path in previous_files if path not in file_hashes]
+
+    print(f"{len(file_hashes)} PDFs: {len(changed)} to ingest, {len(removed)} removed, "
+          f"{len(file_hashes) - len(changed)} unchanged" + (" (full rebuild)" if rebuild else ""))
+
+    # Parse the PDFs to ingest in parallel
+    parse_start = time.time()
+    chunks_by_path = {
+        os.path.relpath(path, data_dir): chunks
+        for path, chunks in load_and_process_pdfs(
+            data_dir, [os.path.join(data_dir, path) for path in changed], max_workers
+        ).items()
+    }
+    parse_seconds = time.time() - parse_start
+    chunks_count = sum(len(chunks) for chunks in chunks_by_path.values())
+    print(f"Created {chunks_count} chunks from {len(chunks_by_path)} PDFs in {parse_seconds:.1f}s")
+
+    # Embed and store the chunks
+    embed_start = time.time()
+    if rebuild:
+        vectordb, files = create_vector_store(chunks_by_path, persist_directory, file_hashes)
+    else:
+        vectordb = Chroma(persist_directory=persist_directory, embedding_function=get_embeddings())
+        files = dict(previous_files)
+        stale_ids = [chunk_id for path in removed + changed for chunk_id in previous_files.get(path, {}).get("chunk_ids", [])]
+        if stale_ids:
+            vectordb.delete(ids=stale_ids)
+        for path in removed:
+            del files[path]
+        for path, chunks in chunks_by_path.items():
+            files[path] = {"hash": file_hashes[path], "chunk_ids": add_chunks(vectordb, path, file_hashes[path], chunks)}
+    embed_seconds = time.time() - embed_start
+
+    total_seconds = time.time() - start_time
+    stats = {
+        "pdfs_ingested": len(chunks_by_path),
+        "pdfs_removed": len(removed),
+        "chunks": chunks_count,
+        "parse_seconds": round(parse_seconds, 2),
+        "embed_seconds": round(embed_seconds, 2),
+        "total_seconds": round(total_seconds, 2),
+        "chunks_per_second": round(chunks_count / embed_seconds, 1) if embed_seconds and chunks_count else 0.0,
+    }
+    manifest = {
+        "embedding": embedding_config,
+        "files": files,
+        "last_full_rebuild": stats if rebuild else manifest.get("last_full_rebuild"),
+    }
+    save_manifest(persist_directory, manifest)
+    return stats, manifest["last_full_rebuild"], rebuild
 
 def main():
+    parser = argparse.ArgumentParser(description="Ingest the PDFs of the data directory into the Chroma vector store")
+    parser.add_argument("--rebuild", action="store_true", help="Clear the vector store and ingest every PDF")
+    parser.add_argument("--workers", type=int, default=None, help="PDF parsing processes (default: CPU count)")
+    args = parser.parse_args()
+
     # Define directories
     data_dir = os.path.join(os.path.dirname(__file__), "data")
     db_dir = os.path.join(os.path.dirname(__file__), "chroma_db")
-    
-    # Process PDFs
+
+    # Process PDFs and update the vector store
     print("Loading and processing PDFs...")
-    chunks = load_and_process_pdfs(data_dir)
-    print(f"Created {len(chunks)} chunks from PDFs")
-    
-    # Create vector store
-    print("Creating vector store...")
-    vectordb = create_vector_store(chunks, db_dir)
-    print(f"Vector store created and persisted at {db_dir}")
+    stats, full_rebuild_stats, rebuilt = update_vector_store(data_dir, db_dir, args.workers, args.rebuild)
+    print(f"Vector store updated and persisted at {db_dir}")
+    print(f"{stats['chunks']} chunks in {stats['total_seconds']}s "
+          f"(parse {stats['parse_seconds']}s, embed {stats['embed_seconds']}s, {stats['chunks_per_second']} chunks/sec)")
+    if full_rebuild_stats and not rebuilt:
+        print(f"Last full rebuild: {full_rebuild_stats['chunks']} chunks in {full_rebuild_stats['total_seconds']}s "
+              f"({full_rebuild_stats['chunks_per_second']} chunks/sec)")
 
 if __name__ == "__main__":
     main()
@@ -2,6 +2,10 @@ from smolagents import OpenAIServerModel, CodeAgent, ToolCallingAgent, HfApiMode
 from dotenv import load_dotenv
 from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
+from collections import OrderedDict
+import numpy as np
+import hashlib
+import time
 import os
 
 load_dotenv()
@@ -10,6 +14,13 @@ reasoning_model_id = os.getenv("REASONING_MODEL_ID")
 tool_model_id = os.getenv("TOOL_MODEL_ID")
 huggingface_api_token = os.getenv("HUGGINGFACE_API_TOKEN")
 
+# Semantic answer cache: a query reuses a cached answer if it retrieved the same chunks and its
+# embedding is at least this similar (cosine) to the cached query
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "256"))
+# Maximum steps kept in the reasoner memory within a user turn
+REASONER_MAX_MEMORY_STEPS = int(os.getenv("REASONER_MAX_MEMORY_STEPS", "6"))
+
 def get_model(model_id):
     using_huggingface = os.getenv("USE_HUGGINGFACE", "yes").lower() == "yes"
     if using_huggingface:
@@ -33,6 +44,49 @@ embeddings = HuggingFaceEmbeddings(
 db_dir = os.path.join(os.path.dirname(__file__), "chroma_db")
 vectordb = Chroma(persist_directory=db_dir, embedding_function=embeddings)
 
+class SemanticAnswerCache:
+    """LRU of reasoner answers, keyed by the retrieved chunk IDs and matched by query embedding similarity."""
+
+    def __init__(self, threshold: float, max_entries: int):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # chunk IDs -> list of (normalized query embedding, answer)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query_embedding: np.ndarray, chunk_ids: tuple):
+        for cached_embedding, answer in self.entries.get(chunk_ids, []):
+            if float(np.dot(query_embedding, cached_embedding)) >= self.threshold:
+                self.entries.move_to_end(chunk_ids)
+                self.hits += 1
+                return answer
+        self.misses += 1
+        return None
+
+    def set(self, query_embedding: np.ndarray, chunk_ids: tuple, answer: str):
+        answers = self.entries.setdefault(chunk_ids, [])
+        answers.append((query_embedding, answer))
+        del answers[:-8]  # Keep the last queries of the chunk set
+        self.entries.move_to_end(chunk_ids)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+answer_cache = SemanticAnswerCache(SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE)
+
+# User turn of the primary agent, so the reasoner memory is reset on the first call of each turn
+turn_state = {"turn": 0, "reasoner_turn": None}
+
+def get_chunk_id(doc) -> str:
+    return doc.id or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+def trim_reasoner_memory(max_steps: int):
+    """Keep the system prompt and the last max_steps steps of the reasoner memory."""
+    steps = reasoner.memory.steps if hasattr(reasoner, "memory") else reasoner.logs
+    first = 1 if steps and type(steps[0]).__name__ == "SystemPromptStep" else 0
+    if len(steps) - first > max_steps:
+        del steps[first:len(steps) - max_steps]
+
 @tool
 def rag_with_reasoner(user_query: str) -> str:
     """
@@ -43,8 +97,20 @@ def rag_with_reasoner(user_query: str) -> str:
     Args:
         user_query: The user's question to query the vector database with.
     """
-    # Search for relevant documents
-    docs = vectordb.similarity_search(user_query, k=3)
+    # Search for relevant documents, embedding the query once for the search and the answer cache
+    retrieval_start = time.perf_counter()
+    raw_embedding = embeddings.embed_query(user_query)
+    docs = vectordb.similarity_search_by_vector(raw_embedding, k=3)
+    query_embedding = np.asarray(raw_embedding, dtype=np.float32)
+    query_embedding /= np.linalg.norm(query_embedding) or 1.0
+    chunk_ids = tuple(sorted(get_chunk_id(doc) for doc in docs))
+    retrieval_ms = (time.perf_counter() - retrieval_start) * 1000
+
+    cached_answer = answer_cache.get(query_embedding, chunk_ids)
+    if cached_answer is not None:
+        print(f"rag_with_reasoner | retrieval {retrieval_ms:.0f} ms | cache hit "
+              f"({answer_cache.hits} hits, {answer_cache.misses} misses)")
+        return cached_answer
     
     # Combine document contents
     context = "\n\n".join(doc.page_content for doc in docs)
@@ -60,13 +126,30 @@ Question: {user_query}
 
 Answer:"""
     
-    # Get response from reasoning model
-    response = reasoner.run(prompt, reset=False)
+    # Get response from reasoning model, with a fresh memory on the first call of the user turn
+    reasoning_start = time.perf_counter()
+    new_turn = turn_state["reasoner_turn"] != turn_state["turn"]
+    turn_state["reasoner_turn"] = turn_state["turn"]
+    if not new_turn:
+        trim_reasoner_memory(REASONER_MAX_MEMORY_STEPS)
+    response = reasoner.run(prompt, reset=new_turn)
+    reasoning_ms = (time.perf_counter() - reasoning_start) * 1000
+
+    answer_cache.set(query_embedding, chunk_ids, response)
+    print(f"rag_with_reasoner | retrieval {retrieval_ms:.0f} ms | reasoning {reasoning_ms:.0f} ms | cache miss "
+          f"({answer_cache.hits} hits, {answer_cache.misses} misses)")
     return response
 
+class PrimaryAgent(ToolCallingAgent):
+    """Tool calling agent that starts a new reasoner turn on each user message."""
+
+    def run(self, *args, **kwargs):
+        turn_state["turn"] += 1
+        return super().run(*args, **kwargs)
+
 # Create the primary agent to direct the conversation
 tool_model = get_model(tool_model_id)
-primary_agent = ToolCallingAgent(tools=[rag_with_reasoner], model=tool_model, add_base_tools=False, max_steps=3)
+primary_agent = PrimaryAgent(tools=[rag_with_reasoner], model=tool_model, add_base_tools=False, max_steps=3)
 
 # Example prompt: Compare and contrast the services offered by RankBoost and Omni Marketing
 def main():